@@ -0,0 +1,160 @@
+"""
+Compare the throughput of the async routes with their old synchronous versions under
+200 concurrent clients.
+
+Serves the app with uvicorn in a subprocess against a throwaway SQLite file (pass
+--database-url for PostgreSQL), with the token, user and cart caches turned off so every
+request reaches the database. Synchronous copies of the routes, as they were before they
+were ported, are mounted under /bench/sync for the comparison.
+
+    cd backend && PYTHONPATH=src python benchmarks/async_throughput.py --clients 200 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+def build_app():
+    """
+    The app with the caches off and the synchronous copies mounted; run by uvicorn.
+    """
+    from fastapi import Depends, HTTPException
+    from sqlalchemy.orm import Session
+
+    import app.services.cart as cart_service
+    import app.services.product as product_service
+    from app.core.auth import decode_access_token, oauth2_scheme
+    from app.core.config import get_settings
+    from app.crud import get_user_by_username
+    from app.dependencies import get_db
+    from app.main import app
+
+    settings = get_settings()
+    settings.AUTH_CACHE_TTL = 0
+    settings.CART_SUMMARY_CACHE_TTL = 0
+    product_service.catalog_cache.ttl = 0
+
+    def get_current_user_sync(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+        payload = decode_access_token(token)
+        user = get_user_by_username(db, payload["sub"]) if payload else None
+        if user is None:
+            raise HTTPException(status_code=401)
+        return user
+
+    @app.get("/bench/sync/cart/getTotalItems")
+    def sync_total_items(current_user=Depends(get_current_user_sync), db: Session = Depends(get_db)):
+        return cart_service.get_total_items_in_cart(user_id=current_user.id, db=db)
+
+    @app.get("/bench/sync/product/get")
+    def sync_product(product_id: int, db: Session = Depends(get_db)):
+        return product_service.get_cached_product(db=db, product_id=product_id)
+
+    return app
+
+
+async def hammer(base_url: str, path: str, headers: dict, clients: int, seconds: float):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+        async def worker(n: int):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path.format(n=n % 50 + 1))
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                if response.status_code == 200:
+                    latencies.append((time.perf_counter() - start) * 1000)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "requests_per_second": len(ordered) / elapsed,
+        "p50_ms": statistics.median(ordered) if ordered else float("nan"),
+        "p99_ms": ordered[len(ordered) * 99 // 100] if ordered else float("nan"),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    path = None
+    if args.database_url is None:
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+    env = {**os.environ, "SQLALCHEMY_DATABASE_URL": args.database_url or f"sqlite:///{path}"}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [env.get("PYTHONPATH"), os.path.dirname(os.path.abspath(__file__))]))
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--factory", "async_throughput:build_app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            for _ in range(200):
+                try:
+                    client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+
+            client.post("/admin/add-part-category", json={"part_type_name": "Brakes", "part_type_description": "-"})
+            client.post("/admin/add-brand-category", json={"brand_type_name": "Bosch", "brand_type_description": "-"})
+            client.post("/admin/add-model-category", json={"brand_id": 1, "model_name": "Any"})
+            for n in range(50):
+                client.post("/admin/products", json={
+                    "name": f"Brake Pad {n}", "description": "-", "price": 10 + n, "tags": [], "images": [], "thumbnail": "-",
+                    "part_category_id": 1, "brand_category_id": 1, "model_category_id": 1,
+                })
+            client.post("/users/register", json={"username": "driver", "email": "driver@example.com", "password": "pit-stop"})
+            token = client.post("/users/token", data={"username": "driver", "password": "pit-stop"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            client.post("/cart/add", json={"product_id": 1, "quantity": 2}, headers=headers).raise_for_status()
+
+        print(f"{args.clients} concurrent clients, {args.seconds:.0f}s per route, caches off")
+        for name, sync_path, async_path in [
+            ("cart badge", "/bench/sync/cart/getTotalItems", "/cart/getTotalItems"),
+            ("product", "/bench/sync/product/get?product_id={n}", "/product/get?product_id={n}"),
+        ]:
+            for mode, route in (("sync", sync_path), ("async", async_path)):
+                result = asyncio.run(hammer(base_url, route, headers, args.clients, args.seconds))
+                print(f"{name:10} {mode:5}: {result['requests_per_second']:7.1f} req/s, "
+                      f"p50 {result['p50_ms']:7.1f} ms, p99 {result['p99_ms']:7.1f} ms, {result['errors']} errors")
+    finally:
+        server.terminate()
+        server.wait()
+        if path:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
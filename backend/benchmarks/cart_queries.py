@@ -0,0 +1,59 @@
+"""
+Check that building a cart response takes the same number of queries whatever the
+size of the cart, and time it.
+
+Fills carts of growing sizes in a throwaway SQLite database, counts the statements
+`get_products_from_cart` sends and fails if the count grows with the cart.
+
+    cd backend && PYTHONPATH=src python benchmarks/cart_queries.py
+"""
+import argparse
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import address, order, support, user  # noqa: F401  mapped by the relationships below
+from app.models.cart import Cart, CartItem
+from app.models.product import Product
+from app.services.cart import get_products_from_cart
+from fuzzy_search import make_products, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 30, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.bulk_insert_mappings(Product, list(make_products(max(args.sizes))))
+    db.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *_: statements.append(1))
+
+    counts = {}
+    for user_id, size in enumerate(args.sizes, start=1):
+        cart = Cart(user_id=user_id)
+        db.add(cart)
+        db.flush()
+        db.add_all(CartItem(cart_id=cart.id, product_id=i, quantity=2, price=0) for i in range(1, size + 1))
+        db.commit()
+        db.expire_all()
+
+        statements.clear()
+        cart_response = get_products_from_cart(db=db, cart=cart)
+        counts[size] = len(statements)
+        assert len(cart_response["items"]) == size
+
+        median, _, _ = timed(lambda: get_products_from_cart(db=db, cart=cart), args.repeat)
+        print(f"{size:4} items: {counts[size]} queries, {median:.2f} ms")
+
+    assert len(set(counts.values())) == 1, f"query count grows with the cart size: {counts}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare the single-transaction checkout with the per-item commits it replaces.
+
+For each cart size, fills a cart in a throwaway SQLite file database, then times
+`start_checkout` and counts the statements it sends, next to the previous
+implementation, which committed the order and then every order item on its own.
+
+    cd backend && PYTHONPATH=src python benchmarks/checkout.py --sizes 1 5 20 50
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.crud import add_and_commit, get_cart_by_user_id, get_cart_items_by_cart_id
+from app.models import address, support, user  # noqa: F401  mapped by the relationships below
+from app.models.cart import Cart, CartItem
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+from app.services.checkout import start_checkout
+from fuzzy_search import make_products
+
+
+def legacy_checkout(user_id: int, db):
+    cart = get_cart_by_user_id(user_id=user_id, db=db)
+    total_price = sum(item.quantity * item.product.price for item in cart.items)
+    order = Order(user_id=user_id, cart_id=cart.id, shipping_method="Regular Shipping(3-5 Days)", payment_method="Card", status="Pending", total_price=total_price)
+    add_and_commit(db, order)
+    for item in get_cart_items_by_cart_id(cart_id=cart.id, db=db):
+        add_and_commit(db, OrderItem(order_id=order.id, product_id=item.product_id, quantity=item.quantity, price=item.price))
+    return order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 20, 50])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.bulk_insert_mappings(Product, list(make_products(max(args.sizes))))
+    db.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *_: statements.append(1))
+
+    user_id = 0
+    for size in args.sizes:
+        results = {}
+        for name, checkout in (("per-item commits", legacy_checkout), ("single transaction", start_checkout)):
+            samples = []
+            for _ in range(args.repeat):
+                user_id += 1
+                cart = Cart(user_id=user_id)
+                db.add(cart)
+                db.flush()
+                db.add_all(CartItem(cart_id=cart.id, product_id=i, quantity=1, price=0) for i in range(1, size + 1))
+                db.commit()
+                db.expunge_all()
+
+                statements.clear()
+                start = time.perf_counter()
+                checkout(user_id=user_id, db=db)
+                samples.append((time.perf_counter() - start) * 1000)
+                db.expunge_all()
+            results[name] = (len(statements), statistics.median(samples))
+
+        print(f"{size:3} items: " + "   ".join(
+            f"{name} {count:3} statements {median:7.2f} ms" for name, (count, median) in results.items()
+        ))
+
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare facet counting through the bitmap FacetIndex with the GROUP BY queries it replaces.
+
+Generates a synthetic catalog spread over many part categories, brands and models,
+loads it into a throwaway SQLite database and into a FacetIndex, then counts the same
+filter combinations both ways.
+
+    cd backend && PYTHONPATH=src python benchmarks/facet_counts.py --products 500000
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.crud import filter_products
+from app.models.product import Product
+from app.services.facets import FACETS, FacetIndex
+from fuzzy_search import make_products, timed
+
+FILTERS = [
+    {},
+    {"brand_category_id": 3},
+    {"brand_category_id": 3, "part_category_id": 5},
+    {"min_price": 20, "max_price": 80},
+    {"brand_category_id": 7, "model_category_id": 40, "max_price": 150},
+]
+
+
+def sql_counts(db, min_price=None, max_price=None, **filters):
+    facets = {}
+    for facet in FACETS:
+        others = {name: value for name, value in filters.items() if name != facet}
+        query = filter_products(
+            db.query(getattr(Product, facet), func.count()), min_price=min_price, max_price=max_price, **others
+        )
+        facets[facet] = dict(query.group_by(getattr(Product, facet)).all())
+    total = filter_products(db.query(func.count(Product.id)), min_price=min_price, max_price=max_price, **filters).scalar()
+    return {"total": total, "facets": facets}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    products = []
+    for product in make_products(args.products):
+        product["part_category_id"] = rng.randrange(1, 31)
+        product["model_category_id"] = rng.randrange(1, 201)
+        products.append(product)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Product.__table__])
+    db = sessionmaker(bind=engine)()
+    db.bulk_insert_mappings(Product, products)
+    db.commit()
+
+    start = time.perf_counter()
+    index = FacetIndex()
+    index.start_rebuild()
+    index.build({name: product[name] for name in ("id", "price", *FACETS)} for product in products)
+    print(f"indexed {len(products)} products in {time.perf_counter() - start:.1f}s")
+
+    for filters in FILTERS:
+        sql_median, _, expected = timed(lambda: sql_counts(db, **filters), args.repeat)
+        bitmap_median, _, counts = timed(lambda: index.counts(**filters), args.repeat)
+        assert counts["total"] == expected["total"]
+        print(f"{str(filters):70} total {counts['total']:7}  "
+              f"GROUP BY {sql_median:8.2f} ms  bitmaps {bitmap_median:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
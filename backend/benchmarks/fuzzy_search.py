@@ -0,0 +1,97 @@
+"""
+Compare the trigram fuzzy search with the ILIKE query it replaces.
+
+Generates a synthetic catalog, loads it into a throwaway SQLite database and into a
+SearchIndex, then times the same typo'd brand-scoped queries against both paths. The
+fuzzy timing includes sorting out the first page of 20 results.
+
+    cd backend && PYTHONPATH=src python benchmarks/fuzzy_search.py --products 500000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.crud import search_products_given_make
+from app.models.product import Product
+from app.services.search import SearchIndex, make_document
+
+BRANDS = ["Bosch", "Brembo", "Mobil", "Castrol", "Denso", "NGK", "Moog", "Monroe", "Bilstein", "Akebono"]
+PARTS = ["Oil Filter", "Brake Pad", "Spark Plug", "Shock Absorber", "Air Filter", "Wiper Blade", "Motor Oil", "Rotor"]
+GRADES = ["0W-20", "5W-20", "5W-30", "10W-30", "10W-40", "15W-40"]
+
+QUERIES = ["bosh", "5W-3O", "brembo pad", "spark plgu", "castorl 10w-40", "bilstien shock"]
+
+
+def make_products(count: int):
+    rng = random.Random(42)
+    for i in range(1, count + 1):
+        brand = rng.randrange(len(BRANDS))
+        part = rng.choice(PARTS)
+        grade = rng.choice(GRADES)
+        part_number = f"{BRANDS[brand][:3].upper()}-{rng.randrange(10000, 99999)}"
+        yield {
+            "id": i,
+            "name": f"{BRANDS[brand]} {part} {grade} {part_number} #{i}",
+            "description": f"{part} for everyday driving",
+            "price": round(rng.uniform(5, 500), 2),
+            "tags": f'["{part.lower()}", "{grade.lower()}"]',
+            "images": "[]",
+            "thumbnail": "",
+            "part_category_id": 1,
+            "brand_category_id": brand + 1,
+            "model_category_id": 1,
+        }
+
+
+def timed(function, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples), result
+
+
+def fuzzy_page(index: SearchIndex, query: str, threshold: float, limit: int = 20):
+    # Times one page, as the search route serves it, and counts every match
+    ranked = index.fuzzy_search(query, threshold=threshold, brand_category_id=1)
+    page = ranked[:limit]
+    return page, len(ranked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.3)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Product.__table__])
+    db = sessionmaker(bind=engine)()
+
+    products = list(make_products(args.products))
+    db.bulk_insert_mappings(Product, products)
+    db.commit()
+
+    start = time.perf_counter()
+    index = SearchIndex()
+    index.build(make_document(product) for product in products)
+    print(f"indexed {args.products} products in {time.perf_counter() - start:.1f}s")
+    print()
+    print(f"{'query':<18} {'ILIKE ms':>10} {'hits':>6} {'fuzzy ms':>10} {'max ms':>8} {'hits':>6}")
+
+    for query in QUERIES:
+        ilike_ms, _, ilike_hits = timed(lambda: search_products_given_make(make_id=1, search_terms=query, db=db), args.repeat)
+        fuzzy_ms, fuzzy_max, (_, fuzzy_hits) = timed(lambda: fuzzy_page(index, query, args.threshold), args.repeat)
+        print(f"{query:<18} {ilike_ms:>10.2f} {len(ilike_hits):>6} {fuzzy_ms:>10.2f} {fuzzy_max:>8.2f} {fuzzy_hits:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Drive shopper journeys against the app and report the throughput and latency of each step.
+
+Seeds a throwaway SQLite file (or the database behind --database-url, e.g. a local
+PostgreSQL) with --products products and --users shoppers, serves the app with uvicorn
+in a subprocess, and runs --clients concurrent shoppers for --seconds. Each journey logs
+in, browses the brands and one brand's products, searches, views a product, adds it to
+the cart, checks out, completes the order and opens the order history.
+
+Writes the results as JSON to --output. With --baseline, prints each step's change
+against an earlier run and exits with status 1 if a step's p95 grew by more than
+--max-regression, or its error rate went up.
+
+    cd backend && PYTHONPATH=src python benchmarks/loadtest.py --output /tmp/run.json
+    cd backend && PYTHONPATH=src python benchmarks/loadtest.py --baseline benchmarks/loadtest_baseline.json
+
+The committed baseline was taken with the defaults on SQLite; compare runs made on the
+same machine and database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+PASSWORD = "pit-stop"
+
+STEPS = [
+    "login",
+    "browse_brands",
+    "browse_brand_products",
+    "search",
+    "view_product",
+    "add_to_cart",
+    "start_checkout",
+    "checkout_addresses",
+    "update_order",
+    "complete_checkout",
+    "order_history",
+]
+
+
+def seed(database_url: str, products: int, users: int):
+    """
+    Create the tables and fill them with a catalog and verified shoppers with an address
+    each. The database must be empty, as the rows refer to each other by the ids a new
+    table hands out.
+    """
+    # Read when the engine is created, so set before the app is imported
+    os.environ["SQLALCHEMY_DATABASE_URL"] = database_url
+    from sqlalchemy import insert
+
+    from fuzzy_search import BRANDS, make_products
+
+    from app.core.database import Base, SessionLocal, engine
+    from app.core.security import pwd_context
+    from app.models import cart, order, outbox, support  # noqa: F401  create_all makes every table
+    from app.models.address import Address
+    from app.models.product import BrandCategory, ModelCategory, PartCategory, Product
+    from app.models.user import User
+
+    Base.metadata.create_all(bind=engine)
+    password_hash = pwd_context.hash(PASSWORD)
+
+    db = SessionLocal()
+    try:
+        db.execute(insert(PartCategory), [{"part_type_name": "Parts", "part_type_description": "-"}])
+        db.execute(insert(BrandCategory), [
+            {"brand_type_name": brand, "brand_type_description": "-"} for brand in BRANDS
+        ])
+        db.execute(insert(ModelCategory), [{"brand_id": 1, "model_name": "Any"}])
+        batch = []
+        for product in make_products(products):
+            batch.append(product)
+            if len(batch) == 5000:
+                db.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            db.execute(insert(Product), batch)
+
+        db.execute(insert(User), [
+            {"username": f"shopper{n}", "email": f"shopper{n}@example.com", "password_hash": password_hash,
+             "is_active": True, "is_verified": True, "is_admin": False}
+            for n in range(1, users + 1)
+        ])
+        db.execute(insert(Address), [
+            {"user_id": n, "street_address": f"{n} Main St", "city": "San Diego", "state": "CA", "postal_code": "92182",
+             "country": "US", "is_billing": True, "is_shipping": True}
+            for n in range(1, users + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    engine.dispose()
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+        self.journeys = 0
+
+    async def step(self, name: str, request):
+        """
+        Time one request of a journey. Returns the response, or None if it failed.
+        """
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.TransportError:
+            self.errors[name] += 1
+            return None
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append((time.perf_counter() - start) * 1000)
+        return response
+
+
+def percentile(ordered: list, fraction: float):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 3)
+
+
+async def journey(client: httpx.AsyncClient, recorder: Recorder, username: str, products: int, rng: random.Random):
+    """
+    One shopper's visit, from logging in to the order history; stops at the first failed step.
+    """
+    from fuzzy_search import BRANDS, QUERIES
+
+    response = await recorder.step("login", client.post("/users/token", data={"username": username, "password": PASSWORD}))
+    if response is None:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    if await recorder.step("browse_brands", client.get("/product/brandcategories")) is None:
+        return
+    brand_id = rng.randrange(len(BRANDS)) + 1
+    if await recorder.step("browse_brand_products", client.get("/product/get/brandcategory", params={"brand_category_id": brand_id})) is None:
+        return
+
+    response = await recorder.step("search", client.get("/search/", params={"q": rng.choice(QUERIES), "mode": "fuzzy"}))
+    if response is None:
+        return
+    items = response.json().get("items") or []
+    product_id = rng.choice(items)["id"] if items else rng.randrange(products) + 1
+    if await recorder.step("view_product", client.get("/product/get", params={"product_id": product_id})) is None:
+        return
+
+    if await recorder.step("add_to_cart", client.post("/cart/add", json={"product_id": product_id, "quantity": rng.randint(1, 3)}, headers=headers)) is None:
+        return
+    if await recorder.step("start_checkout", client.post("/checkout/", headers=headers)) is None:
+        return
+    response = await recorder.step("checkout_addresses", client.get("/checkout/address/all", headers=headers))
+    if response is None:
+        return
+    address_id = response.json()[0]["id"]
+    update = {
+        "shipping_address_id": address_id,
+        "billing_address_id": address_id,
+        "shipping_method": "Regular Shipping(3-5 Days)",
+        "payment_method": "Card",
+    }
+    if await recorder.step("update_order", client.patch("/checkout/order", json=update, headers=headers)) is None:
+        return
+    complete = client.post("/checkout/complete", headers={**headers, "Idempotency-Key": str(uuid.uuid4())})
+    if await recorder.step("complete_checkout", complete) is None:
+        return
+    if await recorder.step("order_history", client.get("/orders/", headers=headers)) is None:
+        return
+    recorder.journeys += 1
+
+
+async def run(base_url: str, clients: int, seconds: float, users: int, products: int, seed_value: int) -> tuple[Recorder, float]:
+    recorder = Recorder()
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def shopper(n: int):
+            rng = random.Random(seed_value + n)
+            visit = 0
+            while time.perf_counter() < deadline:
+                # Each shopper logs in as its own users, so no two check out the same cart at once
+                user = (n + visit * clients) % users + 1
+                await journey(client, recorder, f"shopper{user}", products, rng)
+                visit += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(shopper(n) for n in range(clients)))
+        elapsed = time.perf_counter() - start
+    return recorder, elapsed
+
+
+def summarize(recorder: Recorder, elapsed: float, config: dict) -> dict:
+    steps = {}
+    for step in STEPS:
+        ordered = sorted(recorder.latencies[step])
+        count = len(ordered)
+        steps[step] = {
+            "requests": count,
+            "errors": recorder.errors[step],
+            "throughput_rps": round(count / elapsed, 2),
+            "p50_ms": percentile(ordered, 0.50),
+            "p95_ms": percentile(ordered, 0.95),
+            "p99_ms": percentile(ordered, 0.99),
+        }
+    return {
+        "config": config,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "elapsed_seconds": round(elapsed, 2),
+        "journeys": recorder.journeys,
+        "journeys_per_second": round(recorder.journeys / elapsed, 2),
+        "steps": steps,
+    }
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> bool:
+    """
+    Print each step next to the baseline. Returns whether every step is within bounds.
+    """
+    passed = True
+    if result["config"] != baseline["config"]:
+        print(f"\nwarning: the baseline ran with {baseline['config']}")
+    print(f"\n{'step':22} {'p95 base':>10} {'p95 now':>10} {'change':>8}  errors")
+    for step in STEPS:
+        now, base = result["steps"][step], baseline["steps"].get(step)
+        if base is None or base["p95_ms"] is None or now["p95_ms"] is None:
+            print(f"{step:22} {'-':>10} {now['p95_ms'] or '-':>10}")
+            continue
+        change = now["p95_ms"] / base["p95_ms"] - 1
+        error_rate = now["errors"] / max(now["requests"] + now["errors"], 1)
+        base_error_rate = base["errors"] / max(base["requests"] + base["errors"], 1)
+        regressed = change > max_regression or error_rate > base_error_rate
+        passed = passed and not regressed
+        print(f"{step:22} {base['p95_ms']:10.1f} {now['p95_ms']:10.1f} {change:+8.0%}  "
+              f"{now['errors']}{'  REGRESSED' if regressed else ''}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="an empty database to seed; defaults to a throwaway SQLite file")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=20, help="shoppers browsing at once")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the shoppers' random choices")
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="largest allowed p95 growth per step, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    path = None
+    if args.database_url is None:
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+    database_url = args.database_url or f"sqlite:///{path}"
+    seed(database_url, products=args.products, users=args.users)
+
+    env = {**os.environ, "SQLALCHEMY_DATABASE_URL": database_url, "LOG_FILE": os.devnull}
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    try:
+        with httpx.Client(base_url=base_url) as client:
+            for _ in range(300):
+                try:
+                    client.get("/product/brandcategories")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+
+        print(f"{args.clients} shoppers for {args.seconds:.0f}s, {args.products} products, {args.users} users")
+        recorder, elapsed = asyncio.run(run(base_url, args.clients, args.seconds, args.users, args.products, args.seed))
+    finally:
+        server.terminate()
+        server.wait()
+        if path:
+            os.remove(path)
+
+    config = {key: getattr(args, key) for key in ("products", "users", "clients", "seconds", "workers", "seed")}
+    config["database"] = "sqlite" if path else database_url.split(":", 1)[0]
+    result = summarize(recorder, elapsed, config)
+
+    print(f"{result['journeys']} journeys, {result['journeys_per_second']}/s")
+    print(f"{'step':22} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  errors")
+    for step, stats in result["steps"].items():
+        print(f"{step:22} {stats['throughput_rps']:8.1f} {stats['p50_ms'] or 0:8.1f} {stats['p95_ms'] or 0:8.1f} "
+              f"{stats['p99_ms'] or 0:8.1f}  {stats['errors']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as stream:
+            json.dump(result, stream, indent=2)
+            stream.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as stream:
+            baseline = json.load(stream)
+        if not compare(result, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
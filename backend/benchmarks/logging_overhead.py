@@ -0,0 +1,136 @@
+"""
+Measure the per-request cost of the request logging middleware, before and after it
+moved to the log queue.
+
+Calls a one-route Starlette app directly over ASGI, with no server or network in the
+way, bare and wrapped in each middleware. "before" is a copy of the old
+`BaseHTTPMiddleware` that wrote three text lines, headers included, straight to a file;
+"after" is the current middleware with the JSON writer thread behind it. Both write to
+throwaway files.
+
+    cd backend && PYTHONPATH=src python benchmarks/logging_overhead.py --requests 20000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+
+def build_apps(before_log: str, after_log: str):
+    from starlette.applications import Starlette
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    settings.LOG_FILE = after_log
+    from app.middleware.logging_middleware import LoggingMiddleware
+
+    before_logger = logging.getLogger("bench_before")
+    before_logger.propagate = False
+    before_handler = logging.FileHandler(before_log, mode="a")
+    before_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    before_logger.addHandler(before_handler)
+
+    class BlockingLoggingMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            start_time = time.time()
+
+            before_logger.info(f"Incoming Request: {request.method} {request.url}")
+            before_logger.info(f"Headers: {request.headers}")
+
+            response = await call_next(request)
+
+            process_time = time.time() - start_time
+            before_logger.info(f"Completed in {process_time:.4f}s with status code {response.status_code}")
+
+            return response
+
+    async def product(request):
+        return JSONResponse({"id": 1, "name": "Brake Pad", "price": 42.0})
+
+    def app(middleware=None):
+        instance = Starlette(routes=[Route("/product/get", product)])
+        if middleware:
+            instance.add_middleware(middleware)
+        return instance
+
+    return {
+        "none": app(),
+        "before": app(BlockingLoggingMiddleware),
+        "after": app(LoggingMiddleware),
+    }
+
+
+async def call(app, scope):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def measure(app, requests: int):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/product/get", "raw_path": b"/product/get", "root_path": "", "query_string": b"product_id=1",
+        "headers": [
+            (b"host", b"shop.example.com"), (b"user-agent", b"bench"), (b"accept", b"application/json"),
+            (b"authorization", b"Bearer eyJhbGciOiJIUzI1NiJ9.e30.signature"), (b"cookie", b"session=secret"),
+        ],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+    }
+    for _ in range(min(requests, 500)):
+        await call(app, dict(scope))
+
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await call(app, dict(scope))
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="share of 2xx requests the new middleware logs")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    before_log, after_log = os.path.join(directory, "before.log"), os.path.join(directory, "after.log")
+    apps = build_apps(before_log, after_log)
+
+    from app.core.config import get_settings
+    from app.core.logging_config import get_logging_stats
+
+    get_settings().LOG_SUCCESS_SAMPLE_RATE = args.sample_rate
+
+    print(f"{args.requests} requests per middleware, 2xx sample rate {args.sample_rate}")
+    results = {}
+    for name, app in apps.items():
+        samples = sorted(asyncio.run(measure(app, args.requests)))
+        results[name] = statistics.mean(samples)
+        print(f"{name:6}: mean {results[name]:8.1f} us, p50 {statistics.median(samples):8.1f} us, "
+              f"p99 {samples[len(samples) * 99 // 100]:8.1f} us")
+
+    for name in ("before", "after"):
+        print(f"{name} overhead: {results[name] - results['none']:8.1f} us per request")
+
+    time.sleep(0.5)
+    print(f"log writer: {get_logging_stats()}")
+    for path in (before_log, after_log):
+        if os.path.exists(path):
+            os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
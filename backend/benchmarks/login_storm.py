@@ -0,0 +1,120 @@
+"""
+Measure catalog latency while a storm of logins hits the same server.
+
+Starts the app under uvicorn against a throwaway SQLite file and times GET /product/
+alone, then while --logins threads log in as fast as they can. With --blocking the
+storm goes to an `async def` copy of the old login route that checks the password on
+the event loop, to compare against.
+
+    cd backend && PYTHONPATH=src python benchmarks/login_storm.py --logins 16
+    cd backend && PYTHONPATH=src python benchmarks/login_storm.py --logins 16 --blocking
+"""
+import argparse
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+
+
+def latencies(client: httpx.Client, requests: int):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get("/product/", params={"limit": 20}).raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def summary(samples):
+    ordered = sorted(samples)
+    return f"p50 {statistics.median(ordered):7.2f} ms, p99 {ordered[len(ordered) * 99 // 100]:7.2f} ms, max {ordered[-1]:7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=16, help="threads logging in during the storm")
+    parser.add_argument("--requests", type=int, default=200, help="catalog requests timed per phase")
+    parser.add_argument("--blocking", action="store_true", help="hash on the event loop, as the login route used to")
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    # Read when the engine is created, so set before the app is imported
+    os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{path}"
+
+    from fastapi import Depends, Form
+    from app.core.security import hash_executor, pwd_context
+    from app.crud import get_user_by_username
+    from app.dependencies import get_db
+    from app.main import app
+
+    @app.post("/bench/blocking-token")
+    async def blocking_login(username: str = Form(), password: str = Form(), db=Depends(get_db)):
+        user = get_user_by_username(db, username)
+        return {"ok": pwd_context.verify(password, user.password_hash)}
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}"
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        client.post("/admin/add-part-category", json={"part_type_name": "Brakes", "part_type_description": "-"})
+        client.post("/admin/add-brand-category", json={"brand_type_name": "Bosch", "brand_type_description": "-"})
+        client.post("/admin/add-model-category", json={"brand_id": 1, "model_name": "Any"})
+        for n in range(50):
+            client.post("/admin/products", json={
+                "name": f"Brake Pad {n}", "description": "-", "price": 10 + n, "tags": [], "images": [], "thumbnail": "-",
+                "part_category_id": 1, "brand_category_id": 1, "model_category_id": 1,
+            }).raise_for_status()
+        client.post("/users/register", json={"username": "driver", "email": "driver@example.com", "password": "pit-stop"}).raise_for_status()
+
+        idle = latencies(client, args.requests)
+        print(f"catalog, idle:        {summary(idle)}")
+
+        stop = threading.Event()
+        outcomes = {"ok": 0, "rejected": 0}
+        lock = threading.Lock()
+
+        def storm():
+            with httpx.Client(base_url=base_url, timeout=60) as login_client:
+                while not stop.is_set():
+                    response = login_client.post(
+                        "/bench/blocking-token" if args.blocking else "/users/token",
+                        data={"username": "driver", "password": "pit-stop"},
+                    )
+                    with lock:
+                        outcomes["ok" if response.status_code == 200 else "rejected"] += 1
+
+        threads = [threading.Thread(target=storm) for _ in range(args.logins)]
+        for thread in threads:
+            thread.start()
+        time.sleep(1)
+        start = time.perf_counter()
+        stormy = latencies(client, args.requests)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        mode = "on the event loop" if args.blocking else "on the hash executor"
+        print(f"catalog, login storm: {summary(stormy)}  ({args.logins} login threads hashing {mode})")
+        print(f"logins: {outcomes['ok']} ok, {outcomes['rejected']} rejected, "
+              f"{outcomes['ok'] / (elapsed + 1):.1f}/s")
+        if not args.blocking:
+            print(f"hash executor: {hash_executor.stats()}")
+
+    server.should_exit = True
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
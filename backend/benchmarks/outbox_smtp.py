@@ -0,0 +1,139 @@
+"""
+Complete orders and drain the outbox against a local SMTP stub, checking that every
+order gets exactly one confirmation email and that failed deliveries are retried.
+
+The stub rejects the first --failures messages with a temporary error. Runs against a
+throwaway SQLite file, with retries set to wait no time:
+
+    cd backend && PYTHONPATH=src python benchmarks/outbox_smtp.py --orders 20 --failures 3
+"""
+import argparse
+import os
+import socketserver
+import tempfile
+import threading
+import time
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, failures: int):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.failures = failures
+        self.messages = []
+        self.lock = threading.Lock()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 stub ready")
+        recipients = []
+        while line := self.rfile.readline():
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stub")
+            elif command.startswith("MAIL FROM"):
+                recipients = []
+                self.reply("250 OK")
+            elif command.startswith("RCPT TO"):
+                recipients.append(line.decode().strip()[8:])
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while (line := self.rfile.readline()) not in (b".\r\n", b""):
+                    data.append(line)
+                with self.server.lock:
+                    if self.server.failures > 0:
+                        self.server.failures -= 1
+                        self.reply("451 Try again later")
+                        continue
+                    self.server.messages.append((recipients, b"".join(data).decode()))
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--failures", type=int, default=3, help="messages the stub rejects first")
+    args = parser.parse_args()
+
+    stub = SMTPStub(failures=args.failures)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    # Read when the engine is created, so set before the app is imported
+    os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{path}"
+
+    from app.core.config import get_settings
+    from app.core.database import Base, SessionLocal, engine
+    from app.models.address import Address
+    from app.models.cart import Cart
+    from app.models.order import Order, OrderItem
+    from app.models.user import User
+    from app.services.checkout import update_order_address_in_db
+    from app.services.outbox import get_outbox_stats, process_batch, worker_stats
+
+    settings = get_settings()
+    settings.SMTP_SERVER = "127.0.0.1"
+    settings.SMTP_PORT = str(stub.server_address[1])
+    settings.SMTP_USE_TLS = False
+    settings.OUTBOX_RETRY_BASE_DELAY = 0
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    for n in range(args.orders):
+        user = User(username=f"driver{n}", email=f"driver{n}@pitstop.test", password_hash="-")
+        db.add(user)
+        db.flush()
+        cart = Cart(user_id=user.id)
+        address = Address(user_id=user.id, street_address="1 Main", city="Reno", state="NV", postal_code="89501",
+                          country="US", is_shipping=True, is_billing=True)
+        db.add_all([cart, address])
+        db.flush()
+        order = Order(user_id=user.id, cart_id=cart.id, shipping_address_id=address.id, billing_address_id=address.id,
+                      shipping_method="Regular Shipping(3-5 Days)", payment_method="Card", status="Pending",
+                      total_price=25.0)
+        db.add(order)
+        db.flush()
+        db.add(OrderItem(order_id=order.id, quantity=2, price=12.5, product_name="Brake Pads"))
+        db.commit()
+
+        start = time.perf_counter()
+        update_order_address_in_db(order=order, db=db)
+    print(f"completed {args.orders} orders, last one in {(time.perf_counter() - start) * 1000:.2f} ms "
+          f"with {get_outbox_stats(db)['pending']} events pending")
+
+    start = time.perf_counter()
+    while process_batch(db, batch_size=8):
+        pass
+    elapsed = time.perf_counter() - start
+    stats = get_outbox_stats(db)
+    print(f"drained the outbox in {elapsed:.2f}s: {stats}, worker {worker_stats}")
+
+    recipients = sorted(to for to, _ in stub.messages)
+    assert len(recipients) == args.orders, f"expected {args.orders} emails, got {len(recipients)}"
+    assert len(set(map(tuple, recipients))) == args.orders, "an order was emailed twice"
+    assert stats["pending"] == 0 and stats["failed"] == 0
+    assert worker_stats["retried"] == args.failures
+
+    db.close()
+    engine.dispose()
+    stub.shutdown()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Measure search-as-you-type latency of the suggest index.
+
+Loads a synthetic catalog into a SuggestIndex and replays every prefix of a set of
+queries, the way a search box sends one request per keystroke.
+
+    cd backend && PYTHONPATH=src python benchmarks/suggest_latency.py --products 500000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from fuzzy_search import BRANDS, PARTS, make_products
+from app.services.suggest import SuggestIndex
+
+QUERIES = ["bosch oil", "brembo brake pad", "spark plug", "castrol 5w-30", "mon", "shock absorber", "bos-1", "wiper"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    documents = [
+        {"kind": "product", "id": product["id"], "text": product["name"], "weight": rng.randrange(50)}
+        for product in make_products(args.products)
+    ]
+    documents += [{"kind": "brand", "id": i + 1, "text": name, "weight": 1000} for i, name in enumerate(BRANDS)]
+    documents += [{"kind": "part", "id": i + 1, "text": name, "weight": 1000} for i, name in enumerate(PARTS)]
+
+    start = time.perf_counter()
+    index = SuggestIndex()
+    index.start_rebuild()
+    index.build(documents)
+    print(f"indexed {len(documents)} names in {time.perf_counter() - start:.1f}s")
+
+    samples = []
+    for _ in range(args.rounds):
+        for query in QUERIES:
+            for length in range(1, len(query) + 1):
+                begin = time.perf_counter()
+                index.suggest(query[:length])
+                samples.append((time.perf_counter() - begin) * 1000)
+
+    samples.sort()
+    print(f"{len(samples)} lookups: "
+          f"p50 {statistics.median(samples):.3f} ms, "
+          f"p99 {samples[int(len(samples) * 0.99)]:.3f} ms, "
+          f"max {samples[-1]:.3f} ms")
+
+    start = time.perf_counter()
+    for i in range(100):
+        index.add({"kind": "product", "id": args.products + i + 1, "text": f"Bosch Oil Filter New {i}"})
+    print(f"100 incremental adds: {(time.perf_counter() - start) * 10:.3f} ms each")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import time
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 
 import jwt
@@ -5,10 +7,12 @@ from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException
 
+from app.core.cache import TTLCache
 from app.core.config import get_settings
-from app.models.user import User
-from app.dependencies import get_db
+from app.crud import get_user_by_username
+from app.dependencies import get_async_db, get_db
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 
@@ -24,6 +28,26 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Decoded claims per token signature, and the user behind each username, so a repeat
+# token is checked without decoding it or reading the user. Writes to a user through
+# this worker drop its entry; writes through other workers show up on expiry.
+claims_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAXSIZE, ttl=settings.AUTH_CACHE_TTL, name="auth_claims")
+user_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAXSIZE, ttl=settings.AUTH_CACHE_TTL, name="auth_users")
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    The columns of the authenticated user that routes read, detached from any session.
+    """
+    id: int
+    username: str
+    email: str
+    is_active: bool
+    is_verified: bool
+    is_admin: bool
+    created_at: datetime
+
 
 def get_password_hash(password: str):
     return pwd_context.hash(password)
@@ -41,29 +65,91 @@ def decode_access_token(token: str):
     except:
         return None
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _decode_cached(token: str):
+    """
+    Decode a token, reusing the claims of an earlier request with the same token.
+    """
+    signed, _, signature = token.rpartition(".")
+    entry = claims_cache.get(signature)
+    # A signature only vouches for the header and claims it was made for
+    if entry is not None and entry[0] == signed and entry[1].get("exp", 0) > time.time():
+        return entry[1]
+
+    payload = decode_access_token(token)
+    if payload is not None:
+        claims_cache.set(signature, (signed, payload))
+    return payload
+
+def invalidate_user(username: str):
+    """
+    Drop the cached user, after a write that changes it.
+    """
+    user_cache.invalidate(username)
+
+def _credentials_exception():
+    return HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"}
     )
 
-    print("User Token: {}".format(token))
+def _authenticate(token: str):
+    """
+    The username a token was issued to, and the cached user for it, if any.
+    """
+    credentials_exception = _credentials_exception()
 
+    use_cache = settings.AUTH_CACHE_TTL > 0
     try:
-        payload = decode_access_token(token)
+        payload = _decode_cached(token) if use_cache else decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except:
         raise credentials_exception
 
-    user = db.query(User).filter(User.username == username).first()
+    return username, user_cache.get(username) if use_cache else None
+
+def _remember_user(username: str, db_user, generation: int):
+    """
+    Detach a user read from the database from its session, and cache it.
+    """
+    if db_user is None:
+        raise _credentials_exception()
+    user = CurrentUser(
+        id=db_user.id,
+        username=db_user.username,
+        email=db_user.email,
+        is_active=db_user.is_active,
+        is_verified=db_user.is_verified,
+        is_admin=db_user.is_admin,
+        created_at=db_user.created_at,
+    )
+    if settings.AUTH_CACHE_TTL > 0:
+        user_cache.set(username, user, generation=generation)
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    username, user = _authenticate(token)
     if user is None:
-        raise credentials_exception
+        generation = user_cache.generation
+        user = _remember_user(username, await db.run_sync(get_user_by_username, username), generation)
+    return user
 
+def get_current_user_sync(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    # For routes on get_db, so a cache miss reads the user through the route's own
+    # session instead of holding a second connection from the async pool
+    username, user = _authenticate(token)
+    if user is None:
+        generation = user_cache.generation
+        user = _remember_user(username, get_user_by_username(db, username), generation)
     return user
 
+async def get_current_admin(current_user: CurrentUser = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 def check_admin_pass(password: str):
     #hash_pwd = pwd_context.hash(password)
     hash_pwd = password
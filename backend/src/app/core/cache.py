@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.metrics import register_collector
+
+# Caches created with a name, by name, to report in the metrics
+caches = {}
+
+
+class TTLCache:
+    """
+    A thread-safe, in-process LRU cache whose entries also expire after `ttl` seconds.
+
+    The cache holds at most `maxsize` entries; inserting into a full cache evicts the
+    least recently used one. Every invalidation bumps `generation`, so a reader that
+    loaded a value before a concurrent write can pass the generation it started with
+    to `set` and the stale value is dropped instead of being cached.
+
+    Each worker process has its own cache, so writes made through another worker are
+    only picked up once the entry expires.
+
+    A cache given a `name` reports its counters in the metrics under that name.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: str | None = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if name is not None:
+            caches[name] = self
+
+    def get(self, key):
+        """
+        Return the cached value for `key`, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation: int | None = None):
+        """
+        Cache `value` under `key`.
+
+        If `generation` is given and an invalidation happened since it was read,
+        the value may be stale and is not stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        """
+        Drop the given keys from the cache.
+        """
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def invalidate_where(self, predicate) -> int:
+        """
+        Drop every key for which `predicate(key)` is true.
+
+        Returns:
+            int: The number of entries dropped.
+        """
+        with self._lock:
+            self.generation += 1
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+@register_collector
+def cache_metric_families() -> list:
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    families = [
+        {
+            "name": "cache_entries",
+            "type": "gauge",
+            "help": "Entries held by the cache.",
+            "samples": [[{"cache": name}, cache["size"]] for name, cache in stats.items()],
+        },
+    ]
+    for counter in ("hits", "misses", "evictions", "expirations"):
+        families.append({
+            "name": f"cache_{counter}_total",
+            "type": "counter",
+            "help": f"Cache {counter}.",
+            "samples": [[{"cache": name}, cache[counter]] for name, cache in stats.items()],
+        })
+    return families
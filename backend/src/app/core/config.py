@@ -14,6 +14,17 @@ load_dotenv()
 
 class Settings(BaseSettings):
     SQLALCHEMY_DATABASE_URL: str
+    # Defaults to SQLALCHEMY_DATABASE_URL with the asyncpg or aiosqlite driver
+    ASYNC_DATABASE_URL: str | None = None
+
+    # Per engine; the sync and async engines have a pool each
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    # Test connections before use, so ones the server has dropped are replaced instead of failing a request
+    DB_POOL_PRE_PING: bool = True
+    # Seconds before a connection is replaced; -1 keeps connections open indefinitely
+    DB_POOL_RECYCLE: int = 1800
     SECRET_KEY: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
@@ -23,9 +34,68 @@ class Settings(BaseSettings):
     SMTP_PORT: str
     SENDER_EMAIL: str
     SENDER_PASSWORD: str
+    # Turn off to deliver to a local SMTP stub, which takes mail without TLS or a login
+    SMTP_USE_TLS: bool = True
 
     ADMIN_PASS: str
 
+    CATALOG_CACHE_MAXSIZE: int = 2048
+    CATALOG_CACHE_TTL: float = 60.0
+
+    SEARCH_INDEX_MAX_AGE: float = 300.0
+    SEARCH_FUZZY_THRESHOLD: float = 0.3
+
+    # Set the TTL to 0 to read the cart badge from the database on every request
+    CART_SUMMARY_CACHE_MAXSIZE: int = 10000
+    CART_SUMMARY_CACHE_TTL: float = 30.0
+
+    # Set the TTL to 0 to decode the token and read the user on every request
+    AUTH_CACHE_MAXSIZE: int = 10000
+    AUTH_CACHE_TTL: float = 60.0
+
+    IDEMPOTENCY_KEY_TTL: float = 86400.0
+    IDEMPOTENCY_CLEANUP_BATCH_SIZE: int = 1000
+
+    # Hashes run at once, and hashes allowed to wait for a thread before logins get a 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    # Retries wait the base delay, doubled after each failed attempt, up to the maximum
+    OUTBOX_RETRY_BASE_DELAY: float = 5.0
+    OUTBOX_RETRY_MAX_DELAY: float = 3600.0
+
+    LOG_FILE: str = "app.log"
+    # Records waiting for the log writer; beyond this they are dropped rather than block a request
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_BATCH_SIZE: int = 256
+    # Share of 2xx requests logged; errors and slow requests are always logged
+    LOG_SUCCESS_SAMPLE_RATE: float = 1.0
+    LOG_SLOW_REQUEST_MS: float = 1000.0
+    # Comma-separated header and query parameter names whose values are never logged
+    LOG_REDACTED_FIELDS: str = "authorization,cookie,set-cookie,proxy-authorization,x-api-key,x-profile-request,verification_code,token,password"
+
+    # Set to a directory shared by the workers to report the metrics of all of them
+    METRICS_DIR: str | None = None
+    METRICS_WRITE_INTERVAL: float = 5.0
+
+    # For development and tests: record where each query comes from and log requests likely running N+1 queries
+    QUERY_DEBUG: bool = False
+    # Runs of one statement within a request that count as a likely N+1
+    QUERY_REPEAT_THRESHOLD: int = 5
+
+    # Signs the profile request header; defaults to SECRET_KEY
+    PROFILE_SECRET: str | None = None
+    # Share of requests profiled without the header
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL: float = 0.005
+    PROFILE_DIR: str = "profiles"
+    # Profiles kept on disk; older ones are deleted
+    PROFILE_MAX_FILES: int = 50
+    PROFILE_TOKEN_MAX_TTL: int = 3600
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
@@ -45,17 +115,30 @@ def send_verification_email(to_email: str, verification_code: str):
     #sender_email = os.getenv("SENDER_EMAIL")
     #sender_password = os.getenv("SENDER_PASSWORD")
 
-    smtp_server = settings.SMTP_SERVER
-    smtp_port = settings.SMTP_PORT
-    sender_email = settings.SENDER_EMAIL
-    sender_password = settings.SENDER_PASSWORD
-
     verification_link = f"http://localhost:8000/users/verify-email?verification_code={verification_code}"
 
     # Create the email content
     subject = "Pitstop Performance - Verify Your Email"
     body = f"Click the link to verify your email: {verification_link}"
 
+    try:
+        send_email(to_email=to_email, subject=subject, body=body)
+        print(f"Verification email sent to {to_email}")
+    except Exception as e:
+        print(f"Error sending email: {e}")
+        raise HTTPException(status_code=500, detail="Error sending verification email")
+
+def send_email(to_email: str, subject: str, body: str):
+    """
+    Sends a plain text email from the shop's sender address.
+
+    Raises the smtplib error if the mail could not be delivered.
+    """
+    smtp_server = settings.SMTP_SERVER
+    smtp_port = int(settings.SMTP_PORT)
+    sender_email = settings.SENDER_EMAIL
+    sender_password = settings.SENDER_PASSWORD
+
     # Set up the MIME
     message = MIMEMultipart()
     message["From"] = sender_email
@@ -63,16 +146,12 @@ def send_verification_email(to_email: str, verification_code: str):
     message["Subject"] = subject
     message.attach(MIMEText(body, "plain"))
 
-    try:
-        # Connect to the Gmail SMTP server
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
+    # Connect to the Gmail SMTP server
+    with smtplib.SMTP(smtp_server, smtp_port, timeout=30) as server:
+        if settings.SMTP_USE_TLS:
             server.starttls()  # Secure the connection
             server.login(sender_email, sender_password)
-            text = message.as_string()
-            server.sendmail(sender_email, to_email, text)
-        print(f"Verification email sent to {to_email}")
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        raise HTTPException(status_code=500, detail="Error sending verification email")
+        text = message.as_string()
+        server.sendmail(sender_email, to_email, text)
 
 settings = get_settings()
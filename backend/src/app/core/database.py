@@ -1,13 +1,163 @@
+import threading
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.core.config import settings
+from app.core.metrics import WAIT_BUCKETS, Histogram, register_collector
 
 SQLALCHEMY_DATABASE_URL = settings.SQLALCHEMY_DATABASE_URL
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# The async drivers of the supported databases, by the backend name of the sync URL
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def get_async_database_url(url: str) -> str:
+    """
+    The URL of the same database for its async driver, e.g. postgresql+asyncpg:// for
+    postgresql:// or postgresql+psycopg2://.
+    """
+    url = make_url(url)
+    return url.set(drivername=f"{url.get_backend_name()}+{ASYNC_DRIVERS[url.get_backend_name()]}").render_as_string(hide_password=False)
+
+
+class PoolMetrics:
+    """
+    How long connection checkouts from a pool take and how many time out.
+    """
+
+    def __init__(self):
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.timeouts = 0
+        self.engine = None
+        self._lock = threading.Lock()
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self) -> dict:
+        """
+        The counters recorded here, and the state of the pool if it is a QueuePool. Other
+        pools, such as the one of an in-memory SQLite database, do not track it.
+        """
+        stats = {
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait.snapshot(),
+        }
+        pool = self.engine.pool
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "max_overflow": settings.DB_MAX_OVERFLOW,
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "timeout": pool.timeout(),
+            })
+        return stats
+
+
+def instrumented_pool(pool_class, metrics: PoolMetrics):
+    """
+    A subclass of `pool_class` that records every checkout in `metrics`.
+    """
+    class InstrumentedPool(pool_class):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            except PoolTimeoutError:
+                metrics.timed_out()
+                raise
+            finally:
+                metrics.wait.observe(time.perf_counter() - start)
+
+    return InstrumentedPool
+
+
+def _engine_options(url: str, pool_class, metrics: PoolMetrics) -> dict:
+    # An in-memory SQLite database lives in a single connection, so it keeps its own pool
+    if make_url(url).get_backend_name() == "sqlite" and make_url(url).database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": instrumented_pool(pool_class, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+# Synchronous sessions, for the routes not ported yet, scripts and jobs
+pool_metrics = PoolMetrics()
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options(SQLALCHEMY_DATABASE_URL, QueuePool, pool_metrics))
+pool_metrics.engine = engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async sessions, for the request hot paths. The two engines have a pool each, so a
+# worker can hold up to twice DB_POOL_SIZE + DB_MAX_OVERFLOW connections.
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or get_async_database_url(SQLALCHEMY_DATABASE_URL)
+async_pool_metrics = PoolMetrics()
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, async_pool_metrics))
+async_pool_metrics.engine = async_engine
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
+
+
+def get_pool_stats() -> dict:
+    """
+    Report the connections in use and the checkout waits and timeouts of both pools.
+    """
+    return {
+        "sync": pool_metrics.stats(),
+        "async": async_pool_metrics.stats(),
+    }
+
+
+@register_collector
+def pool_metric_families() -> list:
+    stats = get_pool_stats()
+    return [
+        {
+            "name": "db_pool_connections",
+            "type": "gauge",
+            "help": "Connections of the pool, by engine and state.",
+            "samples": [
+                [{"engine": name, "state": state}, pool[state]]
+                for name, pool in stats.items() if "size" in pool
+                for state in ("checked_out", "idle", "overflow")
+            ],
+        },
+        {
+            "name": "db_pool_size",
+            "type": "gauge",
+            "help": "Connections the pool keeps open, by engine.",
+            "samples": [[{"engine": name}, pool["size"]] for name, pool in stats.items() if "size" in pool],
+        },
+        {
+            "name": "db_pool_checkout_timeouts_total",
+            "type": "counter",
+            "help": "Checkouts that gave up waiting for a connection, by engine.",
+            "samples": [[{"engine": name}, pool["timeouts"]] for name, pool in stats.items()],
+        },
+        {
+            "name": "db_pool_checkout_wait_seconds",
+            "type": "histogram",
+            "help": "Time to check a connection out of the pool, by engine.",
+            "samples": [[{"engine": name}, pool["wait_seconds"]] for name, pool in stats.items()],
+        },
+    ]
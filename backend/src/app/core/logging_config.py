@@ -1,13 +1,129 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import threading
+from datetime import UTC, datetime
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line, with any `fields` passed in `extra`
+    merged into it.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the log queue without ever waiting for room. When the writer falls
+    behind and the queue is full the record is dropped and counted, so logging never
+    slows a request down.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchLogWriter(threading.Thread):
+    """
+    Drains the log queue on a background thread, writing the records it finds in batches
+    of up to `batch_size` lines with one write and flush per batch.
+    """
+
+    _STOP = object()
+
+    def __init__(self, log_queue: queue.Queue, filename: str, batch_size: int):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = log_queue
+        self.filename = filename
+        self.batch_size = batch_size
+        self.formatter = JSONFormatter()
+        self.written = 0
+        self.batches = 0
+
+    def run(self):
+        with open(self.filename, "a", encoding="utf-8") as stream:
+            stopping = False
+            while not stopping:
+                batch = [self.queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                lines = []
+                for record in batch:
+                    if record is self._STOP:
+                        stopping = True
+                        continue
+                    try:
+                        lines.append(self.formatter.format(record) + "\n")
+                    except Exception:
+                        continue
+                if lines:
+                    stream.write("".join(lines))
+                    stream.flush()
+                    self.written += len(lines)
+                    self.batches += 1
+
+    def stop(self):
+        """
+        Write what is left on the queue and wait for the thread to finish.
+        """
+        self.queue.put(self._STOP)
+        self.join()
+
+
+log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(log_queue)
+log_writer = BatchLogWriter(log_queue, filename=settings.LOG_FILE, batch_size=settings.LOG_BATCH_SIZE)
 
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    # The writer lays out the JSON; this only folds any traceback into the message
+    format="%(message)s",
     handlers=[
-
         #logging.StreamHandler(),   - Uncomment to print log to console
-        logging.FileHandler("app.log", mode="a"),
+        queue_handler,
     ]
 )
 
+log_writer.start()
+atexit.register(log_writer.stop)
+
 logger = logging.getLogger("app_logger")
+
+
+def get_logging_stats() -> dict:
+    """
+    Return how many records are waiting to be written, and how many were written and dropped.
+    """
+    return {
+        "queued": log_queue.qsize(),
+        "written": log_writer.written,
+        "batches": log_writer.batches,
+        "dropped": queue_handler.dropped,
+    }
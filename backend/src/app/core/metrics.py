@@ -0,0 +1,334 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class Histogram:
+    """
+    A thread-safe histogram of observed values with fixed bucket upper bounds.
+
+    Counts are kept per bucket, along with the number and sum of all observations, so
+    snapshots can be exported as they are or turned into approximate percentiles.
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Return the number and sum of the observations and the cumulative count per
+        bucket upper bound, the last bound being "+Inf".
+        """
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+
+        cumulative = {}
+        running = 0
+        for bound, count in zip([*self.buckets, "+Inf"], counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"count": running, "sum": total, "buckets": cumulative}
+
+
+# Bucket bounds in seconds for waits that are usually instant but can reach a timeout
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Bucket bounds in seconds for request latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Functions returning metric families, gathered on every scrape and snapshot. A family
+# is a dict with the metric `name`, its `type` ("counter", "gauge" or "histogram"), a
+# `help` line and its `samples`, each a [labels, value] pair where a histogram's value
+# is a `Histogram.snapshot()`.
+collectors = []
+
+
+def register_collector(collector):
+    """
+    Add `collector` to the functions gathered into the metrics, and return it, so it can
+    be used as a decorator.
+    """
+    collectors.append(collector)
+    return collector
+
+
+def collect() -> list:
+    """
+    Gather the metric families of every registered collector in this process.
+    """
+    families = []
+    for collector in collectors:
+        families.extend(collector())
+    return families
+
+
+class RequestMetrics:
+    """
+    Request counts by route template, method and status, latency histograms by route
+    template and method, and the number of requests in progress.
+
+    Only the event loop records requests, so the counters are plain dicts that need no
+    lock; readers on other threads take a copy, which is atomic.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = {}
+        self.latency = {}
+
+    def started(self):
+        self.in_flight += 1
+
+    def finished(self, route: str, method: str, status_code: int, seconds: float):
+        self.in_flight -= 1
+        key = (route, method, str(status_code))
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        histogram = self.latency.get((route, method))
+        if histogram is None:
+            histogram = self.latency[(route, method)] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+
+    def families(self) -> list:
+        requests, latency = self.requests.copy(), self.latency.copy()
+        return [
+            {
+                "name": "http_requests_total",
+                "type": "counter",
+                "help": "Requests served, by route template, method and status.",
+                "samples": [
+                    [{"route": route, "method": method, "status": status}, count]
+                    for (route, method, status), count in requests.items()
+                ],
+            },
+            {
+                "name": "http_request_duration_seconds",
+                "type": "histogram",
+                "help": "Time to serve a request, by route template and method.",
+                "samples": [
+                    [{"route": route, "method": method}, histogram.snapshot()]
+                    for (route, method), histogram in latency.items()
+                ],
+            },
+            {
+                "name": "http_requests_in_flight",
+                "type": "gauge",
+                "help": "Requests being served.",
+                "samples": [[{}, self.in_flight]],
+            },
+        ]
+
+
+request_metrics = RequestMetrics()
+register_collector(request_metrics.families)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _boot_id() -> str:
+    """
+    Identifies the server this worker belongs to: the pid of its parent, the process
+    manager that started the workers, and when that parent started, where /proc tells.
+    Workers restarted by the same manager share it; a new server does not.
+
+    A process whose parent is 0, such as the first process of a container, has no
+    manager above it and is identified by its own pid and start time.
+    """
+    pid = os.getppid() or os.getpid()
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as stream:
+            # The 22nd field, counted after the command name, which may contain spaces
+            started = stream.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        started = "0"
+    return f"{pid}.{started}"
+
+
+class MultiprocessStore:
+    """
+    Shares the metrics of every worker through one file per process in `directory`.
+
+    Each worker writes a snapshot of its metrics every `interval` seconds and on exit,
+    and the worker answering a scrape merges all of them: counters and histograms are
+    summed over every file, so the requests of a worker that has exited still count,
+    and gauges over the workers still running.
+
+    Files are named after the server's boot id, the pid and the time the process
+    started writing, so a new process reusing the pid of an old one gets a file of its
+    own. Each worker deletes the files of earlier servers when it starts, and scrapes
+    only read those of the current one.
+    """
+
+    def __init__(self, directory: str, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self._started = False
+        self._lock = threading.Lock()
+        self._pid = None
+        self._boot = None
+        self._since = None
+
+    def _identify(self):
+        # Again after a fork, so a forked worker never writes to its parent's file
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid, self._boot, self._since = pid, _boot_id(), time.time_ns()
+
+    def start(self):
+        """
+        Delete the files of earlier servers, then start writing snapshots of this
+        process on a background thread, once.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._identify()
+        for filename in os.listdir(self.directory):
+            if not filename.startswith(f"{self._boot}-"):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+        threading.Thread(target=self._run, name="metrics-snapshot", daemon=True).start()
+        atexit.register(self.write)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except OSError:
+                pass
+
+    def write(self):
+        """
+        Write the current metrics of this process to its file.
+        """
+        self._identify()
+        path = os.path.join(self.directory, f"{self._boot}-{self._pid}-{self._since}.json")
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as stream:
+            json.dump({"pid": self._pid, "since": self._since, "families": collect()}, stream)
+        os.replace(temporary, path)
+
+    def merged(self) -> list:
+        """
+        Write this process's snapshot, then merge the snapshots of every process of
+        this server.
+        """
+        self.write()
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not filename.startswith(f"{self._boot}-") or not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding="utf-8") as stream:
+                    snapshots.append(json.load(stream))
+            except (OSError, ValueError):
+                continue
+        return merge(snapshots)
+
+
+def merge(snapshots: list) -> list:
+    """
+    Sum the families of several process snapshots, sample by sample. Gauges are only
+    taken from processes that are still running.
+    """
+    # A pid can be reused; only its latest process may still be running
+    latest = {}
+    for snapshot in snapshots:
+        latest[snapshot["pid"]] = max(latest.get(snapshot["pid"], 0), snapshot.get("since", 0))
+
+    merged = {}
+    for snapshot in snapshots:
+        alive = snapshot.get("since", 0) == latest[snapshot["pid"]] and _pid_alive(snapshot["pid"])
+        for family in snapshot["families"]:
+            if family["type"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(family["name"], {**family, "samples": {}})
+            for labels, value in family["samples"]:
+                key = tuple(sorted(labels.items()))
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value
+                elif family["type"] == "histogram":
+                    target["samples"][key] = {
+                        "count": current["count"] + value["count"],
+                        "sum": current["sum"] + value["sum"],
+                        "buckets": {bound: count + value["buckets"].get(bound, 0) for bound, count in current["buckets"].items()},
+                    }
+                else:
+                    target["samples"][key] = current + value
+
+    return [
+        {**family, "samples": [[dict(key), value] for key, value in family["samples"].items()]}
+        for family in merged.values()
+    ]
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render(families: list) -> str:
+    """
+    Format metric families in the Prometheus text exposition format.
+    """
+    lines = []
+    for family in families:
+        name = family["name"]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for labels, value in family["samples"]:
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            for bound, count in value["buckets"].items():
+                lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+multiprocess_store = MultiprocessStore(settings.METRICS_DIR, settings.METRICS_WRITE_INTERVAL) if settings.METRICS_DIR else None
+
+
+def get_metrics() -> str:
+    """
+    The metrics of this process, or of all the workers when METRICS_DIR is set, in the
+    Prometheus text format.
+    """
+    families = multiprocess_store.merged() if multiprocess_store else collect()
+    return render(families)
@@ -0,0 +1,47 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(kind: str, values: list) -> str:
+    """
+    Encode the position of the last row of a page into an opaque cursor token.
+
+    Parameters:
+        kind (str): What the cursor was issued for (e.g. the sort key), so a token
+            from one listing cannot be replayed against another.
+        values (list): The keyset values of the last row, ending with its id.
+
+    Returns:
+        str: A URL-safe cursor token.
+    """
+    raw = json.dumps({"k": kind, "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, kind: str) -> list:
+    """
+    Decode a cursor token produced by `encode_cursor`.
+
+    Parameters:
+        token (str): The cursor token sent by the client.
+        kind (str): The kind the cursor must have been issued for.
+
+    Returns:
+        list: The keyset values stored in the cursor.
+
+    Raises:
+        HTTPException: If the token is malformed or was issued for another kind.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if data["k"] != kind or not isinstance(data["v"], list):
+            raise ValueError(token)
+        return data["v"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,182 @@
+import hashlib
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import UTC, datetime
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+PROFILE_HEADER = "x-profile-request"
+
+# Where the event loop waits for work; samples stopped there are left out
+LOOP_IDLE_FUNCTIONS = {
+    ("selectors.py", "select"),
+    ("base_events.py", "_run_once"),
+}
+
+# The app's own background threads, which run app code without serving a request
+BACKGROUND_THREADS = {"log-writer", "metrics-snapshot", "profile-sampler"}
+
+PROFILE_NAME = re.compile(r"^\d{8}T\d{9}-[A-Z]+-[\w.-]+\.folded$")
+
+
+def _secret() -> bytes:
+    return (settings.PROFILE_SECRET or settings.SECRET_KEY).encode()
+
+
+def create_profile_token(ttl: int) -> tuple[str, int]:
+    """
+    Sign a value for the profile header that is accepted for `ttl` seconds.
+
+    Returns:
+        tuple: The header value and the time it expires at, in seconds since the epoch.
+    """
+    expires_at = int(time.time()) + ttl
+    signature = hmac.new(_secret(), f"profile:{expires_at}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires_at}.{signature}", expires_at
+
+
+def verify_profile_token(value: str) -> bool:
+    """
+    Check that a profile header value was signed by `create_profile_token` and has not expired.
+    """
+    expires_at, _, signature = value.partition(".")
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    expected = hmac.new(_secret(), f"profile:{expires_at}".encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected)
+
+
+def _frame_label(code) -> tuple[str, bool]:
+    """
+    The label of a frame in the profile, and whether it is the app's own code.
+    """
+    filename = code.co_filename
+    marker = f"{os.sep}app{os.sep}"
+    in_app = marker in filename
+    if in_app:
+        filename = "app" + os.sep + filename.rsplit(marker, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})", in_app
+
+
+class Sampler:
+    """
+    A statistical profiler: a thread that takes the stacks of the other threads every
+    `interval` seconds while it runs, and counts the samples per stack.
+
+    Keeps the stacks of the event loop thread unless it is waiting for work, and those of
+    other threads running the app's own code, such as the threadpool running a sync
+    route or the password hashing threads, but not the app's background threads. Requests served at the same time show up too;
+    each stack is rooted at the name of its thread.
+    """
+
+    def __init__(self, interval: float, loop_thread: int):
+        self.interval = interval
+        self.loop_thread = loop_thread
+        self.samples = Counter()
+        self.count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if names.get(thread_id) in BACKGROUND_THREADS:
+                    continue
+                code = frame.f_code
+                if thread_id == self.loop_thread and (os.path.basename(code.co_filename), code.co_name) in LOOP_IDLE_FUNCTIONS:
+                    continue
+
+                stack = []
+                keep = thread_id == self.loop_thread
+                while frame is not None:
+                    label, in_app = _frame_label(frame.f_code)
+                    stack.append(label)
+                    keep = keep or in_app
+                    frame = frame.f_back
+                if not keep:
+                    continue
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+                self.count += 1
+
+    def collapsed(self) -> str:
+        """
+        The samples in the collapsed stack format, one `frame;frame;frame count` line per
+        stack, which speedscope and flamegraph.pl read.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    """
+    The profiles on disk, as a ring: once there are more than `max_files`, the oldest are
+    deleted as new ones are saved.
+    """
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def new_name(self, method: str, route: str) -> str:
+        timestamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S%f")[:-3]
+        route = re.sub(r"[^\w.-]+", "_", route).strip("_") or "root"
+        return f"{timestamp}-{method}-{route}.folded"
+
+    def save(self, name: str, content: str):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, name), "w", encoding="utf-8") as stream:
+                stream.write(content)
+            for stale in self._names()[:-self.max_files]:
+                os.remove(os.path.join(self.directory, stale))
+
+    def _names(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if PROFILE_NAME.match(name))
+
+    def list(self) -> list:
+        """
+        The saved profiles, newest first, with their size in bytes.
+        """
+        profiles = []
+        for name in reversed(self._names()):
+            try:
+                size = os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            profiles.append({"name": name, "size": size})
+        return profiles
+
+    def path(self, name: str) -> str | None:
+        """
+        The path of a saved profile, or None if there is none by that name.
+        """
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
+
+# Held while a request is profiled; profiling one request at a time keeps the cost bounded
+profiling_slot = threading.Lock()
@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from app.core.config import get_settings
+from app.core.database import async_engine, engine
+from app.core.logging_config import logger
+from app.core.metrics import LATENCY_BUCKETS, Histogram, register_collector
+
+settings = get_settings()
+
+# Bucket bounds for the number of queries a request runs
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DIRECTORY = os.path.dirname(APP_DIRECTORY)
+THIS_FILE = os.path.abspath(__file__)
+
+
+class QueryStats:
+    """
+    The queries run while serving one request: how many, how long they took in total,
+    and how often each statement ran.
+
+    With `track_call_sites`, also the places in the app that ran each statement, to point
+    at the loop or lazy load behind a statement that keeps repeating.
+    """
+
+    def __init__(self, track_call_sites: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+        self.call_sites = {} if track_call_sites else None
+
+    def record(self, statement: str, seconds: float, call_site: str | None = None):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+        if self.call_sites is not None and call_site is not None:
+            sites = self.call_sites.setdefault(statement, [])
+            if call_site not in sites:
+                sites.append(call_site)
+
+    def repeated(self, threshold: int) -> list:
+        """
+        The statements run at least `threshold` times, most repeated first, each with its
+        count and call sites: the likely N+1 queries of the request.
+        """
+        return [
+            {
+                "statement": statement,
+                "count": count,
+                "call_sites": (self.call_sites or {}).get(statement, []),
+            }
+            for statement, count in sorted(self.statements.items(), key=lambda item: -item[1])
+            if count >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        """
+        The `Server-Timing` header entry for the queries.
+        """
+        noun = "query" if self.count == 1 else "queries"
+        return f'db;dur={self.seconds * 1000:.3f};desc="{self.count} {noun}"'
+
+
+# The stats of the request being served, if any; read by the engine event listeners
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+# Functions called with the method, route template and QueryStats of every request, e.g.
+# by the query budget test fixture
+observers = []
+
+
+def _call_site() -> str | None:
+    """
+    The innermost frame in the app's own code that led to the current query.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(APP_DIRECTORY) and filename != THIS_FILE:
+            return f"{os.path.relpath(filename, SOURCE_DIRECTORY)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_query_stats.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_query_stats.get()
+    started = conn.info.get("query_started_at")
+    if stats is None or not started:
+        return
+    call_site = _call_site() if stats.call_sites is not None else None
+    stats.record(statement, time.perf_counter() - started.pop(), call_site)
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started_at"):
+        connection.info["query_started_at"].pop()
+
+
+for instrumented_engine in (engine, async_engine.sync_engine):
+    event.listen(instrumented_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(instrumented_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(instrumented_engine, "handle_error", _handle_error)
+
+
+class QueryMetrics:
+    """
+    Histograms of the queries per request and the time spent in them by route template,
+    and the number of requests that repeated a statement.
+
+    Like the request metrics, only recorded from the event loop.
+    """
+
+    def __init__(self):
+        self.queries = {}
+        self.seconds = {}
+        self.repeated = {}
+
+    def finished(self, route: str, method: str, stats: QueryStats, repeated: bool):
+        key = (route, method)
+        if key not in self.queries:
+            self.queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+            self.seconds[key] = Histogram(LATENCY_BUCKETS)
+        self.queries[key].observe(stats.count)
+        self.seconds[key].observe(stats.seconds)
+        if repeated:
+            self.repeated[key] = self.repeated.get(key, 0) + 1
+
+    def families(self) -> list:
+        queries, seconds, repeated = self.queries.copy(), self.seconds.copy(), self.repeated.copy()
+        return [
+            {
+                "name": "http_request_db_queries",
+                "type": "histogram",
+                "help": "Queries run by a request, by route template and method.",
+                "samples": [[{"route": route, "method": method}, histogram.snapshot()] for (route, method), histogram in queries.items()],
+            },
+            {
+                "name": "http_request_db_seconds",
+                "type": "histogram",
+                "help": "Time a request spent in queries, by route template and method.",
+                "samples": [[{"route": route, "method": method}, histogram.snapshot()] for (route, method), histogram in seconds.items()],
+            },
+            {
+                "name": "http_requests_repeated_queries_total",
+                "type": "counter",
+                "help": "Requests that ran a statement QUERY_REPEAT_THRESHOLD times or more, a likely N+1.",
+                "samples": [[{"route": route, "method": method}, count] for (route, method), count in repeated.items()],
+            },
+        ]
+
+
+query_metrics = QueryMetrics()
+register_collector(query_metrics.families)
+
+
+def request_finished(route: str, method: str, stats: QueryStats):
+    """
+    Record the queries of a finished request, warn about its likely N+1 queries when
+    QUERY_DEBUG is on, and pass it to the observers.
+    """
+    repeated = stats.repeated(settings.QUERY_REPEAT_THRESHOLD)
+    query_metrics.finished(route, method, stats, bool(repeated))
+
+    if repeated and stats.call_sites is not None:
+        logger.warning(
+            "Likely N+1 queries in %s %s", method, route,
+            extra={"fields": {"route": route, "method": method, "queries": stats.count, "repeated": repeated}},
+        )
+    for observer in observers:
+        observer(method, route, stats)
@@ -1,9 +1,122 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
 from passlib.context import CryptContext
 
+from app.core.config import get_settings
+
+settings = get_settings()
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+
+class HashExecutor:
+    """
+    A fixed pool of threads that all password hashing goes through.
+
+    bcrypt is slow on purpose, so it is kept off the event loop and off the request
+    threads, and at most `workers` hashes run at once. At most `queue_size` more wait for
+    a thread; beyond that the request is turned away with a 503 instead of queueing
+    without bound behind a login storm.
+
+    Records how long each job waited for a thread and how long the hash took.
+    """
+
+    def __init__(self, workers: int, queue_size: int, samples: int = 1000):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.completed = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._waits = deque(maxlen=samples)
+        self._hashes = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def _timed(self, queued_at: float, function, *args):
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            finished = time.perf_counter()
+            self._slots.release()
+            with self._lock:
+                self.completed += 1
+                self._waits.append(started - queued_at)
+                self._hashes.append(finished - started)
+
+    def submit(self, function, *args):
+        """
+        Queue `function(*args)` on a hashing thread.
+
+        Returns:
+            Future: The future of its result.
+
+        Raises:
+            HTTPException: 503 if the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many login attempts, please retry", headers={"Retry-After": "1"})
+
+        try:
+            return self._pool.submit(self._timed, time.perf_counter(), function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def run(self, function, *args):
+        """
+        Run `function(*args)` on a hashing thread and wait for its result.
+        """
+        return self.submit(function, *args).result()
+
+    async def run_async(self, function, *args):
+        """
+        Run `function(*args)` on a hashing thread and await its result, for async routes.
+        """
+        return await asyncio.wrap_future(self.submit(function, *args))
+
+    def stats(self) -> dict:
+        """
+        Return the pool size and the job counters, with the median and 99th percentile
+        queue wait and hash time in milliseconds over the recent jobs.
+        """
+        def percentiles(samples):
+            if not samples:
+                return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+            ordered = sorted(samples)
+            return {
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+                "p99_ms": round(ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)] * 1000, 3),
+                "max_ms": round(ordered[-1] * 1000, 3),
+            }
+
+        with self._lock:
+            waits, hashes = list(self._waits), list(self._hashes)
+            completed, rejected = self.completed, self.rejected
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "completed": completed,
+            "rejected": rejected,
+            "queue_wait": percentiles(waits),
+            "hash_time": percentiles(hashes),
+        }
+
+
+hash_executor = HashExecutor(workers=settings.PASSWORD_HASH_WORKERS, queue_size=settings.PASSWORD_HASH_QUEUE_SIZE)
+
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return hash_executor.run(pwd_context.hash, password)
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hash_executor.run(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await hash_executor.run_async(pwd_context.verify, plain_password, hashed_password)
@@ -1,10 +1,13 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, func, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from app.models.cart import Cart, CartItem
 from app.models.product import Product
 from app.models.user import User
 from app.models.order import Order, OrderItem
 from app.models.address import Address
+from app.models.idempotency import IdempotencyKey
+from app.models.outbox import OutboxEvent
 from app.models.product import Product, PartCategory, BrandCategory, ModelCategory
 from app.models.support import SupportTicket, TicketReplies
 
@@ -220,6 +223,76 @@ def get_all_products(db: Session):
     """
     return db.query(Product).all()
 
+PRODUCT_SORT_COLUMNS = {
+    "id": Product.id,
+    "price": Product.price,
+    "name": Product.name,
+}
+
+def filter_products(query, part_category_id: int | None = None, brand_category_id: int | None = None,
+                    model_category_id: int | None = None, min_price: float | None = None,
+                    max_price: float | None = None):
+    """
+    Apply the optional catalog filters to a product query.
+
+    Parameters:
+        query: The query over Product to narrow down.
+        part_category_id (int | None): Only products in this part category.
+        brand_category_id (int | None): Only products of this brand.
+        model_category_id (int | None): Only products for this model.
+        min_price (float | None): Lowest price to include.
+        max_price (float | None): Highest price to include.
+
+    Returns:
+        The filtered query.
+    """
+    if part_category_id is not None:
+        query = query.filter(Product.part_category_id == part_category_id)
+    if brand_category_id is not None:
+        query = query.filter(Product.brand_category_id == brand_category_id)
+    if model_category_id is not None:
+        query = query.filter(Product.model_category_id == model_category_id)
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    return query
+
+def get_products_page(db: Session, sort: str = "id", after: list | None = None, limit: int = 50, **filters):
+    """
+    Retrieve one page of products using keyset pagination.
+
+    Rows are ordered by the sort column with the product id as tie breaker, and the
+    page starts strictly after the `after` position, so every page is an index range
+    scan no matter how deep the client has paged.
+
+    Parameters:
+        db (Session): The database session.
+        sort (str): One of the keys of PRODUCT_SORT_COLUMNS.
+        after (list | None): The (sort value, id) of the last row of the previous page.
+        limit (int): The maximum number of products to return.
+        **filters: Optional filters understood by `filter_products`.
+
+    Returns:
+        tuple: The list of Product objects and a flag telling whether more rows follow.
+    """
+    sort_column = PRODUCT_SORT_COLUMNS[sort]
+    query = filter_products(db.query(Product), **filters)
+
+    if after is not None:
+        if sort == "id":
+            query = query.filter(Product.id > after[-1])
+        else:
+            query = query.filter(tuple_(sort_column, Product.id) > tuple_(after[0], after[1]))
+
+    if sort == "id":
+        query = query.order_by(Product.id)
+    else:
+        query = query.order_by(sort_column, Product.id)
+
+    products = query.limit(limit + 1).all()
+    return products[:limit], len(products) > limit
+
 def get_all_part_categories(db: Session):
     """
     Retrieve all part categories from the database.
@@ -308,6 +381,89 @@ def get_products_by_brand_category_by_id(db: Session, brand_category_id: int):
 def get_products_by_brand_and_model(db: Session, brand_category_id: int, model_category_id: int):
     return db.query(Product).filter(Product.brand_category_id == brand_category_id, Product.model_category_id == model_category_id).all()
 
+def get_products_by_ids(db: Session, product_ids: list[int]):
+    """
+    Retrieve several products by their IDs in a single query.
+
+    Parameters:
+        db (Session): The database session.
+        product_ids (list[int]): The IDs of the products.
+
+    Returns:
+        dict: The Product objects found, keyed by ID.
+    """
+    if not product_ids:
+        return {}
+    products = db.query(Product).filter(Product.id.in_(product_ids)).all()
+    return {product.id: product for product in products}
+
+def get_search_documents(db: Session):
+    """
+    Stream the searchable fields of every product.
+
+    Parameters:
+        db (Session): The database session.
+
+    Returns:
+        An iterator of rows with the id, name, description, tags and brand_category_id of each product.
+    """
+    return db.query(
+        Product.id,
+        Product.name,
+        Product.description,
+        Product.tags,
+        Product.brand_category_id
+    ).yield_per(5000)
+
+def get_product_order_counts(db: Session):
+    """
+    Count the units ordered of every product that has been ordered.
+
+    Parameters:
+        db (Session): The database session.
+
+    Returns:
+        dict: The number of units ordered, keyed by product ID.
+    """
+    rows = db.query(OrderItem.product_id, func.sum(OrderItem.quantity)).group_by(OrderItem.product_id).all()
+    return {product_id: int(units or 0) for product_id, units in rows}
+
+def get_suggestion_products(db: Session):
+    """
+    Stream the name and categories of every product.
+
+    Parameters:
+        db (Session): The database session.
+
+    Returns:
+        An iterator of rows with the id, name, part_category_id, brand_category_id and model_category_id of each product.
+    """
+    return db.query(
+        Product.id,
+        Product.name,
+        Product.part_category_id,
+        Product.brand_category_id,
+        Product.model_category_id
+    ).yield_per(5000)
+
+def get_facet_products(db: Session):
+    """
+    Stream the price and categories of every product.
+
+    Parameters:
+        db (Session): The database session.
+
+    Returns:
+        An iterator of rows with the id, price, part_category_id, brand_category_id and model_category_id of each product.
+    """
+    return db.query(
+        Product.id,
+        Product.price,
+        Product.part_category_id,
+        Product.brand_category_id,
+        Product.model_category_id
+    ).yield_per(5000)
+
 #Checkout CRUD
 def get_cart_by_user_id(user_id: int, db: Session):
     """
@@ -368,6 +524,20 @@ def get_address_by_user_and_id(user_id: int, address_id: int, db: Session):
     """
     return db.query(Address).filter(Address.user_id == user_id, Address.id == address_id).first()
 
+def get_addresses_by_user_and_ids(user_id: int, address_ids: list[int], db: Session):
+    """
+    Retrieve several addresses of a user by their IDs in a single query.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        address_ids (list[int]): The IDs of the addresses.
+        db (Session): The database session.
+
+    Returns:
+        list[Address]: The addresses found that belong to the user.
+    """
+    return db.query(Address).filter(Address.user_id == user_id, Address.id.in_(address_ids)).all()
+
 def get_pending_order_from_db(user_id: int, db: Session):
     """
     Retrieve the pending order for a specific user.
@@ -429,21 +599,88 @@ def get_cart_by_user_id(user_id: int, db: Session):
         db.refresh(cart)
     return cart
 
-def get_total_items_in_cart(user_id: int, db: Session):
-    cart = db.query(Cart).filter(Cart.user_id == user_id).first()
-    
-    # If the cart does not exist, create a new one
-    if not cart:
-        cart = Cart(user_id=user_id)
-        db.add(cart)
-        db.commit()
-        db.refresh(cart)
+def get_cart_summary_by_user_id(user_id: int, db: Session):
+    """
+    Retrieve the item count and subtotal of a user's cart without loading its items.
+
+    Parameters:
+        user_id (int): The ID of the user.
+        db (Session): The database session.
+
+    Returns:
+        Row: The item_count and subtotal of the cart, or None if the user has no cart.
+    """
+    return db.query(Cart.item_count, Cart.subtotal).filter(Cart.user_id == user_id).first()
+
+def _lock_cart(cart_id: int, db: Session):
+    """
+    Lock a cart's row until the transaction ends, so writes to the same cart run one
+    after the other and each recount sees the items written before it.
+    """
+    db.query(Cart.id).filter(Cart.id == cart_id).with_for_update().first()
+
+def _refresh_cart_summaries(condition, db: Session):
+    """
+    Recount the item count and subtotal of the carts matching `condition` from their
+    items. The subtotal is priced at the current product prices, as the cart and
+    checkout are.
+    """
+    quantity = select(func.coalesce(func.sum(CartItem.quantity), 0)).where(CartItem.cart_id == Cart.id)
+    subtotal = (
+        select(func.coalesce(func.sum(CartItem.quantity * Product.price), 0))
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.cart_id == Cart.id)
+    )
+    db.query(Cart).filter(condition).update(
+        {Cart.item_count: quantity.scalar_subquery(), Cart.subtotal: subtotal.scalar_subquery()},
+        synchronize_session=False
+    )
+
+def _carts_holding(product_id: int, db: Session):
+    """
+    Lock the carts holding a product, and return their IDs and owners.
+    """
+    holding = select(CartItem.cart_id).where(CartItem.product_id == product_id)
+    return db.query(Cart.id, Cart.user_id).filter(Cart.id.in_(holding)).with_for_update().all()
+
+def refresh_cart_summaries_for_product(product_id: int, db: Session):
+    """
+    Recount the subtotal of every cart holding a product, after its price changed, and
+    commit.
+
+    Parameters:
+        product_id (int): The ID of the product.
+        db (Session): The database session.
+
+    Returns:
+        list[int]: The IDs of the users whose carts hold the product.
+    """
+    carts = _carts_holding(product_id, db)
+    if carts:
+        _refresh_cart_summaries(Cart.id.in_([cart.id for cart in carts]), db)
+    db.commit()
+    return [cart.user_id for cart in carts]
+
+def delete_product_in_db(product: Product, db: Session):
+    """
+    Delete a product, taking it out of the carts that hold it and recounting them in
+    the same transaction, and commit.
 
-    total_items = 0
-    for item in cart.items:
-        total_items += item.quantity
+    Parameters:
+        product (Product): The product to delete.
+        db (Session): The database session.
 
-    return {"total_items": total_items}
+    Returns:
+        list[int]: The IDs of the users whose carts held the product.
+    """
+    carts = _carts_holding(product.id, db)
+    db.query(CartItem).filter(CartItem.product_id == product.id).delete(synchronize_session=False)
+    db.delete(product)
+    db.flush()
+    if carts:
+        _refresh_cart_summaries(Cart.id.in_([cart.id for cart in carts]), db)
+    db.commit()
+    return [cart.user_id for cart in carts]
 
 
 def get_cart_items_by_cart_id(cart_id: int, db: Session):
@@ -459,6 +696,25 @@ def get_cart_items_by_cart_id(cart_id: int, db: Session):
     """
     return db.query(CartItem).filter(CartItem.cart_id == cart_id).all()
 
+def get_cart_items_with_products(cart_id: int, db: Session):
+    """
+    Retrieve all items in a specific cart together with their products, in one query.
+
+    Parameters:
+        cart_id (int): The ID of the cart.
+        db (Session): The database session.
+
+    Returns:
+        list[tuple[CartItem, Product]]: The items in the order they were added, each with its product.
+    """
+    return (
+        db.query(CartItem, Product)
+        .join(Product, CartItem.product_id == Product.id)
+        .filter(CartItem.cart_id == cart_id)
+        .order_by(CartItem.id)
+        .all()
+    )
+
 def get_product_by_id(product_id: int, db: Session):
     """
     Retrieve a product by its ID.
@@ -497,10 +753,91 @@ def add_cart_item_to_db(cart_item: CartItem, db: Session):
     Returns:
         CartItem: The added and refreshed CartItem object.
     """
+    _lock_cart(cart_item.cart_id, db)
     db.add(cart_item)
+    db.flush()
+    _refresh_cart_summaries(Cart.id == cart_item.cart_id, db)
     db.commit()
     db.refresh(cart_item)
 
+def upsert_cart_item_in_db(cart_id: int, product_id: int, quantity: int, price: float, db: Session):
+    """
+    Add a quantity of a product to a cart, inserting the cart item or adding to the
+    quantity of the existing one in a single INSERT ... ON CONFLICT DO UPDATE statement,
+    so concurrent adds of the same product neither duplicate the row nor lose quantity.
+
+    Parameters:
+        cart_id (int): The ID of the cart.
+        product_id (int): The ID of the product.
+        quantity (int): The quantity to add.
+        price (float): The unit price recorded if the item is new.
+        db (Session): The database session.
+
+    Returns:
+        Row: The cart's new item_count and subtotal.
+    """
+    # Add the delta to the cart's counters rather than recounting its items. The UPDATE
+    # runs first so the cart row is locked before the item row, in the same order as
+    # the other cart writes.
+    unit_price = select(Product.price).where(Product.id == product_id).scalar_subquery()
+    summary = db.execute(
+        update(Cart)
+        .where(Cart.id == cart_id)
+        .values(item_count=Cart.item_count + quantity, subtotal=Cart.subtotal + quantity * unit_price)
+        .returning(Cart.item_count, Cart.subtotal)
+    ).one()
+
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = insert(CartItem).values(cart_id=cart_id, product_id=product_id, quantity=quantity, price=price)
+    statement = statement.on_conflict_do_update(
+        index_elements=[CartItem.cart_id, CartItem.product_id],
+        set_={"quantity": CartItem.quantity + statement.excluded.quantity}
+    )
+    db.execute(statement)
+    db.commit()
+    return summary
+
+def apply_cart_batch_in_db(cart_id: int, adds: dict, updates: dict, removes: list[int], db: Session):
+    """
+    Apply several cart item changes and refresh the cart's item count and subtotal in
+    one transaction.
+
+    Parameters:
+        cart_id (int): The ID of the cart.
+        adds (dict): Maps each product ID to add to its (quantity, unit price). Products
+            already in the cart get the quantity added and keep their price.
+        updates (dict): Maps product IDs to their new quantity.
+        removes (list[int]): The IDs of the products to remove.
+        db (Session): The database session.
+
+    Returns:
+        None
+    """
+    _lock_cart(cart_id, db)
+    if adds:
+        insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        statement = insert(CartItem).values([
+            {"cart_id": cart_id, "product_id": product_id, "quantity": quantity, "price": price}
+            for product_id, (quantity, price) in adds.items()
+        ])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[CartItem.cart_id, CartItem.product_id],
+            set_={"quantity": CartItem.quantity + statement.excluded.quantity}
+        ))
+
+    for product_id, quantity in updates.items():
+        db.query(CartItem).filter(CartItem.cart_id == cart_id, CartItem.product_id == product_id).update(
+            {CartItem.quantity: quantity}, synchronize_session=False
+        )
+
+    if removes:
+        db.query(CartItem).filter(CartItem.cart_id == cart_id, CartItem.product_id.in_(removes)).delete(
+            synchronize_session=False
+        )
+
+    _refresh_cart_summaries(Cart.id == cart_id, db)
+    db.commit()
+
 def update_cart_item_quantity_in_db(cart_item: CartItem, quantity: int, db: Session):
     """
     Update the quantity of a specific item in the cart.
@@ -513,7 +850,9 @@ def update_cart_item_quantity_in_db(cart_item: CartItem, quantity: int, db: Sess
     Returns:
         None
     """
-    cart_item.quantity = quantity
+    _lock_cart(cart_item.cart_id, db)
+    db.query(CartItem).filter(CartItem.id == cart_item.id).update({CartItem.quantity: quantity}, synchronize_session=False)
+    _refresh_cart_summaries(Cart.id == cart_item.cart_id, db)
     db.commit()
     db.refresh(cart_item)
 
@@ -528,7 +867,10 @@ def delete_cart_item_from_db(cart_item: CartItem, db: Session):
     Returns:
         None
     """
-    db.delete(cart_item)
+    _lock_cart(cart_item.cart_id, db)
+    # Deleted by ID, as a concurrent request may have removed the item already
+    db.query(CartItem).filter(CartItem.id == cart_item.id).delete(synchronize_session=False)
+    _refresh_cart_summaries(Cart.id == cart_item.cart_id, db)
     db.commit()
 
 def clear_cart_items_in_db(cart_id: int, db: Session):
@@ -542,7 +884,9 @@ def clear_cart_items_in_db(cart_id: int, db: Session):
     Returns:
         None
     """
+    _lock_cart(cart_id, db)
     db.query(CartItem).filter(CartItem.cart_id == cart_id).delete()
+    db.query(Cart).filter(Cart.id == cart_id).update({Cart.item_count: 0, Cart.subtotal: 0}, synchronize_session=False)
     db.commit()
 
 #Order CRUD
@@ -559,6 +903,83 @@ def get_order_by_id_crud(order_id: int, db: Session):
     """
     return db.query(Order).filter(Order.id == order_id).first()
 
+def _orders_with_items(db: Session):
+    """
+    Query orders together with their items, loaded in one batched query for all the
+    orders instead of one per order. Items carry their own product name and thumbnail,
+    so products are not read.
+    """
+    return db.query(Order).options(selectinload(Order.items))
+
+def get_order_with_items(db: Session, order_id: int):
+    """
+    Retrieve an order by its ID with its items and their products.
+
+    Parameters:
+        db (Session): The database session.
+        order_id (int): The ID of the order.
+
+    Returns:
+        Order: The order, or None if not found.
+    """
+    return _orders_with_items(db).filter(Order.id == order_id).first()
+
+def backfill_order_item_snapshots_in_db(db: Session, after_id: int, batch_size: int):
+    """
+    Copy the product name and thumbnail into one batch of order items that lack them,
+    and commit.
+
+    Parameters:
+        db (Session): The database session.
+        after_id (int): Only order items with a greater ID are considered.
+        batch_size (int): The number of order items scanned.
+
+    Returns:
+        tuple: The number of items updated and the last ID scanned, or None when no
+        order items are left.
+    """
+    ids = [
+        row.id for row in
+        db.query(OrderItem.id).filter(OrderItem.id > after_id).order_by(OrderItem.id).limit(batch_size)
+    ]
+    if not ids:
+        return 0, None
+
+    product = db.query(Product).filter(Product.id == OrderItem.product_id)
+    updated = db.query(OrderItem).filter(
+        OrderItem.id.in_(ids),
+        OrderItem.product_name.is_(None),
+        product.exists()
+    ).update({
+        OrderItem.product_name: product.with_entities(Product.name).scalar_subquery(),
+        OrderItem.product_thumbnail: product.with_entities(Product.thumbnail).scalar_subquery(),
+    }, synchronize_session=False)
+    db.commit()
+    return updated, ids[-1]
+
+def get_user_orders_page(db: Session, user_id: int, status: str | None = None, after: list | None = None, limit: int = 20):
+    """
+    Retrieve one page of a user's orders, newest first, with their items and products.
+
+    Parameters:
+        db (Session): The database session.
+        user_id (int): The ID of the user.
+        status (str | None): Only orders with this status.
+        after (list | None): The (created_at, id) of the last order of the previous page.
+        limit (int): The maximum number of orders to return.
+
+    Returns:
+        tuple: The list of Order objects and a flag telling whether more orders follow.
+    """
+    query = _orders_with_items(db).filter(Order.user_id == user_id)
+    if status is not None:
+        query = query.filter(Order.status == status)
+    if after is not None:
+        query = query.filter(tuple_(Order.created_at, Order.id) < tuple_(after[0], after[1]))
+
+    orders = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    return orders[:limit], len(orders) > limit
+
 def search_products_given_make(make_id: int, search_terms: str, db: Session):
     """
     Search for products by brand ID and name containing search terms.
@@ -580,3 +1001,83 @@ def search_products_given_make(make_id: int, search_terms: str, db: Session):
         .all()
     )
     return products
+
+#Idempotency CRUD
+def get_idempotency_key(db: Session, user_id: int, key_hash: str):
+    """
+    Retrieve the stored request of a user for an idempotency key.
+
+    Parameters:
+        db (Session): The database session.
+        user_id (int): The ID of the user.
+        key_hash (str): The SHA-256 digest of the key.
+
+    Returns:
+        The IdempotencyKey object or None if not found.
+    """
+    return db.query(IdempotencyKey).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key_hash == key_hash).first()
+
+def delete_expired_idempotency_keys(db: Session, now, batch_size: int):
+    """
+    Delete one batch of expired idempotency keys and commit.
+
+    Parameters:
+        db (Session): The database session.
+        now (datetime): Keys that expired before this time are deleted.
+        batch_size (int): The maximum number of keys to delete.
+
+    Returns:
+        int: The number of keys deleted.
+    """
+    expired = (
+        db.query(IdempotencyKey.id)
+        .filter(IdempotencyKey.expires_at < now)
+        .order_by(IdempotencyKey.expires_at)
+        .limit(batch_size)
+        .scalar_subquery()
+    )
+    deleted = db.query(IdempotencyKey).filter(IdempotencyKey.id.in_(expired)).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def claim_outbox_events(db: Session, now, batch_size: int):
+    """
+    Lock a batch of due outbox events, oldest first, for the current transaction.
+
+    Rows another worker has already locked are skipped rather than waited for, so
+    several workers can drain the outbox side by side. The locks are held until the
+    caller commits.
+
+    Parameters:
+        db (Session): The database session.
+        now (datetime): Events available after this time are left for later.
+        batch_size (int): The maximum number of events to claim.
+
+    Returns:
+        list: The claimed OutboxEvent objects.
+    """
+    return (
+        db.query(OutboxEvent)
+        .filter(OutboxEvent.status == "Pending", OutboxEvent.available_at <= now)
+        .order_by(OutboxEvent.available_at, OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+def get_outbox_backlog(db: Session):
+    """
+    Count the outbox events that have not been handled yet.
+
+    Parameters:
+        db (Session): The database session.
+
+    Returns:
+        tuple: The number of pending events, the creation time of the oldest one (None
+        if there is none) and the number of events that ran out of attempts.
+    """
+    pending, oldest = db.query(func.count(OutboxEvent.id), func.min(OutboxEvent.created_at)).filter(
+        OutboxEvent.status == "Pending"
+    ).one()
+    failed = db.query(func.count(OutboxEvent.id)).filter(OutboxEvent.status == "Failed").scalar()
+    return pending, oldest, failed
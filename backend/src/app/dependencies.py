@@ -1,4 +1,6 @@
-from app.core.database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal, SessionLocal
 
 
 def get_db():
@@ -7,3 +9,17 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def run_in_session(db: AsyncSession, function, **kwargs):
+    """
+    Call a service or crud function written for a sync Session with the sync view of
+    an AsyncSession, as `function(db=session, **kwargs)`.
+
+    Its queries go through the async driver and are awaited, so the event loop keeps
+    serving other requests while they run, and the function itself needs no async twin.
+    """
+    return await db.run_sync(lambda session: function(db=session, **kwargs))
@@ -0,0 +1,28 @@
+"""
+Copy product names and thumbnails into the order items created before checkout stored them.
+
+Run once after deploying the product_name and product_thumbnail columns of order_items:
+
+    cd backend/src && python -m app.jobs.backfill_order_item_snapshots
+"""
+import argparse
+
+from app.core.database import SessionLocal
+from app.services.orders import backfill_item_snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000, help="order items updated per transaction")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        updated = backfill_item_snapshots(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Backfilled {updated} order items")
+
+
+if __name__ == "__main__":
+    main()
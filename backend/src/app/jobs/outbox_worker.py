@@ -0,0 +1,48 @@
+"""
+Run the side effects of completed orders, such as confirmation emails, from the outbox.
+
+Runs until stopped; start as many as needed, they never claim the same events:
+
+    cd backend/src && python -m app.jobs.outbox_worker
+
+Pass --once to drain the due events and exit, e.g. from cron or against a local SMTP stub.
+"""
+import argparse
+import time
+
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.services.outbox import get_outbox_stats, process_batch, worker_stats
+
+settings = get_settings()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE, help="events handled between progress reports")
+    parser.add_argument("--poll-interval", type=float, default=settings.OUTBOX_POLL_INTERVAL,
+                        help="seconds to wait when no event is due")
+    parser.add_argument("--once", action="store_true", help="exit once no event is due")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        while True:
+            claimed = process_batch(db, batch_size=args.batch_size)
+            if claimed:
+                stats = get_outbox_stats(db)
+                db.commit()
+                print(f"Processed {claimed} events, {stats['pending']} pending, "
+                      f"lag {worker_stats['last_lag_seconds'] or 0:.1f}s, {stats['failed']} failed")
+            if claimed < args.batch_size:
+                if args.once:
+                    break
+                time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
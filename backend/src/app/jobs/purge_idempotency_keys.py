@@ -0,0 +1,28 @@
+"""
+Delete expired checkout idempotency keys.
+
+Meant to run periodically, e.g. hourly from cron:
+
+    cd backend/src && python -m app.jobs.purge_idempotency_keys
+"""
+import argparse
+
+from app.core.database import SessionLocal
+from app.services.idempotency import purge_expired_keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, help="keys deleted per transaction")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        deleted = purge_expired_keys(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(f"Deleted {deleted} expired idempotency keys")
+
+
+if __name__ == "__main__":
+    main()
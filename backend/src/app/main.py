@@ -9,6 +9,9 @@ import os
 from app.core.database import Base, engine
 from app.routes import api_router
 from app.middleware.logging_middleware import LoggingMiddleware
+from app.middleware.metrics_middleware import MetricsMiddleware
+from app.middleware.profiling_middleware import ProfilingMiddleware
+from app.middleware.query_stats_middleware import QueryStatsMiddleware
 
 Base.metadata.create_all(bind=engine)
 
@@ -41,6 +44,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(ProfilingMiddleware)
 app.add_middleware(LoggingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryStatsMiddleware)
 
 app.include_router(api_router)
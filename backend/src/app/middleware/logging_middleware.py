@@ -1,18 +1,88 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
-from app.core.logging_config import logger
+import logging
+import random
 import time
+from urllib.parse import parse_qsl, urlencode
+
+from app.core.config import get_settings
+from app.core.logging_config import logger
+
+settings = get_settings()
+
+REDACTED = "[redacted]"
+
+
+class LoggingMiddleware:
+    """
+    Logs one structured line per HTTP request: the method, path, query, client, status,
+    duration and headers, with secret headers and query parameters redacted.
+
+    Errors and requests slower than `LOG_SLOW_REQUEST_MS` are always logged; successful
+    requests are sampled at `LOG_SUCCESS_SAMPLE_RATE`. The line goes onto the log queue, so
+    the file is written by the log writer thread and never from the event loop.
+
+    A plain ASGI middleware, so the response streams through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.redacted = {name.strip().lower() for name in settings.LOG_REDACTED_FIELDS.split(",") if name.strip()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            self._log(scope, status_code, duration_ms)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    def _log(self, scope, status_code: int, duration_ms: float):
+        slow = duration_ms >= settings.LOG_SLOW_REQUEST_MS
+        if 200 <= status_code < 300 and not slow and random.random() >= settings.LOG_SUCCESS_SAMPLE_RATE:
+            return
 
-        logger.info(f"Incoming Request: {request.method} {request.url}")
-        logger.info(f"Headers: {request.headers}")
+        if status_code >= 500:
+            level = logging.ERROR
+        elif status_code >= 400 or slow:
+            level = logging.WARNING
+        else:
+            level = logging.INFO
+        if not logger.isEnabledFor(level):
+            return
 
-        response = await call_next(request)
+        client = scope.get("client")
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": self._redact_query(scope.get("query_string", b"")),
+            "client": client[0] if client else None,
+            "status": status_code,
+            "duration_ms": round(duration_ms, 3),
+            "slow": slow,
+            "headers": self._redact_headers(scope.get("headers", [])),
+        }
+        logger.log(level, "%s %s %s", scope["method"], scope["path"], status_code, extra={"fields": fields})
 
-        process_time = time.time() - start_time
-        logger.info(f"Completed in {process_time:.4f}s with status code {response.status_code}")
+    def _redact_headers(self, headers) -> dict:
+        redacted = {}
+        for name, value in headers:
+            name = name.decode("latin-1").lower()
+            redacted[name] = REDACTED if name in self.redacted else value.decode("latin-1")
+        return redacted
 
-        return response
+    def _redact_query(self, query_string: bytes) -> str:
+        if not query_string:
+            return ""
+        params = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+        return urlencode([(key, REDACTED if key.lower() in self.redacted else value) for key, value in params], safe="[]")
@@ -0,0 +1,59 @@
+import time
+
+from app.core.metrics import multiprocess_store, request_metrics
+
+# The route label of requests no route matched, so unknown paths cannot grow the label set
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope) -> str:
+    """
+    The path template of the route that served the request, from what the router stored
+    in the scope.
+    """
+    # Recent FastAPI releases match the routes of an included router in place, so the
+    # matched route only knows its path within its router; FastAPI keeps the route with
+    # the full path in its own part of the scope
+    route = scope.get("fastapi", {}).get("effective_route_context") or scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Records every HTTP request in the request metrics: its count and latency under the
+    template of the route that served it, e.g. /product/get or /orders/{order_id}, and
+    the number of requests in progress.
+
+    With METRICS_DIR set, also starts writing this worker's metrics for the others to
+    merge.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        if multiprocess_store is not None:
+            multiprocess_store.start()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        request_metrics.started()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_metrics.finished(
+                route=route_template(scope),
+                method=scope["method"],
+                status_code=status_code,
+                seconds=time.perf_counter() - start_time,
+            )
@@ -0,0 +1,73 @@
+import asyncio
+import random
+import threading
+
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import get_settings
+from app.core.profiler import PROFILE_HEADER, Sampler, profile_store, profiling_slot, verify_profile_token
+from app.middleware.metrics_middleware import route_template
+
+settings = get_settings()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles HTTP requests with a statistical sampler and saves each profile as a
+    collapsed stack file, listed and downloaded through /admin/profiles.
+
+    A request is profiled when it carries a profile header signed by
+    /admin/profiles/token, or at random at PROFILE_SAMPLE_RATE. One request is profiled
+    at a time; the response names its profile in `X-Profile-Id`, or answers
+    `X-Profile-Id: busy` to a signed request that came while another was profiled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = self._requested(scope)
+        sampled = not requested and settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+        if not (requested or sampled):
+            await self.app(scope, receive, send)
+            return
+
+        if not profiling_slot.acquire(blocking=False):
+            await self.app(scope, receive, self._with_profile_id(send, lambda: "busy") if requested else send)
+            return
+
+        names = []
+
+        def profile_name():
+            # Named after the route template, which is known once the request is routed
+            if not names:
+                names.append(profile_store.new_name(scope["method"], route_template(scope)))
+            return names[0]
+
+        sampler = Sampler(settings.PROFILE_INTERVAL, loop_thread=threading.get_ident())
+        sampler.start()
+        try:
+            await self.app(scope, receive, self._with_profile_id(send, profile_name))
+        finally:
+            sampler.stop()
+            profiling_slot.release()
+            # Saved even without samples, as the response already named the profile
+            await asyncio.to_thread(profile_store.save, profile_name(), sampler.collapsed())
+
+    def _requested(self, scope) -> bool:
+        for header, value in scope["headers"]:
+            if header == PROFILE_HEADER.encode():
+                return verify_profile_token(value.decode("latin-1"))
+        return False
+
+    def _with_profile_id(self, send, profile_id):
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile_id())
+            await send(message)
+
+        return send_with_profile_id
@@ -0,0 +1,39 @@
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import get_settings
+from app.core.query_stats import QueryStats, current_query_stats, request_finished
+from app.middleware.metrics_middleware import route_template
+
+settings = get_settings()
+
+
+class QueryStatsMiddleware:
+    """
+    Counts the queries each HTTP request runs and the time spent in them, reports them to
+    the client in a `Server-Timing` header and records them in the metrics.
+
+    With QUERY_DEBUG on, also records where each query came from and logs the requests
+    that repeat a statement QUERY_REPEAT_THRESHOLD times or more, a likely N+1.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(track_call_sites=settings.QUERY_DEBUG)
+        token = current_query_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            request_finished(route_template(scope), scope["method"], stats)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 from datetime import datetime, UTC
 from app.core.database import Base
@@ -10,6 +10,10 @@ class Cart(Base):
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
     created_at: Mapped[DateTime] = mapped_column(DateTime, default=datetime.now(UTC))
     updated_at: Mapped[DateTime] = mapped_column(DateTime, default=datetime.now(UTC), onupdate=datetime.now(UTC))
+    # Recounted from the cart items by every cart item write, in the same transaction, and
+    # by product price changes; the subtotal is at the current product prices
+    item_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    subtotal: Mapped[float] = mapped_column(Float, default=0, server_default="0", nullable=False)
 
     user = relationship("User", back_populates="cart")
     items = relationship("CartItem", back_populates="cart")
@@ -17,6 +21,10 @@ class Cart(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # One row per product and cart, so concurrent adds update the same row
+        UniqueConstraint("cart_id", "product_id", name="uq_cart_items_cart_product"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     cart_id: Mapped[int] = mapped_column(Integer, ForeignKey("carts.id"), nullable=False)
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, String, ForeignKey, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import mapped_column, Mapped
+
+from app.core.database import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        # Keys are stored as a fixed-size SHA-256 digest, whatever the client sends
+        UniqueConstraint("user_id", "key_hash", name="uq_idempotency_keys_user_key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    key_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    path: Mapped[str] = mapped_column(String, nullable=False)
+    # Null until the first request with the key has finished
+    status_code: Mapped[int] = mapped_column(Integer, nullable=True)
+    response: Mapped[str] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 from typing import List
 
@@ -9,6 +9,11 @@ from app.core.database import Base
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Order history pages, newest first, with and without a status filter
+        Index("ix_orders_user_created", "user_id", "created_at", "id"),
+        Index("ix_orders_user_status_created", "user_id", "status", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
@@ -19,8 +24,9 @@ class Order(Base):
     payment_method: Mapped[str] = mapped_column(String, nullable=True)
     status: Mapped[str] = mapped_column(String)
     total_price: Mapped[float] = mapped_column(Float)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(UTC))
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(UTC), onupdate=datetime.now(UTC))
+    # Callables, so each order gets the time it was written rather than the time the module was imported
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC))
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(UTC), onupdate=lambda: datetime.now(UTC))
 
     user= relationship("User", back_populates="orders")
     cart = relationship("Cart", back_populates="order")
@@ -35,9 +41,13 @@ class OrderItem(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     order_id: Mapped[int] = mapped_column(Integer, ForeignKey("orders.id"), nullable=False)
-    product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id"), nullable=False)
+    # Kept when the product is deleted; the item still shows the snapshot below
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id", ondelete="SET NULL"), nullable=True)
     quantity: Mapped[int] = mapped_column(Integer)
     price: Mapped[float] = mapped_column(Float)
+    # Display fields copied from the product at checkout, so order history never reads products
+    product_name: Mapped[str] = mapped_column(String, nullable=True)
+    product_thumbnail: Mapped[str] = mapped_column(String, nullable=True)
 
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
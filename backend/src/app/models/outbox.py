@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, String, DateTime, Index
+from sqlalchemy.orm import mapped_column, Mapped
+
+from app.core.database import Base
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # The worker claims the oldest pending events that are due
+        Index("ix_outbox_events_status_available", "status", "available_at", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    topic: Mapped[str] = mapped_column(String, nullable=False)
+    # JSON document handed to the topic's handler
+    payload: Mapped[str] = mapped_column(String, nullable=False)
+    # "Pending" until handled, then "Done", or "Failed" once out of attempts
+    status: Mapped[str] = mapped_column(String, nullable=False, default="Pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[str] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # Not handled before this time; pushed back after each failed attempt
+    available_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    processed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
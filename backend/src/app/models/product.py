@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, Float, Column, ForeignKey
+from sqlalchemy import Integer, String, Float, Column, ForeignKey, Index
 from sqlalchemy.orm import relationship, mapped_column, Mapped
 
 from app.core.database import Base
@@ -35,14 +35,17 @@ class ModelCategory(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_price_id", "price", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String, unique=True, index=True)
     description: Mapped[str] = mapped_column(String)
     price: Mapped[float] = mapped_column(Float)
-    part_category_id: Mapped[int] = mapped_column(Integer, ForeignKey("part_categories.id"), nullable=False)
-    brand_category_id: Mapped[int] = mapped_column(Integer, ForeignKey("brand_categories.id"), nullable=False)
-    model_category_id: Mapped[int] = mapped_column(Integer, ForeignKey("model_categories.id"))
+    part_category_id: Mapped[int] = mapped_column(Integer, ForeignKey("part_categories.id"), nullable=False, index=True)
+    brand_category_id: Mapped[int] = mapped_column(Integer, ForeignKey("brand_categories.id"), nullable=False, index=True)
+    model_category_id: Mapped[int] = mapped_column(Integer, ForeignKey("model_categories.id"), index=True)
     tags: Mapped[str] = mapped_column(String)
     images: Mapped[str] = mapped_column(String)
     thumbnail: Mapped[str] = mapped_column(String)
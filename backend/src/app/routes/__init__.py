@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.routes import admin, cart, checkout, orders, product, search, support, user
+from app.routes import admin, cart, checkout, metrics, orders, product, search, support, user
 
 api_router = APIRouter()
 
@@ -12,3 +12,4 @@ api_router.include_router(checkout.router, prefix="/checkout", tags=["Checkout"]
 api_router.include_router(orders.router, prefix="/orders", tags=["Orders"])
 api_router.include_router(search.router, prefix="/search", tags=["Search"])
 api_router.include_router(support.router, prefix="/support", tags=["Support"])
+api_router.include_router(metrics.router, tags=["Metrics"])
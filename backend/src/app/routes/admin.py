@@ -1,17 +1,26 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
 
 from sqlalchemy.orm import Session
 
 import app.services.product as product_service
 import app.services.support as support_service
+import app.services.outbox as outbox_service
 from app.dependencies import get_db
 from app.models.user import User
-from app.core.auth import get_current_user
+from app.core.auth import CurrentUser, get_current_admin, get_current_user_sync
+from app.core.config import get_settings
+from app.core.database import get_pool_stats
+from app.core.logging_config import get_logging_stats
+from app.core.profiler import PROFILE_HEADER, create_profile_token, profile_store
+from app.core.security import hash_executor
 from app.models.product import Product
 from app.schemas.product import ProductCreate, ProductUpdate, PartCategoryCreate, BrandCategoryCreate, ModelCategoryCreate
 
 router = APIRouter()
 
+settings = get_settings()
+
 
 @router.post("/add-part-category")
 def add_part_category(new_part: PartCategoryCreate, db: Session = Depends(get_db)):
@@ -240,8 +249,299 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
     """
     return product_service.delete_product(db=db, product_id=product_id)
 
+@router.get("/cache-stats")
+def get_cache_stats():
+    """
+    Retrieve Catalog Cache Statistics
+
+    This endpoint reports how the in-process catalog read cache of the worker that served the request is performing.
+
+    - **Returns**:
+        - `dict`: The current size and capacity of the cache and its hit, miss, eviction and expiration counters.
+
+    Example Request:
+    ```http
+    GET /admin/cache-stats
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "size": 120,
+        "maxsize": 2048,
+        "ttl": 60.0,
+        "hits": 5321,
+        "misses": 410,
+        "evictions": 0,
+        "expirations": 290
+    }
+    ```
+    """
+    return product_service.get_catalog_cache_stats()
+
+@router.get("/logging-stats")
+def get_request_logging_stats():
+    """
+    Retrieve Request Logging Statistics
+
+    This endpoint reports on the log queue of the worker that served the request. Log records are put on the queue
+    by the request and written to the log file in batches by a background thread.
+
+    - **Returns**:
+        - `dict`: The records waiting on the queue, the records and batches written so far, and the records dropped
+          because the queue was full.
+
+    Example Request:
+    ```http
+    GET /admin/logging-stats
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "queued": 0,
+        "written": 18240,
+        "batches": 2511,
+        "dropped": 0
+    }
+    ```
+
+    - **Notes**:
+        - Records are dropped rather than slowing requests down; a growing `dropped` count means the disk cannot keep
+          up, and `LOG_SUCCESS_SAMPLE_RATE` can be lowered or `LOG_QUEUE_SIZE` raised.
+    """
+    return get_logging_stats()
+
+@router.get("/db-pool-stats")
+def get_db_pool_stats():
+    """
+    Retrieve Database Connection Pool Statistics
+
+    This endpoint reports how busy the database connection pools of the worker that served the request are.
+    The sync pool serves the routes still using `Session` and the async pool the routes using `AsyncSession`.
+
+    - **Returns**:
+        - `dict`: For each pool, its size and overflow limit, the connections checked out and idle, the checkout
+          timeout, the number of checkouts that timed out, and a histogram of checkout wait times in seconds
+          (cumulative counts per bucket upper bound).
+
+    Example Request:
+    ```http
+    GET /admin/db-pool-stats
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "sync": {
+            "size": 5,
+            "max_overflow": 10,
+            "checked_out": 3,
+            "idle": 2,
+            "overflow": 0,
+            "timeout": 30.0,
+            "timeouts": 0,
+            "wait_seconds": {"count": 5120, "sum": 1.84, "buckets": {"0.001": 5011, "0.005": 5100, "...": 5120, "+Inf": 5120}}
+        },
+        "async": {...}
+    }
+    ```
+
+    - **Notes**:
+        - Pool sizes are set with `DB_POOL_SIZE`, `DB_MAX_OVERFLOW`, `DB_POOL_TIMEOUT`, `DB_POOL_PRE_PING` and `DB_POOL_RECYCLE`.
+        - Waits in the upper buckets or a growing `timeouts` count mean requests are queueing for connections.
+        - An in-memory SQLite database keeps its own single-connection pool, which only reports `timeouts` and
+          `wait_seconds`.
+    """
+    return get_pool_stats()
+
+@router.get("/hash-stats")
+def get_hash_stats():
+    """
+    Retrieve Password Hashing Statistics
+
+    This endpoint reports how the password hashing threads of the worker that served the request are keeping up
+    with logins and registrations.
+
+    - **Returns**:
+        - `dict`: The number of hashing threads and queue slots, the completed and rejected job counters, and the
+          median, 99th percentile and maximum queue wait and hash time over the recent jobs.
+
+    Example Request:
+    ```http
+    GET /admin/hash-stats
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "workers": 4,
+        "queue_size": 64,
+        "completed": 812,
+        "rejected": 0,
+        "queue_wait": {"p50_ms": 0.05, "p99_ms": 410.2, "max_ms": 655.0},
+        "hash_time": {"p50_ms": 248.7, "p99_ms": 262.1, "max_ms": 270.4}
+    }
+    ```
+
+    - **Notes**:
+        - A growing queue wait means logins arrive faster than the threads can hash; rejected logins get a 503.
+    """
+    return hash_executor.stats()
+
+@router.get("/outbox-stats")
+def get_outbox_stats(db: Session = Depends(get_db)):
+    """
+    Retrieve Outbox Statistics
+
+    This endpoint reports how far the outbox worker, which sends order confirmation emails and analytics
+    events, is behind.
+
+    - **Parameters**:
+        - `db` (Session): A database session dependency for interacting with the database.
+
+    - **Returns**:
+        - `dict`: The number of pending events, the age in seconds of the oldest one, and the number of events
+          that ran out of attempts.
+
+    Example Request:
+    ```http
+    GET /admin/outbox-stats
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "pending": 3,
+        "oldest_pending_age_seconds": 1.8,
+        "failed": 0
+    }
+    ```
+
+    - **Notes**:
+        - The worker runs as its own process, `python -m app.jobs.outbox_worker`, which prints its own counters.
+        - A growing `oldest_pending_age_seconds` means the worker is down or falling behind.
+    """
+    return outbox_service.get_outbox_stats(db=db)
+
+@router.post("/profiles/token")
+def create_profiling_token(ttl: int = 300, current_admin: CurrentUser = Depends(get_current_admin)):
+    """
+    Create a Profiling Token
+
+    This endpoint signs a value for the profile request header. Requests carrying the header are profiled with a
+    statistical sampler until the token expires, and their profiles saved for `/admin/profiles`.
+
+    - **Parameters**:
+        - `ttl` (int): Seconds the token is accepted for, at most `PROFILE_TOKEN_MAX_TTL`. Defaults to 300.
+        - `current_admin` (CurrentUser): The authenticated admin, retrieved via dependency injection.
+
+    - **Returns**:
+        - `dict`: The header to send, its signed value and when it expires, in seconds since the epoch.
+
+    - **Raises**:
+        - `HTTPException`:
+            - 400 if `ttl` is not between 1 and `PROFILE_TOKEN_MAX_TTL`.
+            - 403 if the user is not an admin.
+
+    Example Request:
+    ```http
+    POST /admin/profiles/token?ttl=300
+    Authorization: Bearer <admin token>
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "header": "X-Profile-Request",
+        "value": "1760806800.5f2b0c...",
+        "expires_at": 1760806800
+    }
+    ```
+
+    - **Notes**:
+        - The response of a profiled request names its profile in the `X-Profile-Id` header, or says `busy` when
+          another request was being profiled.
+    """
+    if not 1 <= ttl <= settings.PROFILE_TOKEN_MAX_TTL:
+        raise HTTPException(status_code=400, detail=f"ttl must be between 1 and {settings.PROFILE_TOKEN_MAX_TTL} seconds")
+    value, expires_at = create_profile_token(ttl)
+    return {"header": PROFILE_HEADER.title(), "value": value, "expires_at": expires_at}
+
+@router.get("/profiles")
+def list_profiles(current_admin: CurrentUser = Depends(get_current_admin)):
+    """
+    List Saved Request Profiles
+
+    This endpoint lists the request profiles saved by the worker's profiler, newest first.
+
+    - **Parameters**:
+        - `current_admin` (CurrentUser): The authenticated admin, retrieved via dependency injection.
+
+    - **Returns**:
+        - `dict`: The profiles, each with its name and size in bytes. The name holds the time, method and route of
+          the request.
+
+    - **Raises**:
+        - `HTTPException`: 403 if the user is not an admin.
+
+    Example Request:
+    ```http
+    GET /admin/profiles
+    Authorization: Bearer <admin token>
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "profiles": [
+            {"name": "20261018T170145123-GET-product_get.folded", "size": 18234}
+        ]
+    }
+    ```
+
+    - **Notes**:
+        - Only the newest `PROFILE_MAX_FILES` profiles are kept in `PROFILE_DIR`.
+    """
+    return {"profiles": profile_store.list()}
+
+@router.get("/profiles/{name}")
+def download_profile(name: str, current_admin: CurrentUser = Depends(get_current_admin)):
+    """
+    Download a Request Profile
+
+    This endpoint returns a saved profile in the collapsed stack format: one line per sampled stack, its frames
+    separated by `;` from the thread down to the innermost call, followed by the number of samples.
+
+    - **Parameters**:
+        - `name` (str): The name of the profile, as listed by `/admin/profiles`.
+        - `current_admin` (CurrentUser): The authenticated admin, retrieved via dependency injection.
+
+    - **Returns**:
+        - `text/plain`: The profile.
+
+    - **Raises**:
+        - `HTTPException`:
+            - 403 if the user is not an admin.
+            - 404 if there is no profile by that name.
+
+    Example Request:
+    ```http
+    GET /admin/profiles/20261018T170145123-GET-product_get.folded
+    Authorization: Bearer <admin token>
+    ```
+
+    - **Notes**:
+        - Open the file in https://www.speedscope.app or render it with flamegraph.pl.
+        - Samples are taken from every thread of the worker, so requests served at the same time show up as well.
+    """
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
 @router.get("/support/getalltickets")
-def get_all_tickets(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_all_tickets(current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     tickets = support_service.get_all_tickets(db=db)
     data = {
         "tickets": [
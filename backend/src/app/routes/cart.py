@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.schemas.cart import CartResponse, CartItemCreate, CartItemUpdate, Cart
-from app.dependencies import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.cart import CartResponse, CartBatch, CartItemCreate, CartItemUpdate, Cart
+from app.dependencies import get_async_db, run_in_session
 from app.models.user import User
 from app.core.auth import get_current_user
 import app.services.cart as cart_service
@@ -10,7 +10,7 @@ router = APIRouter()
 
 
 @router.get("/", response_model=Cart)
-def get_cart_by_user_id(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_cart_by_user_id(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve the Cart for the Current User
 
@@ -19,7 +19,7 @@ def get_cart_by_user_id(current_user: User = Depends(get_current_user), db: Sess
 
     - **Parameters**:
         - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
-        - `db` (Session): A database session dependency for interacting with the database.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
 
     - **Returns**:
         - `Cart`: The cart object for the user, containing the list of items in the cart.
@@ -46,16 +46,45 @@ def get_cart_by_user_id(current_user: User = Depends(get_current_user), db: Sess
     - **Notes**:
         - If no cart exists for the user, it will be automatically created.
     """
-    cart = cart_service.get_or_create_cart(db=db, user_id=current_user.id)
+    cart = await run_in_session(db, cart_service.get_or_create_cart, user_id=current_user.id)
     return cart
 
 @router.get("/getTotalItems")
-def get_total_number_of_items(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    total_items = cart_service.get_total_items_in_cart(user_id=current_user.id, db=db)
+async def get_total_number_of_items(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieve the Number of Items in the Cart
+
+    This endpoint returns the total quantity of items in the current user's cart, for the navbar badge.
+
+    - **Parameters**:
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
+
+    - **Returns**:
+        - `dict`: The total quantity under `total_items` and the cart subtotal under `subtotal`.
+
+    Example Request:
+    ```http
+    GET /cart/getTotalItems
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "total_items": 3,
+        "subtotal": 74.5
+    }
+    ```
+
+    - **Notes**:
+        - The counts are stored on the cart and cached briefly, so this does not load the cart items.
+        - A user without a cart gets zero; no cart is created.
+    """
+    total_items = await run_in_session(db, cart_service.get_total_items_in_cart, user_id=current_user.id)
     return total_items
 
 @router.post("/add", response_model=Cart)
-def add_product_to_cart(item: CartItemCreate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def add_product_to_cart(item: CartItemCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Add a Product to the User's Cart
 
@@ -65,7 +94,7 @@ def add_product_to_cart(item: CartItemCreate, current_user: User = Depends(get_c
     - **Parameters**:
         - `item` (CartItemCreate): The product and quantity to be added to the cart.
         - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
-        - `db` (Session): A database session dependency for interacting with the database.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
 
     - **Returns**:
         - `Cart`: The updated cart object after the product has been added.
@@ -98,12 +127,72 @@ def add_product_to_cart(item: CartItemCreate, current_user: User = Depends(get_c
     - **Notes**:
         - The cart is automatically created if it doesn't exist.
     """
-    return cart_service.add_product_to_cart(db=db, item=item, user_id=current_user.id)
+    return await run_in_session(db, cart_service.add_product_to_cart, item=item, user_id=current_user.id)
+
+
+
+@router.post("/batch", response_model=Cart)
+async def apply_cart_batch(batch: CartBatch, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """
+    Apply Several Changes to the Cart at Once
+
+    This endpoint adds, updates and removes several products of the current user's cart in a single
+    request, for example to add a whole kit. The changes are applied together and the cart is returned once.
 
+    - **Parameters**:
+        - `batch` (CartBatch): The changes to apply, in this order:
+            - `add` (list[CartItemCreate]): Products and quantities to add, as for `/cart/add`.
+            - `update` (list[CartItemUpdate]): Products and their new quantities, as for `/cart/update`.
+            - `remove` (list[int]): IDs of the products to remove.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
+
+    - **Returns**:
+        - `Cart`: The updated cart.
+
+    - **Raises**:
+        - `HTTPException` (status code 400): If a product to add does not exist.
+        - `HTTPException` (status code 404): If a product to update is not in the cart.
+
+    Example Request:
+    ```http
+    POST /cart/batch
+    Content-Type: application/json
+
+    {
+        "add": [
+            {"product_id": 101, "quantity": 1},
+            {"product_id": 102, "quantity": 4}
+        ],
+        "update": [
+            {"product_id": 87, "quantity": 2}
+        ],
+        "remove": [55]
+    }
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "items": [
+            {
+                "product": {"id": 87, "name": "Product A", "price": 12.5, ...},
+                "quantity": 2
+            },
+            ...
+        ],
+        "total_price": 161.0
+    }
+    ```
+
+    - **Notes**:
+        - If any change is invalid, none of them is applied.
+    """
+    return await run_in_session(db, cart_service.apply_cart_batch, batch=batch, user_id=current_user.id)
 
 
 @router.put("/update")
-def update_quantity(item: CartItemUpdate, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def update_quantity(item: CartItemUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Update the Quantity of a Product in the Cart
 
@@ -113,7 +202,7 @@ def update_quantity(item: CartItemUpdate, current_user: User = Depends(get_curre
     - **Parameters**:
         - `item` (CartItemUpdate): The product ID and the new quantity to update in the cart.
         - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
-        - `db` (Session): A database session dependency for interacting with the database.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
 
     - **Returns**:
         - `Cart`: The updated cart object after the quantity has been changed.
@@ -146,11 +235,11 @@ def update_quantity(item: CartItemUpdate, current_user: User = Depends(get_curre
     - **Notes**:
         - If the updated quantity is zero, the product will be removed from the cart.
     """
-    return cart_service.update_cart_item_quantity(db=db, item=item, user_id=current_user.id)
+    return await run_in_session(db, cart_service.update_cart_item_quantity, item=item, user_id=current_user.id)
 
 
 @router.delete("/remove/{product_id}")
-def remove_product(product_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def remove_product(product_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Remove a Product from the Cart
 
@@ -159,7 +248,7 @@ def remove_product(product_id: int, current_user: User = Depends(get_current_use
     - **Parameters**:
         - `product_id` (int): The ID of the product to be removed from the cart.
         - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
-        - `db` (Session): A database session dependency for interacting with the database.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
 
     - **Returns**:
         - `Cart`: The updated cart object after the product has been removed.
@@ -181,11 +270,11 @@ def remove_product(product_id: int, current_user: User = Depends(get_current_use
     - **Notes**:
         - If the product is not found in the cart, an error will be raised.
     """
-    return cart_service.remove_product_from_cart(db=db, product_id=product_id, user_id=current_user.id)
+    return await run_in_session(db, cart_service.remove_product_from_cart, product_id=product_id, user_id=current_user.id)
 
 
 @router.delete("/clear")
-def clear_cart(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def clear_cart(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Clear All Products from the Cart
 
@@ -193,7 +282,7 @@ def clear_cart(current_user: User = Depends(get_current_user), db: Session = Dep
 
     - **Parameters**:
         - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
-        - `db` (Session): A database session dependency for interacting with the database.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
 
     - **Returns**:
         - `dict`: A confirmation message indicating the cart has been cleared.
@@ -213,4 +302,4 @@ def clear_cart(current_user: User = Depends(get_current_user), db: Session = Dep
     - **Notes**:
         - This will remove all products from the cart for the current user.
     """
-    return cart_service.clear_cart(db=db, user_id=current_user.id)
+    return await run_in_session(db, cart_service.clear_cart, user_id=current_user.id)
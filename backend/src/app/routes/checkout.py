@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import app.services.checkout as checkout_service
 import app.services.cart as cart_service
-from app.core.auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, get_current_user
-from app.dependencies import get_db
+import app.services.idempotency as idempotency_service
+from app.core.auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, get_current_user, get_current_user_sync
+from app.dependencies import get_async_db, get_db, run_in_session
 from app.schemas.address import Address as AddressSchema
+from app.schemas.order import OrderUpdate, PaymentMethod, ShippingMethod
 from app.models.user import User
 from app.models.cart import Cart
 from app.models.order import Order, OrderItem
@@ -15,7 +18,10 @@ router = APIRouter()
 
 
 @router.post("/")
-def start_checkout(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def start_checkout(
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)):
     """
     Initiate the Checkout Process for the Current User
 
@@ -23,8 +29,9 @@ def start_checkout(current_user: User = Depends(get_current_user), db: Session =
     It clears the user's cart and begins creating an order.
 
     - **Parameters**:
+        - `Idempotency-Key` (header, optional): A unique value per checkout attempt, reused on retries.
         - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
-        - `db` (Session): A database session dependency for interacting with the database.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
 
     - **Returns**:
         - `Cart`: The cart object, which has been cleared after checkout initiation.
@@ -45,14 +52,20 @@ def start_checkout(current_user: User = Depends(get_current_user), db: Session =
 
     - **Notes**:
         - The cart is automatically cleared after initiating checkout.
+        - A retry with the same `Idempotency-Key` returns the first response, marked with an
+          `Idempotent-Replayed: true` header, without creating another order. Keys expire after
+          `IDEMPOTENCY_KEY_TTL` seconds.
     """
-    order = checkout_service.start_checkout(user_id=current_user.id, db=db)
-    cart = cart_service.get_or_create_cart(db=db, user_id=current_user.id)
-    cart_service.clear_cart(user_id=current_user.id, db=db)
-    return cart
+    def run(db: Session):
+        order = checkout_service.start_checkout(user_id=current_user.id, db=db)
+        cart = cart_service.get_or_create_cart(db=db, user_id=current_user.id)
+        cart_service.clear_cart(user_id=current_user.id, db=db)
+        return cart
+
+    return await run_in_session(db, idempotency_service.run_idempotent, user_id=current_user.id, key=idempotency_key, path="/checkout/", handler=run)
 
 @router.get("/address/all")
-def get_all_addresses(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_all_addresses(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve All Addresses Associated with the Current User
 
@@ -60,7 +73,7 @@ def get_all_addresses(current_user: User = Depends(get_current_user), db: Sessio
 
     - **Parameters**:
         - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
-        - `db` (Session): A database session dependency for interacting with the database.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
 
     - **Returns**:
         - `List[Address]`: A list of the user's saved addresses.
@@ -84,7 +97,7 @@ def get_all_addresses(current_user: User = Depends(get_current_user), db: Sessio
     - **Notes**:
         - If no addresses are found, a `400` HTTPException is raised.
     """
-    addresses = checkout_service.get_all_addressses(user_id=current_user.id, db=db)
+    addresses = await run_in_session(db, checkout_service.get_all_addressses, user_id=current_user.id)
 
     if not addresses:
         raise HTTPException(
@@ -95,7 +108,7 @@ def get_all_addresses(current_user: User = Depends(get_current_user), db: Sessio
     return addresses
 
 @router.delete("/address")
-def remove_address(address_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def remove_address(address_id: int, current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Remove a Saved Address for the Current User
 
@@ -103,7 +116,7 @@ def remove_address(address_id: int, current_user: User = Depends(get_current_use
 
     - **Parameters**:
         - `address_id` (int): The ID of the address to be removed.
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency for interacting with the database.
 
     - **Returns**:
@@ -137,7 +150,7 @@ def remove_address(address_id: int, current_user: User = Depends(get_current_use
             "address" : getAddress}
 
 @router.post("/address/setshipping")
-def set_shipping_address(address_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def set_shipping_address(address_id: int, current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Set the Shipping Address for the Current User
 
@@ -145,7 +158,7 @@ def set_shipping_address(address_id: int, current_user: User = Depends(get_curre
 
     - **Parameters**:
         - `address_id` (int): The ID of the address to be set as the shipping address.
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency for interacting with the database.
 
     - **Returns**:
@@ -171,15 +184,15 @@ def set_shipping_address(address_id: int, current_user: User = Depends(get_curre
     - **Notes**:
         - If the provided address ID is invalid, a message indicating the error is returned.
     """
-    checkout_service.set_shipping_address(address_id=address_id, user_id=current_user.id, db=db)
     getAddress = checkout_service.get_address_by_user_and_id(user_id=current_user.id, address_id=address_id, db=db)
     if getAddress is None:
         return {"message": "That is an invalid address"}
+    checkout_service.set_shipping_address(address_id=address_id, user_id=current_user.id, db=db)
     return {"message": "Set shipping address" ,
             "address" : {getAddress}}
 
 @router.post("/address/setbilling")
-def set_billing_address(address_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def set_billing_address(address_id: int, current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Set the Billing Address for the Current User
 
@@ -187,7 +200,7 @@ def set_billing_address(address_id: int, current_user: User = Depends(get_curren
 
     - **Parameters**:
         - `address_id` (int): The ID of the address to be set as the billing address.
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency for interacting with the database.
 
     - **Returns**:
@@ -213,15 +226,15 @@ def set_billing_address(address_id: int, current_user: User = Depends(get_curren
     - **Notes**:
         - If the provided address ID is invalid, a message indicating the error is returned.
     """
-    checkout_service.set_billing_address(address_id=address_id, user_id=current_user.id, db=db)
     getAddress = checkout_service.get_address_by_user_and_id(user_id=current_user.id, address_id=address_id, db=db)
     if getAddress is None:
         return {"message": "That is an invalid address"}
+    checkout_service.set_billing_address(address_id=address_id, user_id=current_user.id, db=db)
     return {"message": "Set billing address",
             "address" : {getAddress}}
 
 @router.post("/address")
-def add_address(address: AddressSchema, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def add_address(address: AddressSchema, current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Add a New Address for the Current User
 
@@ -229,7 +242,7 @@ def add_address(address: AddressSchema, current_user: User = Depends(get_current
 
     - **Parameters**:
         - `address` (AddressSchema): The new address to be added.
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency for interacting with the database.
 
     - **Returns**:
@@ -263,18 +276,17 @@ def add_address(address: AddressSchema, current_user: User = Depends(get_current
 
 @router.post("/shipping-method")
 def select_shipping_method(
-    shipping_method: str = Query(default="Regular Shipping(3-5 Days)",
-        enum=["Regular Shipping(3-5 Days)", "Next Day Shipping(1-2 Days)",
-        "Priority Shipping(1 Day)"]),
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    shipping_method: ShippingMethod = "Regular Shipping(3-5 Days)",
+    current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Select the Shipping Method for the Order
 
     This endpoint allows the current user to select a shipping method for their order.
 
     - **Parameters**:
-        - `shipping_method` (str): The shipping method selected by the user.
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `shipping_method` (str): The shipping method selected by the user, one of `Regular Shipping(3-5 Days)`,
+          `Next Day Shipping(1-2 Days)` or `Priority Shipping(1 Day)`; anything else is rejected with 422.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency for interacting with the database.
 
     - **Returns**:
@@ -304,18 +316,17 @@ def select_shipping_method(
 
 
 @router.post("/payment-method")
-def select_payment_method(payment_method: str = Query(default="Card",
-                                                         enum=["Card", "Cashapp",
-                                                            "Venmo"]),
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def select_payment_method(payment_method: PaymentMethod = "Card",
+    current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Select the Payment Method for the Order
 
     This endpoint allows the current user to select a payment method for their order.
 
     - **Parameters**:
-        - `payment_method` (str): The payment method selected by the user.
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `payment_method` (str): The payment method selected by the user, one of `Card`, `Cashapp` or `Venmo`;
+          anything else is rejected with 422.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency for interacting with the database.
 
     - **Returns**:
@@ -344,16 +355,76 @@ def select_payment_method(payment_method: str = Query(default="Card",
             "Order": getOrder}
 
 
+@router.patch("/order")
+async def update_pending_order(update: OrderUpdate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """
+    Update the Pending Order
+
+    This endpoint sets any of the shipping address, billing address, shipping method and payment method of the
+    current user's pending order in one request, instead of one call per field.
+
+    - **Parameters**:
+        - `update` (OrderUpdate): The fields to set; omitted fields are left unchanged.
+            - `shipping_address_id`, `billing_address_id` (int, optional): IDs of addresses of the user.
+            - `shipping_method` (str, optional): `Regular Shipping(3-5 Days)`, `Next Day Shipping(1-2 Days)` or `Priority Shipping(1 Day)`.
+            - `payment_method` (str, optional): `Card`, `Cashapp` or `Venmo`.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
+
+    - **Returns**:
+        - `Order`: The updated pending order.
+
+    - **Raises**:
+        - `HTTPException` (status code 400): If there is no pending order, or an address does not belong to the user.
+
+    Example Request:
+    ```http
+    PATCH /checkout/order
+    Content-Type: application/json
+
+    {
+        "shipping_address_id": 3,
+        "billing_address_id": 3,
+        "shipping_method": "Next Day Shipping(1-2 Days)",
+        "payment_method": "Card"
+    }
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "id": 1,
+        "user_id": 1,
+        "status": "Pending",
+        "shipping_address_id": 3,
+        "billing_address_id": 3,
+        "shipping_method": "Next Day Shipping(1-2 Days)",
+        "payment_method": "Card",
+        "total_price": 100.0
+    }
+    ```
+
+    - **Notes**:
+        - All the fields are applied together, after the addresses have been checked, so a rejected
+          request changes nothing.
+    """
+    return await run_in_session(db, checkout_service.update_pending_order, update=update, user_id=current_user.id)
+
+
 @router.post("/complete")
-def finalize_checkout(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def finalize_checkout(
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)):
     """
     Complete the Checkout Process
 
     This endpoint finalizes the checkout process, completing the user's order.
 
     - **Parameters**:
+        - `Idempotency-Key` (header, optional): A unique value per completion attempt, reused on retries.
         - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
-        - `db` (Session): A database session dependency for interacting with the database.
+        - `db` (AsyncSession): An async database session dependency for interacting with the database.
 
     - **Returns**:
         - `dict`: A confirmation message and the completed order.
@@ -373,13 +444,20 @@ def finalize_checkout(current_user: User = Depends(get_current_user), db: Sessio
             "status": "Completed"
         }
     }
+
+    - **Notes**:
+        - A retry with the same `Idempotency-Key` returns the first response, marked with an
+          `Idempotent-Replayed: true` header, without touching the order again.
     """
-    order = checkout_service.finalize_checkout(user_id=current_user.id, db=db)
+    def run(db: Session):
+        order = checkout_service.finalize_checkout(user_id=current_user.id, db=db)
+
+        if(order.shipping_address_id and order.billing_address_id and order.shipping_method and order.payment_method):
+            return {"message": "Checkout Complete", "order": order}
+        else:
+            return {"error": "Checkout not completed", "order": order}
 
-    if(order.shipping_address_id and order.billing_address_id and order.shipping_method and order.payment_method):
-        return {"message": "Checkout Complete", "order": order}
-    else:
-        return {"error": "Checkout not completed", "order": order}
+    return await run_in_session(db, idempotency_service.run_idempotent, user_id=current_user.id, key=idempotency_key, path="/checkout/complete", handler=run)
 
 
 @router.get("/order-summary")
@@ -0,0 +1,54 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import get_metrics
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_prometheus_metrics():
+    """
+    Retrieve Metrics for Prometheus
+
+    This endpoint exposes the request, database pool and cache metrics in the Prometheus text format, to be scraped.
+
+    - **Returns**:
+        - `str`: The metrics, one sample per line:
+            - `http_requests_total`: Requests served, by route template, method and status.
+            - `http_request_duration_seconds`: A latency histogram by route template and method.
+            - `http_requests_in_flight`: Requests being served.
+            - `http_request_db_queries`, `http_request_db_seconds` and `http_requests_repeated_queries_total`: The
+              queries each request ran, the time spent in them, and the requests that repeated a statement.
+            - `db_pool_connections`, `db_pool_size`, `db_pool_checkout_timeouts_total` and
+              `db_pool_checkout_wait_seconds`: The sync and async connection pools.
+            - `cache_entries` and `cache_hits_total`, `cache_misses_total`, `cache_evictions_total` and
+              `cache_expirations_total`: The in-process caches, by name.
+
+    Example Request:
+    ```http
+    GET /metrics
+    ```
+
+    Example Successful Response:
+    ```text
+    # HELP http_requests_total Requests served, by route template, method and status.
+    # TYPE http_requests_total counter
+    http_requests_total{route="/product/get",method="GET",status="200"} 1520
+    # HELP http_request_duration_seconds Time to serve a request, by route template and method.
+    # TYPE http_request_duration_seconds histogram
+    http_request_duration_seconds_bucket{route="/product/get",method="GET",le="0.005"} 1210
+    ...
+    ```
+
+    - **Notes**:
+        - Routes are labelled by their template, so `/orders/1` and `/orders/2` count as `/orders/{order_id}`;
+          paths no route matched count as `<unmatched>`.
+        - Without `METRICS_DIR` the metrics are those of the worker that served the scrape. With it set to a
+          directory shared by the workers, every worker writes its metrics there every `METRICS_WRITE_INTERVAL`
+          seconds, and the scrape sums them; gauges only count the workers still running. Files left by an earlier
+          server, told apart by the pid and start time of the process manager, are deleted as workers start.
+    """
+    return PlainTextResponse(get_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,39 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
-from app.core.auth import get_current_user, get_db
+from app.core.auth import get_current_user_sync, get_db
 
 from app.models.user import User
-from app.models.order import Order
 
 import app.services.checkout as checkout_service
-
-from app.crud import (
-    get_order_by_id_crud
-)
+import app.services.orders as order_service
+from app.core.pagination import MAX_PAGE_SIZE
 
 
 router = APIRouter()
 
 
 @router.get("/")
-def get_all_user_orders(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_all_user_orders(
+    status: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user_sync),
+    db: Session = Depends(get_db)):
     """
-    Retrieve All Orders Associated with the Current User
+    Retrieve the Orders of the Current User
 
-    This endpoint fetches all orders placed by the current authenticated user along with the details of the items in each order.
+    This endpoint fetches the orders placed by the current authenticated user, newest first and one page at a time,
+    along with the details of the items in each order.
 
     - **Parameters**:
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `status` (str, optional): Only orders with this status, e.g. `Pending` or `Complete`.
+        - `cursor` (str, optional): The `next_cursor` of the previous page. Omit it to get the first page.
+        - `limit` (int): The number of orders per page (1-200).
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency for interacting with the database.
 
     - **Returns**:
-        - `dict`: A list of all orders made by the user in the field `order_content`, 
-          with each order containing a list of its items.
+        - `dict`: A page of the orders made by the user in the field `order_content`,
+          with each order containing a list of its items, and the cursor of the next page in `next_cursor`.
 
     Example Request:
     ```http
-    GET /orders
+    GET /orders?status=Complete&limit=20
     ```
 
     Example Successful Response:
@@ -58,31 +64,22 @@ def get_all_user_orders(current_user: User = Depends(get_current_user), db: Sess
                     }
                 ]
             }
-        ]
+        ],
+        "next_cursor": "eyJrIjoib3JkZXJzIiwidiI6WyIyMDI1LTAxLTAxVDEwOjAwOjAwIiwxXX0"
     }
-    """
-    orders = db.query(Order).filter(Order.user_id == current_user.id).all()
-
-    order_data = []
-    for order in orders:
-        items = [
-            {
-                "product_name": item.product.name,
-                "product_thumbnail": item.product.thumbnail,
-                "item_quantity": item.quantity,
-                "item_price": item.price,
-            }
-            for item in order.items
-        ]
-        order_data.append({
-            "id": order.id,
-            "user_id": order.user_id,
-            "status": order.status,
-            "total_price": order.total_price,
-            "items": items,
-        })
+    ```
 
-    return {"order_content": order_data}
+    - **Notes**:
+        - Pass back `next_cursor` with the same `status` until it is `null` to load older orders.
+        - Items and their products are loaded for the whole page at once.
+    """
+    return order_service.list_user_orders(
+        db=db,
+        user_id=current_user.id,
+        status=status,
+        cursor=cursor,
+        limit=limit
+    )
 
 
 @router.get("/{order_id}")
@@ -123,27 +120,4 @@ def get_order_by_id(order_id: int, db: Session = Depends(get_db)):
         "detail": "Order ID not valid"
     }
     """
-    order = get_order_by_id_crud(order_id, db)
-    if order is None:
-        raise HTTPException(status_code=400, detail="Order ID not valid")
-    
-    order_data = []
-
-    items = [
-        {
-            "product_name": item.product.name,
-            "product_thumbnail": item.product.thumbnail,
-            "item_quantity": item.quantity,
-            "item_price": item.price,
-        }
-        for item in order.items
-    ]
-
-    order_data.append({
-        "id": order.id,
-        "status": order.status,
-        "total_price": order.total_price,
-        "items": items
-    })
-
-    return order_data
+    return order_service.get_order(db=db, order_id=order_id)
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Query
 from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from pathlib import Path 
 
 import app.services.product as product_service
-from app.dependencies import get_db
+from app.core.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.dependencies import get_async_db, get_db, run_in_session
+from app.schemas.product import ProductSort
 
 import shutil
 import uuid
@@ -18,37 +21,64 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @router.get("/")
-def get_all_products(db: Session = Depends(get_db)):
+def get_all_products(
+    sort: ProductSort = "id",
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    part_category_id: int | None = None,
+    brand_category_id: int | None = None,
+    model_category_id: int | None = None,
+    min_price: float | None = Query(default=None, ge=0),
+    max_price: float | None = Query(default=None, ge=0),
+    facets: bool = False,
+    db: Session = Depends(get_db)):
     """
-    Retrieve All Products
+    Retrieve a Page of Products
 
-    This endpoint retrieves all products from the database.
+    This endpoint retrieves the product catalog one page at a time, optionally filtered by category and price.
 
     - **Parameters**:
+        - `sort` (str): The sort order of the listing, one of `id`, `price` or `name`; anything else is rejected with 422.
+        - `cursor` (str, optional): The `next_cursor` of the previous page. Omit it to get the first page.
+        - `limit` (int): The number of products per page (1-200).
+        - `part_category_id`, `brand_category_id`, `model_category_id` (int, optional): Category filters.
+        - `min_price`, `max_price` (float, optional): Price range filter, inclusive.
+        - `facets` (bool): Also return the number of matching products per part category, brand and model.
         - `db` (Session): A database session dependency for querying product data.
 
     - **Returns**:
-        - `List[Product]`: A list of all products in the system.
+        - `dict`: The page of products under `items` and the cursor for the next page under `next_cursor`.
+          With `facets=true`, also the number of matching products under `total` and the counts
+          per category id under `facets`.
 
     - **Raises**:
-        - `HTTPException` (status code 400): If no products are found in the database.
+        - `HTTPException` (status code 400): If no products match on the first page, or if the cursor is invalid.
 
     Example Request:
     ```http
-    GET /products
+    GET /product/?sort=price&limit=2&brand_category_id=3&facets=true
     ```
 
     Example Successful Response:
     ```json
-    [
-        {
-            "id": 1,
-            "name": "Product A",
-            "price": 100,
-            "category": "Electronics"
-        },
-        ...
-    ]
+    {
+        "items": [
+            {
+                "id": 1,
+                "name": "Product A",
+                "price": 100,
+                "category": "Electronics"
+            },
+            ...
+        ],
+        "next_cursor": "eyJrIjoicHJvZHVjdHM6cHJpY2UiLCJ2IjpbMTAwLjAsMV19",
+        "total": 42,
+        "facets": {
+            "part_category_id": {"1": 30, "4": 12},
+            "brand_category_id": {"2": 17, "3": 42},
+            "model_category_id": {"7": 25, "9": 17}
+        }
+    }
     ```
 
     Example Error Response:
@@ -59,22 +89,36 @@ def get_all_products(db: Session = Depends(get_db)):
     ```
 
     - **Notes**:
-        - This endpoint is designed to return all available products in the database.
+        - Pages are keyset paginated: keep the same `sort` and filters and pass back `next_cursor`
+          until it is `null`.
+        - The counts of a facet ignore the filter on that facet, so they tell how many products
+          selecting another value of it would return.
     """
-    products = product_service.get_all_products(db)
-
-    if not products:
+    page = product_service.list_products(
+        db=db,
+        sort=sort,
+        cursor=cursor,
+        limit=limit,
+        facets=facets,
+        part_category_id=part_category_id,
+        brand_category_id=brand_category_id,
+        model_category_id=model_category_id,
+        min_price=min_price,
+        max_price=max_price
+    )
+
+    if not page["items"] and cursor is None:
         raise HTTPException(
             status_code=400,
             detail="No Products Found!",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return products
+    return page
 
 
 @router.get("/get")
-def get_product_by_id(product_id: int, db: Session = Depends(get_db)):
+async def get_product_by_id(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve a Product by ID
 
@@ -82,7 +126,7 @@ def get_product_by_id(product_id: int, db: Session = Depends(get_db)):
 
     - **Parameters**:
         - `product_id` (int): The unique ID of the product to retrieve.
-        - `db` (Session): A database session dependency for querying the product data.
+        - `db` (AsyncSession): An async database session dependency for querying the product data.
 
     - **Returns**:
         - `Product`: The product with the specified ID.
@@ -115,7 +159,7 @@ def get_product_by_id(product_id: int, db: Session = Depends(get_db)):
     - **Notes**:
         - If the product does not exist, a 400 error with the message `"Product not found"` will be returned.
     """
-    product = product_service.get_product_by_id(db=db, product_id=product_id)
+    product = await run_in_session(db, product_service.get_cached_product, product_id=product_id)
     if not product:
         raise HTTPException(
             status_code=400,
@@ -127,14 +171,14 @@ def get_product_by_id(product_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/partcategories")
-def get_part_categories(db: Session = Depends(get_db)):
+async def get_part_categories(db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve All Part Categories
 
     This endpoint retrieves all part categories from the database.
 
     - **Parameters**:
-        - `db` (Session): A database session dependency for querying part category data.
+        - `db` (AsyncSession): An async database session dependency for querying part category data.
 
     - **Returns**:
         - `List[str]`: A list of all part categories.
@@ -166,7 +210,7 @@ def get_part_categories(db: Session = Depends(get_db)):
     - **Notes**:
         - This endpoint is used to fetch all available part categories in the system.
     """
-    part_categories = product_service.get_all_part_categories(db)
+    part_categories = await run_in_session(db, product_service.get_cached_part_categories)
 
     if not part_categories:
         raise HTTPException(
@@ -178,14 +222,14 @@ def get_part_categories(db: Session = Depends(get_db)):
     return part_categories
 
 @router.get("/brandcategories")
-def get_brand_categories(db: Session = Depends(get_db)):
+async def get_brand_categories(db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve All Brand Categories
 
     This endpoint retrieves all brand categories from the database.
 
     - **Parameters**:
-        - `db` (Session): A database session dependency for querying brand category data.
+        - `db` (AsyncSession): An async database session dependency for querying brand category data.
 
     - **Returns**:
         - `List[str]`: A list of all brand categories.
@@ -217,7 +261,7 @@ def get_brand_categories(db: Session = Depends(get_db)):
     - **Notes**:
         - This endpoint is used to fetch all available brand categories in the system.
     """
-    brand_categories = product_service.get_all_brand_categories(db)
+    brand_categories = await run_in_session(db, product_service.get_cached_brand_categories)
 
     if not brand_categories:
         raise HTTPException(
@@ -229,8 +273,8 @@ def get_brand_categories(db: Session = Depends(get_db)):
     return brand_categories
 
 @router.get("/modelcategories")
-def get_model_categories(db: Session = Depends(get_db)):
-    model_categories = product_service.get_all_model_categories(db)
+async def get_model_categories(db: AsyncSession = Depends(get_async_db)):
+    model_categories = await run_in_session(db, product_service.get_cached_model_categories)
     if not model_categories:
         raise HTTPException(
             status_code=400,
@@ -240,22 +284,30 @@ def get_model_categories(db: Session = Depends(get_db)):
     return model_categories
 
 @router.get("/modelcategories/bybrand")
-def get_model_categories_by_brand(brand_id: int, db: Session = Depends(get_db)):
-    return product_service.get_model_categories_by_brand_id(db=db, brand_category_id=brand_id)
+async def get_model_categories_by_brand(brand_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await run_in_session(db, product_service.get_cached_model_categories_by_brand, brand_category_id=brand_id)
 
 @router.get("/get/partcategory")
-def get_product_by_part_category_id(part_category_id: int, db: Session = Depends(get_db)):
+async def get_product_by_part_category_id(
+    part_category_id: int,
+    sort: ProductSort = "id",
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve Products by Part Category ID
 
-    This endpoint retrieves products based on their part category ID.
+    This endpoint retrieves a page of products based on their part category ID.
 
     - **Parameters**:
         - `part_category_id` (int): The ID of the part category to filter products by.
-        - `db` (Session): A database session dependency for querying the products.
+        - `sort` (str): The sort order of the listing, one of `id`, `price` or `name`; anything else is rejected with 422.
+        - `cursor` (str, optional): The `next_cursor` of the previous page.
+        - `limit` (int): The number of products per page (1-200).
+        - `db` (AsyncSession): An async database session dependency for querying the products.
 
     - **Returns**:
-        - `List[Product]`: A list of products within the specified part category.
+        - `dict`: The page of products under `items` and the cursor for the next page under `next_cursor`.
 
     - **Raises**:
         - `HTTPException` (status code 400): If no products in the specified part category are found.
@@ -267,15 +319,18 @@ def get_product_by_part_category_id(part_category_id: int, db: Session = Depends
 
     Example Successful Response:
     ```json
-    [
-        {
-            "id": 1,
-            "name": "Product A",
-            "price": 100,
-            "category": "Electronics"
-        },
-        ...
-    ]
+    {
+        "items": [
+            {
+                "id": 1,
+                "name": "Product A",
+                "price": 100,
+                "category": "Electronics"
+            },
+            ...
+        ],
+        "next_cursor": null
+    }
     ```
 
     Example Error Response:
@@ -288,30 +343,38 @@ def get_product_by_part_category_id(part_category_id: int, db: Session = Depends
     - **Notes**:
         - If no products are found for the given part category, a 400 error will be returned with a relevant message.
     """
-    products = product_service.get_products_by_part_category_id(db=db, part_category_id=part_category_id)
+    page = await run_in_session(db, product_service.list_products, sort=sort, cursor=cursor, limit=limit, part_category_id=part_category_id)
 
-    if not products:
+    if not page["items"] and cursor is None:
         raise HTTPException(
             status_code=400,
             detail="No Products with that part type found"
         )
 
-    return products
+    return page
 
 
 @router.get("/get/brandcategory")
-def get_product_by_brand_category_id(brand_category_id: int, db: Session = Depends(get_db)):
+async def get_product_by_brand_category_id(
+    brand_category_id: int,
+    sort: ProductSort = "id",
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve Products by Brand Category ID
 
-    This endpoint retrieves products based on their brand category ID.
+    This endpoint retrieves a page of products based on their brand category ID.
 
     - **Parameters**:
         - `brand_category_id` (int): The ID of the brand category to filter products by.
-        - `db` (Session): A database session dependency for querying the products.
+        - `sort` (str): The sort order of the listing, one of `id`, `price` or `name`; anything else is rejected with 422.
+        - `cursor` (str, optional): The `next_cursor` of the previous page.
+        - `limit` (int): The number of products per page (1-200).
+        - `db` (AsyncSession): An async database session dependency for querying the products.
 
     - **Returns**:
-        - `List[Product]`: A list of products within the specified brand category.
+        - `dict`: The page of products under `items` and the cursor for the next page under `next_cursor`.
 
     - **Raises**:
         - `HTTPException` (status code 400): If no products in the specified brand category are found.
@@ -323,15 +386,18 @@ def get_product_by_brand_category_id(brand_category_id: int, db: Session = Depen
 
     Example Successful Response:
     ```json
-    [
-        {
-            "id": 1,
-            "name": "Product A",
-            "price": 100,
-            "category": "Electronics"
-        },
-        ...
-    ]
+    {
+        "items": [
+            {
+                "id": 1,
+                "name": "Product A",
+                "price": 100,
+                "category": "Electronics"
+            },
+            ...
+        ],
+        "next_cursor": null
+    }
     ```
 
     Example Error Response:
@@ -344,19 +410,19 @@ def get_product_by_brand_category_id(brand_category_id: int, db: Session = Depen
     - **Notes**:
         - If no products are found for the given brand category, a 400 error will be returned with a relevant message.
     """
-    products = product_service.get_products_by_brand_category_by_id(db=db, brand_category_id=brand_category_id)
+    page = await run_in_session(db, product_service.list_products, sort=sort, cursor=cursor, limit=limit, brand_category_id=brand_category_id)
 
-    if not products:
+    if not page["items"] and cursor is None:
         raise HTTPException(
             status_code=400,
             detail="No Products with that brand found"
         )
 
-    return products
+    return page
 
 @router.get("/get/brand-model")
-def get_product_by_brand_and_model(brand_category_id: int, model_category_id: int, db: Session=Depends(get_db)):
-    return product_service.get_products_by_brand_and_model(db=db, brand_category_id=brand_category_id, model_category_id=model_category_id)
+async def get_product_by_brand_and_model(brand_category_id: int, model_category_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await run_in_session(db, product_service.get_cached_products_by_brand_and_model, brand_category_id=brand_category_id, model_category_id=model_category_id)
 
 @router.post("/upload/image")
 async def upload_image(file: UploadFile = File(...)):
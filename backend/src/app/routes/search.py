@@ -1,13 +1,146 @@
+from typing import Literal
+
 from fastapi import APIRouter, Depends,HTTPException, Query
 
 from sqlalchemy.orm import Session
 
 import app.services.product as product_services
+import app.services.search as search_service
+import app.services.suggest as suggest_service
+from app.core.pagination import MAX_PAGE_SIZE
 from app.dependencies import get_db
 
 router = APIRouter()
 
 
+@router.get("/")
+def search_products(
+    q: str = Query(..., min_length=1),
+    brand_category_id: int | None = None,
+    mode: Literal["text", "fuzzy"] = "text",
+    threshold: float | None = Query(default=None, ge=0.1, le=1),
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)):
+    """
+    Product Search
+
+    This endpoint searches products and returns the matches ranked by relevance.
+
+    - **Parameters**:
+        - `q` (str): The search text.
+        - `mode` (str): `text` (default) searches product names, descriptions and tags; products matching more (and rarer)
+          words rank higher, and matches in the name count more than matches in tags or the description.
+          `fuzzy` tolerates typos in part numbers and names by comparing the character trigrams of each word of the
+          query with the words of product names and tags, ranking by similarity.
+        - `threshold` (float, optional): In `fuzzy` mode, the minimum similarity (0.1-1) for a word to match.
+          Lower values are more forgiving. Defaults to the server's `SEARCH_FUZZY_THRESHOLD`.
+        - `brand_category_id` (int, optional): Only return products of this brand.
+        - `cursor` (str, optional): The `next_cursor` of the previous page.
+        - `limit` (int): The number of products per page (1-200).
+        - `db` (Session): A database session dependency for interacting with the database.
+
+    - **Returns**:
+        - `dict`: The page of products under `items`, the number of matches under `total`
+          and the cursor for the next page under `next_cursor`.
+
+    Example Request:
+    ```http
+    GET /search/?q=synthetic oil filter&limit=2
+    GET /search/?q=bosh 5w-3o&mode=fuzzy
+    ```
+
+    Example Successful Response:
+    ```json
+    {
+        "items": [
+            {
+                "id": 4,
+                "name": "Oil Filter",
+                "price": 12.99,
+                ...
+            },
+            ...
+        ],
+        "total": 37,
+        "next_cursor": "eyJrIjoic2VhcmNoIiwidiI6WzJdfQ"
+    }
+    ```
+    """
+    return search_service.search_products(
+        db=db,
+        query=q,
+        brand_category_id=brand_category_id,
+        cursor=cursor,
+        limit=limit,
+        mode=mode,
+        threshold=threshold
+    )
+
+@router.get("/suggest")
+def suggest(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(default=10, ge=1, le=suggest_service.MAX_SUGGESTIONS),
+    db: Session = Depends(get_db)):
+    """
+    Search Box Autocomplete
+
+    This endpoint suggests product, brand, model and part category names as the user types.
+
+    - **Parameters**:
+        - `q` (str): What the user has typed so far. Matches names having a word that starts with it.
+        - `limit` (int): The maximum number of suggestions (1-20).
+        - `db` (Session): A database session dependency, used to load the suggestions on first use.
+
+    - **Returns**:
+        - `List[dict]`: The suggestions, most popular first. `kind` tells whether `id` is a product,
+          brand, model or part category ID.
+
+    Example Request:
+    ```http
+    GET /search/suggest?q=bos
+    ```
+
+    Example Successful Response:
+    ```json
+    [
+        {"text": "Bosch", "kind": "brand", "id": 3},
+        {"text": "Bosch Oil Filter", "kind": "product", "id": 17}
+    ]
+    ```
+    """
+    return suggest_service.suggest(db=db, prefix=q, limit=limit)
+
+@router.get("/make")
+def get_products_from_search_by_make(
+    make_id: int = Query(...),
+    search_terms: str = Query(...),
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)):
+    """
+    Search Products of One Brand
+
+    This endpoint runs the full-text product search restricted to a single brand.
+
+    - **Parameters**:
+        - `make_id` (int): The brand category ID to search in.
+        - `search_terms` (str): The search text.
+        - `cursor` (str, optional): The `next_cursor` of the previous page.
+        - `limit` (int): The number of products per page (1-200).
+        - `db` (Session): A database session dependency for interacting with the database.
+
+    - **Returns**:
+        - `dict`: Same shape as `GET /search/`.
+
+    Example Request:
+    ```http
+    GET /search/make?make_id=2&search_terms=brake pads
+    ```
+    """
+    return search_service.search_products(db=db, query=search_terms, brand_category_id=make_id, cursor=cursor, limit=limit)
+
+
 @router.get("/{search_terms}")
 def get_products_from_search(search_terms: str, db: Session = Depends(get_db)):
     """
@@ -56,9 +189,3 @@ def get_products_from_search(search_terms: str, db: Session = Depends(get_db)):
             detail="No Product Found!"
         )
     return result
-
-@router.get("/make")
-def get_products_from_search_by_make(make_id: int = Query(...), search_terms: str = Query(...), db: Session = Depends(get_db)):
-    result = product_services.search_products_given_make(make_id=make_id, search_terms=search_terms, db=db)
-
-    return result
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app.core.auth import get_current_user, get_db
+from app.core.auth import get_current_user_sync, get_db
 
 from app.models.user import User
 
@@ -14,7 +14,7 @@ router = APIRouter()
 
 
 @router.post("/ticket")
-def create_support_ticket(ticket_creator: SupportTicketBase, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def create_support_ticket(ticket_creator: SupportTicketBase, current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Create a New Support Ticket
 
@@ -23,7 +23,7 @@ def create_support_ticket(ticket_creator: SupportTicketBase, current_user: User
 
     - **Parameters**:
         - `ticket_creator` (SupportTicketBase): The data for the new support ticket, including the issue description and any other details.
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency to interact with the database.
 
     - **Returns**:
@@ -48,7 +48,7 @@ def create_support_ticket(ticket_creator: SupportTicketBase, current_user: User
     return ticket
 
 @router.get("/ticket")
-def get_support_ticket(ticket_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_support_ticket(ticket_id: int, current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Retrieve a Support Ticket by its ID
 
@@ -56,7 +56,7 @@ def get_support_ticket(ticket_id: int, current_user: User = Depends(get_current_
 
     - **Parameters**:
         - `ticket_id` (int): The ID of the support ticket to retrieve.
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency to interact with the database.
 
     - **Returns**:
@@ -80,14 +80,14 @@ def get_support_ticket(ticket_id: int, current_user: User = Depends(get_current_
     return ticket
 
 @router.get("/ticket/all")
-def get_all_user_tickets(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_all_user_tickets(current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Retrieve All Support Tickets for the Authenticated User
 
     This endpoint retrieves all support tickets created by the authenticated user.
 
     - **Parameters**:
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency to interact with the database.
 
     - **Returns**:
@@ -121,7 +121,7 @@ def get_all_user_tickets(current_user: User = Depends(get_current_user), db: Ses
     return {"tickets": all_tickets}
 
 @router.post("/ticket/reply")
-def reply_to_ticket(reply: TicketReply, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def reply_to_ticket(reply: TicketReply, current_user: User = Depends(get_current_user_sync), db: Session = Depends(get_db)):
     """
     Reply to a Support Ticket
 
@@ -130,7 +130,7 @@ def reply_to_ticket(reply: TicketReply, current_user: User = Depends(get_current
     - **Parameters**:
         - `ticket_id` (int): The ID of the support ticket to reply to.
         - `reply` (str): The reply message to be added to the ticket.
-        - `current_user` (User): The currently authenticated user, injected by the `get_current_user` dependency.
+        - `current_user` (User): The currently authenticated user, injected by the `get_current_user_sync` dependency.
         - `db` (Session): A database session dependency for interacting with the database.
 
     - **Returns**:
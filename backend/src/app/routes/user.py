@@ -2,11 +2,12 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import app.services.user as user_service
-from app.core.auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, get_current_user, check_admin_pass
-from app.dependencies import get_db
+from app.core.auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, get_current_user, get_current_user_sync, check_admin_pass
+from app.dependencies import get_async_db, get_db
 from app.schemas.token import Token
 from app.schemas.user import UserCreate, UserResponse
 from app.models.user import User
@@ -57,7 +58,7 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
     return user_service.create_user(db=db, user=user)
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """
     Login for Access Token
 
@@ -66,7 +67,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 
     - **Parameters**:
         - `form_data` (OAuth2PasswordRequestForm): A dependency that extracts login credentials (`username` and `password`) from the request form data.
-        - `db` (Session): A database session dependency, automatically injected.
+        - `db` (AsyncSession): An async database session dependency, automatically injected.
 
     - **Returns**:
         - `Token`: A dictionary containing:
@@ -75,6 +76,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 
     - **Raises**:
         - `HTTPException` (status code 401): If authentication fails due to incorrect credentials.
+        - `HTTPException` (status code 503): If too many logins are waiting for the password check; retry after the `Retry-After` delay.
 
     Example Request:
     ```json
@@ -102,8 +104,10 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     - **Notes**:
         - Ensure the client sends the `Content-Type: application/x-www-form-urlencoded` header.
         - The `WWW-Authenticate` header is included in the 401 error response to indicate the use of the Bearer authentication scheme.
+        - The user query is awaited and the password check runs on the dedicated hashing threads, so a burst of logins
+          does not hold up other requests.
     """
-    user = user_service.authenticate_user(db=db, username=form_data.username, password=form_data.password)
+    user = await user_service.authenticate_user_async(db=db, username=form_data.username, password=form_data.password)
 
     if not user:
         raise HTTPException(
@@ -164,7 +168,7 @@ def read_current_user(current_user: User = Depends(get_current_user)):
 
 
 @router.post("/logout")
-def logout_current_user(current_user: User = Depends(get_current_user),  db:Session=Depends(get_db)):
+def logout_current_user(current_user: User = Depends(get_current_user_sync),  db:Session=Depends(get_db)):
     """
     Logout the Current Logged-in User
 
@@ -271,7 +275,7 @@ def set_user_as_admin(password: str, current_user: User=Depends(get_current_user
 """
 
 @router.get("/isAdmin")
-def is_user_admin(current_user: User=Depends(get_current_user), db:Session=Depends(get_db)):
+def is_user_admin(current_user: User=Depends(get_current_user_sync), db:Session=Depends(get_db)):
     user =user_service.get_user(db=db, user_id=current_user.id)
     if(user.is_admin):
         return {"success": "User Is Admin"}
@@ -24,6 +24,14 @@ class CartItemUpdate(BaseModel):
     product_id: int
     quantity: int
 
+class CartBatch(BaseModel):
+    """
+    Several cart changes applied together: first the adds, then the updates, then the removes.
+    """
+    add: List[CartItemCreate] = []
+    update: List[CartItemUpdate] = []
+    remove: List[int] = []
+
 class CartItemResponse(CartItemBase):
     id: int
     price: float
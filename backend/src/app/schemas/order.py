@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+
+
+ShippingMethod = Literal["Regular Shipping(3-5 Days)", "Next Day Shipping(1-2 Days)", "Priority Shipping(1 Day)"]
+PaymentMethod = Literal["Card", "Cashapp", "Venmo"]
+
+class OrderUpdate(BaseModel):
+    shipping_address_id: Optional[int] = None
+    billing_address_id: Optional[int] = None
+    shipping_method: Optional[ShippingMethod] = None
+    payment_method: Optional[PaymentMethod] = None
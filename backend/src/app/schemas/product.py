@@ -1,5 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
+
+# The sort orders of product listings, the keys of crud.PRODUCT_SORT_COLUMNS
+ProductSort = Literal["id", "price", "name"]
 
 class PartCategory(BaseModel):
     id: int
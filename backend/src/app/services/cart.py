@@ -1,29 +1,52 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from app.models.cart import Cart, CartItem
+from app.models.cart import Cart
 from app.models.product import Product
-from app.schemas.cart import CartItemCreate, CartItemUpdate
+from app.schemas.cart import CartBatch, CartItemCreate, CartItemUpdate
 import json
+from functools import lru_cache
 
+from app.core.cache import TTLCache
+from app.core.config import get_settings
 from app.crud import (
     get_cart_by_user_id,
     get_cart_items_by_cart_id,
+    get_cart_items_with_products,
+    get_products_by_ids,
+    apply_cart_batch_in_db,
     get_product_by_id,
     get_cart_item_by_cart_and_product,
-    add_cart_item_to_db,
+    upsert_cart_item_in_db,
     update_cart_item_quantity_in_db,
     delete_cart_item_from_db,
     clear_cart_items_in_db,
-    get_total_items_in_cart
+    get_cart_summary_by_user_id
 )
 
+settings = get_settings()
+
+# Item count and subtotal per user id, read by the navbar badge on every page. Writes
+# through this worker drop the entry; writes through other workers show up on expiry.
+summary_cache = TTLCache(maxsize=settings.CART_SUMMARY_CACHE_MAXSIZE, ttl=settings.CART_SUMMARY_CACHE_TTL, name="cart_summary")
+
 
 # --- Helper Functions ---
 
+@lru_cache(maxsize=4096)
+def _parse_list(value: str):
+    """
+    Decode a JSON list column. Products show up in many carts with the same tags and
+    images, so decoded values are cached by their text.
+    """
+    return tuple(json.loads(value)) if value else ()
+
 def get_products_from_cart(db: Session, cart: Cart):
     """
     Retrieve all products and calculate the total price for a given cart.
 
+    The items and their products are loaded with a single joined query, so the number
+    of queries does not grow with the size of the cart.
+
     Parameters:
         db (Session): The database session.
         cart (Cart): The Cart object whose items are to be fetched.
@@ -33,8 +56,8 @@ def get_products_from_cart(db: Session, cart: Cart):
             - "items": A list of items with product details and quantities.
             - "total_price": The total price of all items in the cart.
     """
-    cart_items = get_cart_items_by_cart_id(cart.id, db)
-    if not cart_items: 
+    rows = get_cart_items_with_products(cart.id, db)
+    if not rows:
         return {
             "items": [],
             "total_price": 0,
@@ -43,34 +66,57 @@ def get_products_from_cart(db: Session, cart: Cart):
     items = []
     total_price = 0
 
-    for item in cart_items:
-        product = get_product_by_id(item.product_id, db)
-        if product:
-            tags = json.loads(product.tags) if isinstance(product.tags, str) else product.tags
-            images = json.loads(product.images) if isinstance(product.images, str) else product.images
-
-            items.append({
-                "product": {
-                    "id": product.id,
-                    "name": product.name,
-                    "description": product.description,
-                    "price": product.price,
-                    "tags": tags,
-                    "images": images,
-                    "thumbnail": product.thumbnail,
-                    "part_category_id": product.part_category_id,
-                    "brand_category_id": product.brand_category_id,
-                    "model_category_id": product.model_category_id
-                },
-                "quantity": item.quantity
-            })
-
-            total_price += product.price * item.quantity
+    for item, product in rows:
+        tags = list(_parse_list(product.tags)) if isinstance(product.tags, str) else product.tags
+        images = list(_parse_list(product.images)) if isinstance(product.images, str) else product.images
+
+        items.append({
+            "product": {
+                "id": product.id,
+                "name": product.name,
+                "description": product.description,
+                "price": product.price,
+                "tags": tags,
+                "images": images,
+                "thumbnail": product.thumbnail,
+                "part_category_id": product.part_category_id,
+                "brand_category_id": product.brand_category_id,
+                "model_category_id": product.model_category_id
+            },
+            "quantity": item.quantity
+        })
+
+        total_price += product.price * item.quantity
 
     return {"items": items, "total_price": total_price}
 
 # --- Cart Operations ---
 
+def get_total_items_in_cart(db: Session, user_id: int):
+    """
+    Retrieve the number of items in a user's cart and their subtotal.
+
+    The values are read from the counters stored on the cart, through an in-memory
+    cache unless CART_SUMMARY_CACHE_TTL is 0. A user without a cart has an empty one;
+    no cart is created.
+
+    Parameters:
+        db (Session): The database session.
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict: The total quantity under "total_items" and the subtotal under "subtotal".
+    """
+    use_cache = settings.CART_SUMMARY_CACHE_TTL > 0
+    summary = summary_cache.get(user_id) if use_cache else None
+    if summary is None:
+        generation = summary_cache.generation
+        row = get_cart_summary_by_user_id(user_id=user_id, db=db)
+        summary = {"total_items": row.item_count, "subtotal": row.subtotal} if row else {"total_items": 0, "subtotal": 0}
+        if use_cache:
+            summary_cache.set(user_id, summary, generation=generation)
+    return summary
+
 def get_or_create_cart(db: Session, user_id: int):
     """
     Retrieve a user's cart. If the cart does not exist, create a new cart.
@@ -109,15 +155,57 @@ def add_product_to_cart(db: Session, item: CartItemCreate, user_id: int):
     if not product:
         raise HTTPException(status_code=400, detail="Product Not Found")
 
-    # Check if item is already in the cart
-    cart_item = get_cart_item_by_cart_and_product(cart_id=cart.id, product_id=item.product_id, db=db)
-    if cart_item:
-        # Update quantity if the item is already in the cart
-        update_cart_item_quantity_in_db(cart_item=cart_item, quantity=cart_item.quantity + item.quantity, db=db)
-    else:
-        # Add new item to cart
-        new_cart_item = CartItem(cart_id=cart.id, product_id=item.product_id, quantity=item.quantity, price=product.price)
-        add_cart_item_to_db(cart_item=new_cart_item, db=db)
+    # Add the item, or add to its quantity if it is already in the cart
+    upsert_cart_item_in_db(cart_id=cart.id, product_id=item.product_id, quantity=item.quantity, price=product.price, db=db)
+    summary_cache.invalidate(user_id)
+
+    return get_products_from_cart(db=db, cart=cart)
+
+def apply_cart_batch(db: Session, batch: CartBatch, user_id: int):
+    """
+    Apply several adds, quantity updates and removals to the user's cart at once.
+
+    All product IDs are checked before anything is written, the changes are committed
+    together, and the cart is built once at the end.
+
+    Parameters:
+        db (Session): The database session.
+        batch (CartBatch): The adds, updates and removes, applied in that order.
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict: A dictionary containing the updated cart's products and total price.
+
+    Raises:
+        HTTPException: If the cart is not found, a product to add does not exist, or a
+        product to update is not in the cart. Nothing is changed in that case.
+    """
+    cart = get_cart_by_user_id(user_id=user_id, db=db)
+    if not cart:
+        raise HTTPException(status_code=404, detail="Cart Not Found")
+
+    quantities = {}
+    for item in batch.add:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    products = get_products_by_ids(db, list(quantities))
+    if len(products) != len(quantities):
+        raise HTTPException(status_code=400, detail="Product Not Found")
+
+    updates = {item.product_id: item.quantity for item in batch.update}
+    if updates:
+        in_cart = {cart_item.product_id for cart_item in get_cart_items_by_cart_id(cart.id, db)} | quantities.keys()
+        if not updates.keys() <= in_cart:
+            raise HTTPException(status_code=404, detail="Cart Item Not Found")
+
+    apply_cart_batch_in_db(
+        cart_id=cart.id,
+        adds={product_id: (quantity, products[product_id].price) for product_id, quantity in quantities.items()},
+        updates=updates,
+        removes=batch.remove,
+        db=db
+    )
+    summary_cache.invalidate(user_id)
 
     return get_products_from_cart(db=db, cart=cart)
 
@@ -145,6 +233,7 @@ def update_cart_item_quantity(db: Session, item: CartItemUpdate, user_id: int):
         raise HTTPException(status_code=404, detail="Cart Item Not Found")
 
     update_cart_item_quantity_in_db(cart_item=cart_item, quantity=item.quantity, db=db)
+    summary_cache.invalidate(user_id)
     return get_products_from_cart(db=db, cart=cart)
 
 def remove_product_from_cart(db: Session, product_id: int, user_id: int):
@@ -175,6 +264,7 @@ def remove_product_from_cart(db: Session, product_id: int, user_id: int):
         }
 
     delete_cart_item_from_db(cart_item=cart_item, db=db)
+    summary_cache.invalidate(user_id)
     return get_products_from_cart(db=db, cart=cart)
 
 def clear_cart(db: Session, user_id: int):
@@ -196,4 +286,5 @@ def clear_cart(db: Session, user_id: int):
         raise HTTPException(status_code=404, detail="Cart Not Found")
 
     clear_cart_items_in_db(cart_id=cart.id, db=db)
+    summary_cache.invalidate(user_id)
     return {"detail": "Cart Cleared"}
@@ -1,19 +1,23 @@
 from fastapi import HTTPException
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
 
 from app.schemas.address import Address as AddressSchema
+from app.schemas.order import OrderUpdate
 
 from app.models.order import Order, OrderItem
 from app.models.cart import Cart, CartItem
 from app.models.address import Address
 
+from app.services.outbox import ORDER_COMPLETED_TOPICS, enqueue
 from app.crud import (
     get_cart_by_user_id,
-    get_cart_items_by_cart_id,
+    get_cart_items_with_products,
     get_all_addressses,
     get_address_by_user_and_id,
+    get_addresses_by_user_and_ids,
     get_pending_order_from_db,
     get_order_items_in_order,
     get_all_user_orders,
@@ -39,6 +43,9 @@ def update_order_address_in_db(order: Order, db: Session):
     """
     if order.billing_address and order.shipping_address:
         order.status = "Complete"
+        # Emails and analytics are left to the outbox worker, committed together with the status
+        for topic in ORDER_COMPLETED_TOPICS:
+            enqueue(db, topic=topic, payload={"order_id": order.id})
         return commit_and_refresh(db, order)
     else:
         raise HTTPException(status_code=400, detail="Order not ready for completion")
@@ -131,10 +138,38 @@ def add_order_to_db(order: Order, db: Session):
 
     return add_and_commit(db, order)
 
+def add_order_with_items_to_db(order: Order, order_items: list[dict], db: Session):
+    """
+    Adds an order and all of its items in a single transaction. The items are written
+    with one bulk insert, and nothing is committed if any of it fails.
+
+    Parameters:
+        order (Order): The order to add.
+        order_items (list[dict]): The product_id, quantity, price, product_name and
+            product_thumbnail of each item.
+        db (Session): The database session.
+
+    Returns:
+        Order: The added order.
+    """
+    try:
+        db.add(order)
+        db.flush()
+        db.execute(insert(OrderItem), [{**item, "order_id": order.id} for item in order_items])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return order
+
 def start_checkout(user_id: int, db: Session):
     """
     Creates a new pending order using the user's cart as order items.
 
+    The cart items and their prices are loaded with one query, and the order and its
+    items are written in one transaction.
+
     Parameters:
         user_id (int): The user's ID.
         db (Session): The database session.
@@ -146,22 +181,26 @@ def start_checkout(user_id: int, db: Session):
         HTTPException: If the cart is empty or does not exist.
     """
     cart = get_cart_by_user_id(user_id=user_id, db=db)
+    rows = get_cart_items_with_products(cart.id, db) if cart else []
 
-    if not cart or not cart.items:
+    if not rows:
         raise HTTPException(status_code=400, detail="Cart is empty or does not exist")
 
-    total_price = sum(item.quantity * item.product.price for item in cart.items)
+    # Items are charged at the current product price, the same price the total is computed from
+    order_items = [
+        {
+            "product_id": product.id,
+            "quantity": item.quantity,
+            "price": product.price,
+            "product_name": product.name,
+            "product_thumbnail": product.thumbnail,
+        }
+        for item, product in rows
+    ]
+    total_price = sum(item["quantity"] * item["price"] for item in order_items)
 
     order = Order(user_id=user_id, cart_id=cart.id, shipping_method="Regular Shipping(3-5 Days)", payment_method="Card", status="Pending", total_price=total_price)
-    add_order_to_db(order=order, db=db)
-
-    cart_items = get_cart_items_by_cart_id(cart_id=cart.id, db=db)
-
-    for item in cart_items:
-        new_order_item = OrderItem(order_id=order.id, product_id=item.product_id, quantity=item.quantity, price=item.price)
-        add_order_item_to_db(new_order_item, db)
-
-    return order
+    return add_order_with_items_to_db(order=order, order_items=order_items, db=db)
 
 def delete_address(address_id: int, user_id: int, db: Session):
     """
@@ -184,24 +223,55 @@ def delete_address(address_id: int, user_id: int, db: Session):
 
     return
 
-def set_shipping_address(address_id: int, user_id: int, db: Session):
+def update_pending_order(update: OrderUpdate, user_id: int, db: Session):
     """
-    Sets the shipping address for a user's pending order.
+    Applies any subset of the addresses and the shipping and payment methods to a
+    user's pending order in a single transaction.
 
     Parameters:
-        address_id (int): The address ID.
+        update (OrderUpdate): The fields to change; fields left as None are kept.
         user_id (int): The user ID.
         db (Session): The database session.
 
+    Returns:
+        Order: The updated order.
+
     Raises:
-        HTTPException: If no pending order is found.
+        HTTPException: If no pending order is found, or an address does not belong to the user.
     """
     order = get_pending_order_from_db(user_id=user_id, db=db)
 
     if not order:
         raise HTTPException(status_code=400, detail="No pending order found")
 
-    set_order_shipping_address_in_db(address_id=address_id, order=order, db=db)
+    address_ids = {address_id for address_id in (update.shipping_address_id, update.billing_address_id) if address_id is not None}
+    if address_ids and len(get_addresses_by_user_and_ids(user_id=user_id, address_ids=list(address_ids), db=db)) != len(address_ids):
+        raise HTTPException(status_code=400, detail="Could not find address with that id")
+
+    if update.shipping_address_id is not None:
+        order.shipping_address_id = update.shipping_address_id
+    if update.billing_address_id is not None:
+        order.billing_address_id = update.billing_address_id
+    if update.shipping_method is not None:
+        order.shipping_method = update.shipping_method
+    if update.payment_method is not None:
+        order.payment_method = update.payment_method
+
+    return commit_and_refresh(db, order)
+
+def set_shipping_address(address_id: int, user_id: int, db: Session):
+    """
+    Sets the shipping address for a user's pending order.
+
+    Parameters:
+        address_id (int): The address ID.
+        user_id (int): The user ID.
+        db (Session): The database session.
+
+    Raises:
+        HTTPException: If no pending order is found, or the address does not belong to the user.
+    """
+    update_pending_order(OrderUpdate(shipping_address_id=address_id), user_id=user_id, db=db)
     return
 
 def set_billing_address(address_id: int, user_id: int, db: Session):
@@ -214,14 +284,9 @@ def set_billing_address(address_id: int, user_id: int, db: Session):
         db (Session): The database session.
 
     Raises:
-        HTTPException: If no pending order is found.
+        HTTPException: If no pending order is found, or the address does not belong to the user.
     """
-    order = get_pending_order_from_db(user_id=user_id, db=db)
-
-    if not order:
-        raise HTTPException(status_code=400, detail="No pending order found")
-
-    set_order_billing_address_in_db(address_id=address_id, order=order, db=db)
+    update_pending_order(OrderUpdate(billing_address_id=address_id), user_id=user_id, db=db)
     return
 
 def set_shipping_method(shipping_selected: str, user_id: int, db: Session):
@@ -239,9 +304,7 @@ def set_shipping_method(shipping_selected: str, user_id: int, db: Session):
     Raises:
         HTTPException: If no pending order is found.
     """
-    order = get_pending_order_from_db(user_id=user_id, db=db)
-    order.shipping_method = shipping_selected 
-    commit_and_refresh(db, order) 
+    update_pending_order(OrderUpdate(shipping_method=shipping_selected), user_id=user_id, db=db)
     return
 
 def set_payment_method(payment_selected: str, user_id: int, db: Session):
@@ -259,9 +322,7 @@ def set_payment_method(payment_selected: str, user_id: int, db: Session):
     Raises:
         HTTPException: If no pending order is found.
     """
-    order = get_pending_order_from_db(user_id=user_id, db=db)
-    order.payment_method = payment_selected 
-    commit_and_refresh(db, order) 
+    update_pending_order(OrderUpdate(payment_method=payment_selected), user_id=user_id, db=db)
     return
 
 def add_address(address: AddressSchema, user_id: int, db: Session):
@@ -0,0 +1,219 @@
+import bisect
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.crud import get_facet_products
+from app.services.search import RebuildableIndex, ensure_index
+
+# The product columns the catalog can be filtered and counted by
+FACETS = ("part_category_id", "brand_category_id", "model_category_id")
+
+# Price range masks kept between requests
+MAX_PRICE_MASKS = 64
+
+
+def _bitmap(ids):
+    """
+    Build an integer with bit `id` set for every id in `ids`.
+    """
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for product_id in ids:
+        bits[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(bits, "little")
+
+
+class FacetIndex(RebuildableIndex):
+    """
+    Per-category product id sets used to count the products of every brand, part
+    category and model matching a filter without querying the products table.
+
+    Each set is a bitmap stored as a Python integer with one bit per product id, so
+    combining filters is a bitwise AND and counting is a popcount. Price filters are
+    resolved through the products sorted by price, and the resulting masks are kept
+    and updated on writes since listings reuse a few price ranges.
+    """
+
+    _STATE = ("_bitmaps", "_all", "_prices", "_by_price", "_price_masks", "_members")
+
+    def _reset(self):
+        self._bitmaps = {facet: {} for facet in FACETS}
+        self._all = 0
+        self._prices = {}
+        self._by_price = []
+        self._price_masks = {}
+        # While an index is loading, ids are collected here and turned into bitmaps once
+        # at the end, since setting one bit of a large integer copies all of it
+        self._members = {facet: {} for facet in FACETS}
+
+    def _add(self, document: dict):
+        product_id = document["id"]
+        if product_id in self._prices:
+            self._remove(product_id)
+
+        price = document["price"]
+        self._prices[product_id] = price
+
+        if self._members is not None:
+            self._by_price.append((price, product_id))
+            for facet in FACETS:
+                self._members[facet].setdefault(document[facet], []).append(product_id)
+            return
+
+        bit = 1 << product_id
+        bisect.insort(self._by_price, (price, product_id))
+        self._all |= bit
+        for facet in FACETS:
+            bitmaps = self._bitmaps[facet]
+            bitmaps[document[facet]] = bitmaps.get(document[facet], 0) | bit
+        for (low, high), mask in self._price_masks.items():
+            if self._in_range(price, low, high):
+                self._price_masks[(low, high)] = mask | bit
+
+    def _remove(self, product_id):
+        price = self._prices.pop(product_id, None)
+        if price is None:
+            return
+
+        self._prepare()
+        clear = ~(1 << product_id)
+        position = bisect.bisect_left(self._by_price, (price, product_id))
+        del self._by_price[position]
+        self._all &= clear
+        for bitmaps in self._bitmaps.values():
+            for value, bitmap in bitmaps.items():
+                if bitmap >> product_id & 1:
+                    bitmaps[value] = bitmap & clear
+                    break
+        for key, mask in self._price_masks.items():
+            self._price_masks[key] = mask & clear
+
+    def _prepare(self):
+        if self._members is None:
+            return
+
+        self._by_price.sort()
+        self._all = _bitmap(self._prices)
+        for facet, members in self._members.items():
+            self._bitmaps[facet] = {value: _bitmap(ids) for value, ids in members.items()}
+        self._members = None
+
+    @staticmethod
+    def _in_range(price, low, high):
+        return (low is None or price >= low) and (high is None or price <= high)
+
+    def _price_mask(self, low: float | None, high: float | None):
+        mask = self._price_masks.get((low, high))
+        if mask is None:
+            start = 0 if low is None else bisect.bisect_left(self._by_price, (low,))
+            stop = len(self._by_price) if high is None else bisect.bisect_left(self._by_price, (high, float("inf")))
+            mask = _bitmap([product_id for _, product_id in self._by_price[start:stop]])
+            if len(self._price_masks) >= MAX_PRICE_MASKS:
+                self._price_masks.clear()
+            self._price_masks[(low, high)] = mask
+        return mask
+
+    def counts(self, min_price: float | None = None, max_price: float | None = None, **filters):
+        """
+        Count the products matching a filter, and for every facet the products each of
+        its values would match.
+
+        A facet's counts ignore the filter on that facet itself, so a page filtered by
+        brand still tells how many products every other brand has.
+
+        Parameters:
+            min_price (float | None): The lowest price, inclusive.
+            max_price (float | None): The highest price, inclusive.
+            **filters: part_category_id, brand_category_id, model_category_id.
+
+        Returns:
+            dict: The number of matching products under "total" and, under "facets",
+            a mapping of each facet to the counts of its values that match at least one product.
+        """
+        with self._lock:
+            base = self._all
+            if min_price is not None or max_price is not None:
+                base &= self._price_mask(min_price, max_price)
+
+            masks = {
+                facet: self._bitmaps[facet].get(value, 0)
+                for facet, value in filters.items()
+                if value is not None
+            }
+
+            total = base
+            for mask in masks.values():
+                total &= mask
+
+            facets = {}
+            for facet in FACETS:
+                others = base
+                for other, mask in masks.items():
+                    if other != facet:
+                        others &= mask
+
+                counts = {}
+                for value, bitmap in self._bitmaps[facet].items():
+                    count = (bitmap & others).bit_count()
+                    if count and value is not None:
+                        counts[value] = count
+                facets[facet] = counts
+
+            return {"total": total.bit_count(), "facets": facets}
+
+
+facet_index = FacetIndex()
+
+# Counts of recent filters, keyed by the index version so any write makes them unreachable
+counts_cache = TTLCache(maxsize=256, ttl=60.0, name="facet_counts")
+
+def _load_documents(db: Session):
+    return [
+        {
+            "id": row.id,
+            "price": row.price,
+            "part_category_id": row.part_category_id,
+            "brand_category_id": row.brand_category_id,
+            "model_category_id": row.model_category_id,
+        }
+        for row in get_facet_products(db)
+    ]
+
+def count_facets(db: Session, **filters):
+    """
+    Count the products matching a catalog filter per part category, brand and model.
+
+    Parameters:
+        db (Session): The database session used if the index has to be loaded.
+        **filters: part_category_id, brand_category_id, model_category_id, min_price, max_price.
+
+    Returns:
+        dict: The total number of matching products and the counts of every facet.
+    """
+    index = ensure_index(facet_index, _load_documents, db)
+    key = (index.version, tuple(sorted((name, value) for name, value in filters.items() if value is not None)))
+    counts = counts_cache.get(key)
+    if counts is None:
+        counts = index.counts(**filters)
+        counts_cache.set(key, counts)
+    return counts
+
+def index_facets(product: dict):
+    """
+    Add or update a product in the facet index after a catalog write.
+
+    Parameters:
+        product (dict): The product as a dict of its column values.
+    """
+    facet_index.add({name: product[name] for name in ("id", "price", *FACETS)})
+
+def unindex_facets(product_id: int):
+    """
+    Remove a deleted product from the facet index.
+
+    Parameters:
+        product_id (int): The ID of the product.
+    """
+    facet_index.remove(product_id)
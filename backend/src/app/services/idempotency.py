@@ -0,0 +1,147 @@
+import hashlib
+import json
+from datetime import UTC, datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.idempotency import IdempotencyKey
+from app.crud import (
+    add_and_commit,
+    commit_and_refresh,
+    delete_and_commit,
+    delete_expired_idempotency_keys,
+    get_idempotency_key
+)
+
+settings = get_settings()
+
+# A claimed key whose request has not finished after this long belongs to a crashed
+# worker, and is handed to the next retry
+ABANDONED_AFTER = timedelta(minutes=5)
+
+
+def _now():
+    # Stored as naive UTC, like the other DateTime columns are read back
+    return datetime.now(UTC).replace(tzinfo=None)
+
+def _reserve(db: Session, user_id: int, key_hash: str, path: str):
+    """
+    Claim an idempotency key for a request that is about to run.
+
+    Returns:
+        tuple: (record, True) if the key was claimed, or (record, False) with the stored
+        record of an earlier request that used it.
+    """
+    now = _now()
+    for _ in range(2):
+        record = get_idempotency_key(db, user_id=user_id, key_hash=key_hash)
+        abandoned = record is not None and record.status_code is None and record.created_at <= now - ABANDONED_AFTER
+        if record is not None and (record.expires_at <= now or abandoned):
+            # An expired key the cleanup has not reached yet is free to reuse
+            delete_and_commit(db, record)
+            record = None
+        if record is not None:
+            return record, False
+
+        try:
+            record = add_and_commit(db, IdempotencyKey(
+                user_id=user_id,
+                key_hash=key_hash,
+                path=path,
+                created_at=now,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            ))
+            return record, True
+        except IntegrityError:
+            # A concurrent request with the same key claimed it first
+            db.rollback()
+
+    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+
+def _store(db: Session, record: IdempotencyKey, status_code: int, content):
+    record.status_code = status_code
+    record.response = json.dumps(content)
+    commit_and_refresh(db, record)
+
+def run_idempotent(db: Session, user_id: int, key: str | None, path: str, handler):
+    """
+    Run a request handler at most once per user and idempotency key.
+
+    The response of the first request with a key is stored, and retries with the same
+    key get it back without running the handler again. Error responses raised as
+    HTTPException are stored and replayed too; a server error frees the key so the
+    request can be retried.
+
+    Parameters:
+        db (Session): The database session.
+        user_id (int): The ID of the user making the request.
+        key (str | None): The Idempotency-Key header. Without it the handler simply runs.
+        path (str): The route the key is used for; a key cannot be reused on another route.
+        handler: A function taking the database session that performs the request and returns its response.
+
+    Returns:
+        The response of the handler, or a JSONResponse replaying the stored one.
+
+    Raises:
+        HTTPException: 409 if the first request with the key is still running, 422 if
+        the key was used on another route, or the error raised by the handler.
+    """
+    if key is None:
+        return handler(db)
+
+    key_hash = hashlib.sha256(key.encode()).hexdigest()
+    record, claimed = _reserve(db, user_id=user_id, key_hash=key_hash, path=path)
+
+    if not claimed:
+        if record.path != path:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for another request")
+        if record.status_code is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+        return JSONResponse(
+            content=json.loads(record.response),
+            status_code=record.status_code,
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    try:
+        content = jsonable_encoder(handler(db))
+    except HTTPException as error:
+        db.rollback()
+        if error.status_code >= 500:
+            delete_and_commit(db, record)
+        else:
+            _store(db, record, error.status_code, {"detail": error.detail})
+        raise
+    except Exception:
+        db.rollback()
+        delete_and_commit(db, record)
+        raise
+
+    _store(db, record, 200, content)
+    return content
+
+def purge_expired_keys(db: Session, batch_size: int | None = None):
+    """
+    Delete every expired idempotency key, one batch and one commit at a time so the
+    table is never locked for long.
+
+    Parameters:
+        db (Session): The database session.
+        batch_size (int | None): Keys deleted per batch, IDEMPOTENCY_CLEANUP_BATCH_SIZE by default.
+
+    Returns:
+        int: The number of keys deleted.
+    """
+    batch_size = batch_size or settings.IDEMPOTENCY_CLEANUP_BATCH_SIZE
+    now = _now()
+    total = 0
+    while True:
+        deleted = delete_expired_idempotency_keys(db, now=now, batch_size=batch_size)
+        total += deleted
+        if deleted < batch_size:
+            return total
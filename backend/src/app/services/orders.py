@@ -0,0 +1,119 @@
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.pagination import encode_cursor, decode_cursor
+from app.models.order import Order
+from app.crud import (
+    backfill_order_item_snapshots_in_db,
+    get_order_with_items,
+    get_user_orders_page
+)
+
+
+def _order_items(order: Order):
+    return [
+        {
+            "product_name": item.product_name,
+            "product_thumbnail": item.product_thumbnail,
+            "item_quantity": item.quantity,
+            "item_price": item.price,
+        }
+        for item in order.items
+    ]
+
+def list_user_orders(db: Session, user_id: int, status: str | None = None, cursor: str | None = None, limit: int = 20):
+    """
+    Retrieve one page of a user's order history, newest first.
+
+    Parameters:
+        db (Session): The database session.
+        user_id (int): The ID of the user.
+        status (str | None): Only orders with this status.
+        cursor (str | None): The `next_cursor` returned with the previous page.
+        limit (int): The page size.
+
+    Returns:
+        dict: The orders with their items under "order_content" and the cursor of the
+        following page under "next_cursor" (None on the last page).
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    after = None
+    if cursor:
+        values = decode_cursor(cursor, "orders")
+        try:
+            created_at, order_id = values
+            after = [datetime.fromisoformat(created_at), int(order_id)]
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    orders, has_more = get_user_orders_page(db, user_id=user_id, status=status, after=after, limit=limit)
+
+    next_cursor = None
+    if has_more:
+        last = orders[-1]
+        next_cursor = encode_cursor("orders", [last.created_at.isoformat(), last.id])
+
+    return {
+        "order_content": [
+            {
+                "id": order.id,
+                "user_id": order.user_id,
+                "status": order.status,
+                "total_price": order.total_price,
+                "created_at": order.created_at,
+                "items": _order_items(order),
+            }
+            for order in orders
+        ],
+        "next_cursor": next_cursor,
+    }
+
+def get_order(db: Session, order_id: int):
+    """
+    Retrieve an order with its items.
+
+    Parameters:
+        db (Session): The database session.
+        order_id (int): The ID of the order.
+
+    Returns:
+        list[dict]: The order with its items.
+
+    Raises:
+        HTTPException: If no order has this ID.
+    """
+    order = get_order_with_items(db, order_id=order_id)
+    if order is None:
+        raise HTTPException(status_code=400, detail="Order ID not valid")
+
+    return [{
+        "id": order.id,
+        "status": order.status,
+        "total_price": order.total_price,
+        "items": _order_items(order),
+    }]
+
+def backfill_item_snapshots(db: Session, batch_size: int = 1000):
+    """
+    Copy the product name and thumbnail into the order items written before they were
+    stored on the item, one batch and one commit at a time.
+
+    Items whose product has already been deleted are left without a name.
+
+    Parameters:
+        db (Session): The database session.
+        batch_size (int): The number of order items handled per transaction.
+
+    Returns:
+        int: The number of order items updated.
+    """
+    total = 0
+    after_id = 0
+    while after_id is not None:
+        updated, after_id = backfill_order_item_snapshots_in_db(db, after_id=after_id, batch_size=batch_size)
+        total += updated
+    return total
@@ -0,0 +1,179 @@
+import json
+import logging
+import threading
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings, send_email
+from app.models.outbox import OutboxEvent
+from app.crud import (
+    claim_outbox_events,
+    get_order_with_items,
+    get_outbox_backlog
+)
+
+settings = get_settings()
+
+logger = logging.getLogger("app_logger")
+analytics_logger = logging.getLogger("analytics")
+
+# Counters of the worker running in this process, printed by app.jobs.outbox_worker.
+# The API runs no worker, so they are not part of the outbox stats.
+worker_stats = {
+    "batches": 0,
+    "handled": 0,
+    "retried": 0,
+    "failed": 0,
+    "last_lag_seconds": None,
+}
+_stats_lock = threading.Lock()
+
+
+def _now():
+    # Stored as naive UTC, like the other DateTime columns are read back
+    return datetime.now(UTC).replace(tzinfo=None)
+
+def enqueue(db: Session, topic: str, payload: dict):
+    """
+    Add an event to the outbox without committing, so it is written in the same
+    transaction as the change it reports and only exists if that change does.
+
+    Parameters:
+        db (Session): The database session.
+        topic (str): The name of the handler that will process the event.
+        payload (dict): JSON-serializable arguments for the handler.
+    """
+    now = _now()
+    db.add(OutboxEvent(topic=topic, payload=json.dumps(payload), created_at=now, available_at=now))
+
+def _send_order_confirmation(db: Session, payload: dict):
+    order = get_order_with_items(db, order_id=payload["order_id"])
+    email = order.user.email
+    # Test accounts get no mail, as on sign-up
+    if email.endswith("@example.com"):
+        return
+
+    lines = [f"{item.quantity} x {item.product_name} - ${item.price:.2f}" for item in order.items]
+    body = "\n".join([
+        f"Thank you for your order, {order.user.username}!",
+        "",
+        f"Order #{order.id}",
+        *lines,
+        "",
+        f"Total: ${order.total_price:.2f}",
+        f"Shipping: {order.shipping_method}",
+    ])
+    send_email(to_email=email, subject=f"Pitstop Performance - Order #{order.id} Confirmed", body=body)
+
+def _record_order_analytics(db: Session, payload: dict):
+    order = get_order_with_items(db, order_id=payload["order_id"])
+    analytics_logger.info(json.dumps({
+        "event": "order_completed",
+        "order_id": order.id,
+        "user_id": order.user_id,
+        "total_price": order.total_price,
+        "items": sum(item.quantity for item in order.items),
+        "shipping_method": order.shipping_method,
+        "payment_method": order.payment_method,
+    }))
+
+# Handlers run at least once per event and may run again after a crash, so they must
+# be safe to repeat. They must not commit; the worker commits each event with its outcome.
+HANDLERS = {
+    "order_confirmation_email": _send_order_confirmation,
+    "order_analytics": _record_order_analytics,
+}
+
+ORDER_COMPLETED_TOPICS = ("order_confirmation_email", "order_analytics")
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    The wait before the next attempt at an event that has failed `attempts` times.
+    """
+    delay = settings.OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_MAX_DELAY))
+
+def process_batch(db: Session, batch_size: int | None = None):
+    """
+    Claim up to a batch of due outbox events, run their handlers and commit the outcome.
+
+    Each event is claimed, handled and committed in a transaction of its own, so its
+    row lock is only held while its own handler runs, and the outcome of the events
+    already handled is kept whatever happens to the next one. A handler runs in a
+    savepoint, so a failed query leaves the session usable for recording the failure.
+
+    A failed event is retried later with exponential backoff, and is marked "Failed"
+    once it has used OUTBOX_MAX_ATTEMPTS attempts.
+
+    Parameters:
+        db (Session): The database session.
+        batch_size (int | None): Events handled at most, OUTBOX_BATCH_SIZE by default.
+
+    Returns:
+        int: The number of events claimed.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    now = _now()
+
+    claimed = handled = retried = failed = 0
+    lag = None
+    while claimed < batch_size:
+        events = claim_outbox_events(db, now=now, batch_size=1)
+        if not events:
+            break
+        event = events[0]
+        claimed += 1
+
+        handler = HANDLERS.get(event.topic)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler for topic {event.topic!r}")
+            with db.begin_nested():
+                handler(db, json.loads(event.payload))
+        except Exception as error:
+            event.attempts += 1
+            event.last_error = f"{type(error).__name__}: {error}"
+            if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                event.status = "Failed"
+                failed += 1
+                logger.error(f"Outbox event {event.id} ({event.topic}) failed for good: {event.last_error}")
+            else:
+                event.available_at = _now() + retry_delay(event.attempts)
+                retried += 1
+                logger.warning(f"Outbox event {event.id} ({event.topic}) failed, retrying: {event.last_error}")
+        else:
+            event.attempts += 1
+            event.status = "Done"
+            event.processed_at = _now()
+            handled += 1
+            lag = (event.processed_at - event.created_at).total_seconds()
+
+        db.commit()
+
+    with _stats_lock:
+        worker_stats["batches"] += 1
+        worker_stats["handled"] += handled
+        worker_stats["retried"] += retried
+        worker_stats["failed"] += failed
+        if lag is not None:
+            worker_stats["last_lag_seconds"] = lag
+    return claimed
+
+def get_outbox_stats(db: Session):
+    """
+    Report how far behind the outbox is.
+
+    Parameters:
+        db (Session): The database session.
+
+    Returns:
+        dict: The number of pending events, how long the oldest one has waited in
+        seconds, and the number of failed events.
+    """
+    pending, oldest, failed = get_outbox_backlog(db)
+    return {
+        "pending": pending,
+        "oldest_pending_age_seconds": (_now() - oldest).total_seconds() if oldest is not None else 0.0,
+        "failed": failed,
+    }
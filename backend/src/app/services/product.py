@@ -6,10 +6,17 @@ from app.models.product import Product, PartCategory, BrandCategory, ModelCatego
 from app.schemas.product import ProductCreate, ProductUpdate, PartCategoryCreate, BrandCategoryCreate, ModelCategoryCreate
 
 import json
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.pagination import encode_cursor, decode_cursor
+from app.services.cart import summary_cache
+from app.services.facets import count_facets, index_facets, unindex_facets
+from app.services.search import index_product, unindex_product
+from app.services.suggest import index_suggestion, unindex_suggestion
 from app.crud import (
     add_and_commit,
     commit_and_refresh,
-    delete_and_commit,
+    delete_product_in_db,
     get_product_by_id,
     get_product_by_brand,
     get_product_by_part,
@@ -25,9 +32,231 @@ from app.crud import (
     get_products_by_brand_and_model,
     get_products_by_brand_category_by_id,
     get_products_by_part_category_id,
+    get_products_page,
+    refresh_cart_summaries_for_product,
     search_products_given_make
 )
 
+settings = get_settings()
+
+catalog_cache = TTLCache(maxsize=settings.CATALOG_CACHE_MAXSIZE, ttl=settings.CATALOG_CACHE_TTL, name="catalog")
+
+# --- Catalog Read Cache ---
+
+def _row_to_dict(row):
+    """
+    Copy the column values of an ORM row into a plain dict that is safe to share
+    between requests and sessions.
+    """
+    return {column.key: getattr(row, column.key) for column in row.__table__.columns}
+
+def _cached(key, load):
+    """
+    Return the cached value for `key`, calling `load` to fill the cache on a miss.
+    """
+    value = catalog_cache.get(key)
+    if value is None:
+        generation = catalog_cache.generation
+        value = load()
+        if value is not None:
+            catalog_cache.set(key, value, generation=generation)
+    return value
+
+def _product_matches(product: dict, filters: tuple):
+    """
+    Check whether a product snapshot falls inside a listing's filters.
+    """
+    for name, value in filters:
+        if name == "min_price":
+            if product["price"] < value:
+                return False
+        elif name == "max_price":
+            if product["price"] > value:
+                return False
+        elif product[name] != value:
+            return False
+    return True
+
+def _invalidate_products(*snapshots: dict):
+    """
+    Drop every cached read that could contain one of the given product snapshots.
+
+    Pass the product as it was before and after a write so that listings it left
+    and listings it joined are both invalidated.
+    """
+    ids = {snapshot["id"] for snapshot in snapshots}
+
+    def affected(key):
+        kind = key[0]
+        if kind == "product":
+            return key[1] in ids
+        if kind == "products":
+            return any(_product_matches(snapshot, key[-1]) for snapshot in snapshots)
+        if kind == "brand_model":
+            return any(
+                snapshot["brand_category_id"] == key[1] and snapshot["model_category_id"] == key[2]
+                for snapshot in snapshots
+            )
+        return False
+
+    catalog_cache.invalidate_where(affected)
+
+def _product_written(before: dict | None, after: dict | None):
+    """
+    Propagate a committed product write to the in-memory catalog structures.
+
+    Parameters:
+        before (dict | None): The product as it was before the write, None on create.
+        after (dict | None): The product as it is after the write, None on delete.
+    """
+    _invalidate_products(*[snapshot for snapshot in (before, after) if snapshot is not None])
+
+    if after is not None:
+        index_product(after)
+        index_suggestion("product", after["id"], after["name"])
+        index_facets(after)
+    else:
+        unindex_product(before["id"])
+        unindex_suggestion("product", before["id"])
+        unindex_facets(before["id"])
+
+def get_catalog_cache_stats():
+    """
+    Report the size and hit, miss and eviction counters of the catalog cache.
+
+    Returns:
+        dict: The cache statistics.
+    """
+    return catalog_cache.stats()
+
+def get_cached_product(db: Session, product_id: int):
+    """
+    Retrieve a product by its ID through the catalog cache.
+
+    Parameters:
+        db (Session): The database session.
+        product_id (int): The ID of the product.
+
+    Returns:
+        dict: The product, or None if not found.
+    """
+    def load():
+        product = get_product_by_id(db=db, product_id=product_id)
+        return _row_to_dict(product) if product else None
+
+    return _cached(("product", product_id), load)
+
+def get_cached_part_categories(db: Session):
+    """
+    Retrieve all part categories through the catalog cache.
+    """
+    return _cached(("part_categories",), lambda: [_row_to_dict(row) for row in get_all_part_categories(db)])
+
+def get_cached_brand_categories(db: Session):
+    """
+    Retrieve all brand categories through the catalog cache.
+    """
+    return _cached(("brand_categories",), lambda: [_row_to_dict(row) for row in get_all_brand_categories(db)])
+
+def get_cached_model_categories(db: Session):
+    """
+    Retrieve all model categories through the catalog cache.
+    """
+    return _cached(("model_categories",), lambda: [_row_to_dict(row) for row in get_all_model_categories(db)])
+
+def get_cached_model_categories_by_brand(db: Session, brand_category_id: int):
+    """
+    Retrieve the model categories of a brand through the catalog cache.
+    """
+    return _cached(
+        ("models_by_brand", brand_category_id),
+        lambda: [_row_to_dict(row) for row in get_model_categories_by_brand_id(db=db, brand_category_id=brand_category_id)]
+    )
+
+def get_cached_products_by_brand_and_model(db: Session, brand_category_id: int, model_category_id: int):
+    """
+    Retrieve the products of a brand and model through the catalog cache.
+    """
+    return _cached(
+        ("brand_model", brand_category_id, model_category_id),
+        lambda: [
+            _row_to_dict(row)
+            for row in get_products_by_brand_and_model(db=db, brand_category_id=brand_category_id, model_category_id=model_category_id)
+        ]
+    )
+
+# --- Catalog Listing ---
+
+# The type of the sort value stored in a catalog cursor before the product id
+CURSOR_SORT_TYPES = {
+    "price": (int, float),
+    "name": (str,),
+}
+
+def _cursor_position(sort: str, values: list) -> list:
+    """
+    Check the values of a catalog cursor: the id of the last product, preceded by its
+    sort value unless the sort is by id.
+    """
+    *sort_values, product_id = values
+    if type(product_id) is not int:
+        raise ValueError(values)
+    if sort == "id":
+        if sort_values:
+            raise ValueError(values)
+    elif len(sort_values) != 1 or isinstance(sort_values[0], bool) or not isinstance(sort_values[0], CURSOR_SORT_TYPES[sort]):
+        raise ValueError(values)
+    return values
+
+def list_products(db: Session, sort: str = "id", cursor: str | None = None, limit: int = 50, facets: bool = False, **filters):
+    """
+    Retrieve one page of the catalog, optionally filtered.
+
+    Parameters:
+        db (Session): The database session.
+        sort (str): The sort key, one of "id", "price" or "name".
+        cursor (str | None): The `next_cursor` returned with the previous page.
+        limit (int): The page size.
+        facets (bool): Whether to also count the matching products per part category,
+            brand and model.
+        **filters: part_category_id, brand_category_id, model_category_id, min_price, max_price.
+
+    Returns:
+        dict: The page of products under "items" and the cursor of the following page
+        under "next_cursor" (None on the last page). With `facets`, also the number of
+        matching products under "total" and the per-facet counts under "facets".
+
+    Raises:
+        HTTPException: If the cursor is invalid or was issued for another sort order.
+    """
+    kind = f"products:{sort}"
+    after = None
+    if cursor:
+        values = decode_cursor(cursor, kind)
+        try:
+            after = _cursor_position(sort, values)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    active_filters = tuple(sorted((name, value) for name, value in filters.items() if value is not None))
+
+    def load():
+        products, has_more = get_products_page(db, sort=sort, after=after, limit=limit, **filters)
+
+        next_cursor = None
+        if has_more:
+            last = products[-1]
+            values = [last.id] if sort == "id" else [getattr(last, sort), last.id]
+            next_cursor = encode_cursor(kind, values)
+
+        return {"items": [_row_to_dict(product) for product in products], "next_cursor": next_cursor}
+
+    page = _cached(("products", sort, cursor, limit, active_filters), load)
+    if facets:
+        page = {**page, **count_facets(db, **filters)}
+    return page
+
+# --- Catalog Writes ---
+
 def create_new_product(db: Session, product: ProductCreate):
     """
     Creates a new product entry in the database.
@@ -59,7 +288,10 @@ def create_new_product(db: Session, product: ProductCreate):
     new_product.set_tags(product.tags)
     new_product.set_images(product.images)
 
-    return add_and_commit(db, new_product)
+    add_and_commit(db, new_product)
+    after = _row_to_dict(new_product)
+    _product_written(None, after)
+    return new_product
 
 def modify_product(db: Session, product_id: int, product_update: ProductUpdate):
     """
@@ -85,6 +317,8 @@ def modify_product(db: Session, product_id: int, product_update: ProductUpdate):
             detail="No Product Found!"
         )
 
+    before = _row_to_dict(product)
+
     if product_update.name is not None:
         product.name = product_update.name
     if product_update.description is not None:
@@ -102,7 +336,14 @@ def modify_product(db: Session, product_id: int, product_update: ProductUpdate):
     if product_update.thumbnail is not None:
         product.thumbnail = product_update.thumbnail
 
-    return commit_and_refresh(db, product)
+    commit_and_refresh(db, product)
+    after = _row_to_dict(product)
+    _product_written(before, after)
+    if after["price"] != before["price"]:
+        # Cart subtotals are at the current prices, as checkout charges them
+        user_ids = refresh_cart_summaries_for_product(product_id=product_id, db=db)
+        summary_cache.invalidate(*user_ids)
+    return product
 
 def delete_product(db: Session, product_id: int):
     """
@@ -126,7 +367,10 @@ def delete_product(db: Session, product_id: int):
             detail="No Product Found!"
         )
 
-    delete_and_commit(db, product)
+    before = _row_to_dict(product)
+    user_ids = delete_product_in_db(product=product, db=db)
+    summary_cache.invalidate(*user_ids)
+    _product_written(before, None)
 
     return {"detail": "Product Deleted Successfully"}
 
@@ -153,6 +397,8 @@ def add_new_part_category(db: Session, part: PartCategoryCreate):
     )
 
     add_and_commit(db=db, obj=new_part)
+    catalog_cache.invalidate(("part_categories",))
+    index_suggestion("part", new_part.id, new_part.part_type_name)
     return get_part_category_by_name(name=part.part_type_name, db=db)
 
 def add_new_brand_category(db: Session, brand: BrandCategoryCreate):
@@ -178,6 +424,8 @@ def add_new_brand_category(db: Session, brand: BrandCategoryCreate):
     )
 
     add_and_commit(db=db, obj=new_brand)
+    catalog_cache.invalidate(("brand_categories",))
+    index_suggestion("brand", new_brand.id, new_brand.brand_type_name)
     return get_brand_category_by_name(db=db, name=brand.brand_type_name)
 
 def add_new_model_category(db: Session, model: ModelCategoryCreate):
@@ -190,4 +438,6 @@ def add_new_model_category(db: Session, model: ModelCategoryCreate):
     )
 
     add_and_commit(db=db, obj=new_model)
+    catalog_cache.invalidate(("model_categories",), ("models_by_brand", new_model.brand_id))
+    index_suggestion("model", new_model.id, new_model.model_name)
     return get_model_category_by_name(db=db, name=new_model.model_name)
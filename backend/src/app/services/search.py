@@ -0,0 +1,653 @@
+import itertools
+import json
+import math
+import re
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.database import SessionLocal
+from app.core.pagination import encode_cursor, decode_cursor
+from app.crud import get_products_by_ids, get_search_documents
+
+settings = get_settings()
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words for fuzzy matching keep inner punctuation so part numbers like "5w-30" stay whole
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+# How much a term occurrence counts towards relevance depending on the field it is in
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "tags": 2.0,
+    "description": 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str | None):
+    """
+    Split text into lowercase alphanumeric terms.
+
+    Parameters:
+        text (str | None): The text to tokenize.
+
+    Returns:
+        list[str]: The terms, in order of appearance.
+    """
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+def fuzzy_words(text: str | None):
+    """
+    Split text into lowercase words for fuzzy matching, keeping part numbers intact.
+
+    Parameters:
+        text (str | None): The text to split.
+
+    Returns:
+        list[str]: The words, in order of appearance.
+    """
+    if not text:
+        return []
+    return WORD_PATTERN.findall(text.lower())
+
+def trigrams(word: str):
+    """
+    Compute the character trigrams of a word, padded like PostgreSQL's pg_trgm so the
+    start and end of the word weigh more than its middle.
+
+    Parameters:
+        word (str): The word.
+
+    Returns:
+        frozenset[str]: The trigrams of the word.
+    """
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def _parse_tags(tags):
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags)
+        except ValueError:
+            return [tags]
+    return [str(tag) for tag in tags]
+
+def make_document(product):
+    """
+    Build the searchable document of a product.
+
+    Parameters:
+        product: A Product row, or a dict with the same keys.
+
+    Returns:
+        dict: The id, brand_category_id and raw text fields of the product.
+    """
+    get = product.get if isinstance(product, dict) else lambda key: getattr(product, key)
+    return {
+        "id": get("id"),
+        "brand_category_id": get("brand_category_id"),
+        "name": get("name") or "",
+        "description": get("description") or "",
+        "tags": _parse_tags(get("tags")),
+    }
+
+
+class RebuildableIndex:
+    """
+    Base class for the in-memory catalog indexes.
+
+    Subclasses hold their data in the attributes listed in `_STATE`, initialize them in
+    `_reset` and maintain them in `_add(document)` and `_remove(key)`. This class makes
+    those updates thread-safe and lets the whole index be rebuilt from a fresh load of
+    the database while it keeps serving: writes made during the load are journaled and
+    replayed onto the new data before it is swapped in.
+    """
+
+    _STATE = ()
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._reset()
+        self.built_at = None
+        self.version = 0
+        self._journal = None
+
+    def _reset(self):
+        raise NotImplementedError
+
+    def _add(self, document: dict):
+        raise NotImplementedError
+
+    def _remove(self, key):
+        raise NotImplementedError
+
+    def _prepare(self):
+        """
+        Hook run on a freshly loaded index before it is swapped in, e.g. to warm caches.
+        """
+
+    def build(self, documents):
+        """
+        Replace the content of the index with the given documents.
+        """
+        fresh = type(self)()
+        for document in documents:
+            fresh._add(document)
+        fresh._prepare()
+
+        with self._lock:
+            # Writes that happened while the documents were being loaded are replayed
+            # so the swap does not lose them.
+            for action, payload in self._journal or []:
+                if action == "add":
+                    fresh._add(payload)
+                else:
+                    fresh._remove(payload)
+
+            for name in self._STATE:
+                setattr(self, name, getattr(fresh, name))
+            self._journal = None
+            self.built_at = time.monotonic()
+            self.version += 1
+
+    def start_rebuild(self):
+        """
+        Start journaling writes so they survive a rebuild that is about to load documents.
+
+        Returns:
+            bool: False if a rebuild is already in progress.
+        """
+        with self._lock:
+            if self._journal is not None:
+                return False
+            self._journal = []
+            return True
+
+    def cancel_rebuild(self):
+        with self._lock:
+            self._journal = None
+
+    def add(self, document: dict):
+        """
+        Index a document, replacing any previous version of it.
+        """
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(("add", document))
+            if self.built_at is not None:
+                self._add(document)
+                self.version += 1
+
+    def remove(self, key):
+        """
+        Remove a document from the index.
+        """
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(("remove", key))
+            if self.built_at is not None:
+                self._remove(key)
+                self.version += 1
+
+
+def ensure_index(index: RebuildableIndex, load, db: Session):
+    """
+    Make sure an index is loaded, and refresh it in the background once it is older
+    than SEARCH_INDEX_MAX_AGE.
+
+    Each worker process keeps its own indexes. Writes served by this worker are applied
+    immediately; the periodic refresh picks up writes served by the other workers.
+
+    Parameters:
+        index (RebuildableIndex): The index.
+        load: A function returning the documents of the index given a database session.
+        db (Session): The database session used for the first load.
+
+    Returns:
+        RebuildableIndex: The ready index.
+    """
+    if index.built_at is None:
+        with index._build_lock:
+            if index.built_at is None:
+                index.start_rebuild()
+                try:
+                    index.build(load(db))
+                except Exception:
+                    index.cancel_rebuild()
+                    raise
+    elif time.monotonic() - index.built_at > settings.SEARCH_INDEX_MAX_AGE and index.start_rebuild():
+        def run():
+            session = SessionLocal()
+            try:
+                index.build(load(session))
+            except Exception:
+                # Keep serving the current data; the next request retries the rebuild
+                index.cancel_rebuild()
+            finally:
+                session.close()
+
+        threading.Thread(target=run, name=f"{type(index).__name__}-rebuild", daemon=True).start()
+
+    return index
+
+
+class SearchIndex(RebuildableIndex):
+    """
+    An in-memory inverted index over product name, description and tags, ranked with BM25.
+
+    Term frequencies are weighted by field (see FIELD_WEIGHTS) so a match in the name
+    outranks the same match in the description. Documents are added and removed one at
+    a time as products change, and the whole index can be rebuilt from the database in
+    the background without blocking searches.
+    """
+
+    _STATE = (
+        "_postings", "_doc_terms", "_doc_length", "_doc_brand", "_brand_docs", "_total_length",
+        "_doc_words", "_word_docs", "_word_trigrams", "_trigram_words", "_size_words",
+    )
+
+    def _reset(self):
+        self._postings = {}
+        self._doc_terms = {}
+        self._doc_length = {}
+        self._doc_brand = {}
+        self._brand_docs = {}
+        self._total_length = 0.0
+
+        # Fuzzy matching state: the words of each document, the documents of each word,
+        # the trigrams of each word and, for every (trigram, trigram count) pair, the
+        # words of that size containing the trigram, and the number of words of each size
+        self._doc_words = {}
+        self._word_docs = {}
+        self._word_trigrams = {}
+        self._trigram_words = {}
+        self._size_words = {}
+
+    def _add(self, document: dict):
+        doc_id = document["id"]
+        self._remove(doc_id)
+
+        terms = {}
+        fields = {
+            "name": document["name"],
+            "description": document["description"],
+            "tags": " ".join(document["tags"]),
+        }
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                terms[term] = terms.get(term, 0.0) + weight
+
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = frequency
+
+        length = sum(terms.values())
+        self._doc_terms[doc_id] = list(terms)
+        self._doc_length[doc_id] = length
+        self._doc_brand[doc_id] = document["brand_category_id"]
+        self._brand_docs.setdefault(document["brand_category_id"], set()).add(doc_id)
+        self._total_length += length
+
+        words = set(fuzzy_words(document["name"]))
+        for tag in document["tags"]:
+            words.update(fuzzy_words(tag))
+
+        for word in words:
+            docs = self._word_docs.get(word)
+            if docs is None:
+                docs = self._word_docs[word] = set()
+                grams = self._word_trigrams[word] = trigrams(word)
+                for gram in grams:
+                    self._trigram_words.setdefault((gram, len(grams)), set()).add(word)
+                self._size_words[len(grams)] = self._size_words.get(len(grams), 0) + 1
+            docs.add(doc_id)
+        self._doc_words[doc_id] = words
+
+    def _remove(self, doc_id: int):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+        self._total_length -= self._doc_length.pop(doc_id)
+        brand = self._doc_brand.pop(doc_id)
+        brand_docs = self._brand_docs[brand]
+        brand_docs.discard(doc_id)
+        if not brand_docs:
+            del self._brand_docs[brand]
+
+        for word in self._doc_words.pop(doc_id, ()):
+            docs = self._word_docs[word]
+            docs.discard(doc_id)
+            if docs:
+                continue
+
+            del self._word_docs[word]
+            grams = self._word_trigrams.pop(word)
+            for gram in grams:
+                key = (gram, len(grams))
+                words = self._trigram_words[key]
+                words.discard(word)
+                if not words:
+                    del self._trigram_words[key]
+            self._size_words[len(grams)] -= 1
+            if not self._size_words[len(grams)]:
+                del self._size_words[len(grams)]
+
+    def __len__(self):
+        return len(self._doc_length)
+
+    def search(self, query: str, brand_category_id: int | None = None):
+        """
+        Rank the documents matching any term of the query.
+
+        Parameters:
+            query (str): The user's search text.
+            brand_category_id (int | None): Only rank products of this brand.
+
+        Returns:
+            list[tuple[int, float]]: (product id, score) pairs, best first.
+        """
+        terms = set(tokenize(query))
+
+        with self._lock:
+            doc_count = len(self._doc_length)
+            if not terms or not doc_count:
+                return []
+            average_length = self._total_length / doc_count
+
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    if brand_category_id is not None and self._doc_brand[doc_id] != brand_category_id:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_length[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def _similar_words(self, word: str, threshold: float):
+        """
+        Find the indexed words whose trigram similarity to `word` reaches `threshold`.
+
+        Similarity is |A & B| / |A | B| over the trigram sets. For a word with `n`
+        trigrams that bounds `n` to [t * q, q / t] and requires at least
+        ceil(t * (q + n) / (1 + t)) shared trigrams, where `q` is the size of the query
+        word's set. A word sharing that many trigrams must contain one of the
+        q - overlap + 1 rarest query trigrams, so only those postings are scanned and
+        every candidate is verified with a set intersection. No indexed word has more
+        trigrams than the longest one, so `n` stops there however low `threshold` is.
+        """
+        grams = trigrams(word)
+        q = len(grams)
+        matches = {}
+        if not self._size_words:
+            return matches
+
+        longest = max(self._size_words)
+        for n in range(max(1, math.ceil(threshold * q)), min(math.floor(q / threshold), longest) + 1):
+            overlap = math.ceil(threshold * (q + n) / (1 + threshold) - 1e-9)
+            if overlap > min(q, n):
+                continue
+
+            postings = sorted(
+                (self._trigram_words.get((gram, n), ()) for gram in grams),
+                key=len
+            )
+            candidates = set().union(*postings[:q - overlap + 1])
+
+            for candidate in candidates:
+                common = len(grams & self._word_trigrams[candidate])
+                similarity = common / (q + n - common)
+                if similarity >= threshold:
+                    matches[candidate] = similarity
+
+        return matches
+
+    def fuzzy_search(self, query: str, threshold: float, brand_category_id: int | None = None):
+        """
+        Rank products whose name or tag words are similar to the words of the query.
+
+        Each query word contributes the similarity of the closest matching word of a
+        product, so "bosh 5w-3o" still finds "Bosch 5W-30 Oil". Products are grouped by
+        score with set operations instead of being scored one by one, which keeps broad
+        queries like a misspelled brand cheap on large catalogs.
+
+        Parameters:
+            query (str): The user's search text.
+            threshold (float): The minimum trigram similarity (0-1] for a word to match.
+            brand_category_id (int | None): Only rank products of this brand.
+
+        Returns:
+            RankedMatches: The matching product ids with their scores, best first.
+        """
+        groups = {}
+        owned = set()
+
+        def add_group(target, score, docs):
+            # Sets handed out by the index are shared: they are copied the first time
+            # something is merged into them, and updated in place after that
+            key = round(score, 6)
+            if key not in target:
+                target[key] = docs
+            elif (id(target), key) in owned:
+                target[key] |= docs
+            else:
+                target[key] = target[key] | docs
+                owned.add((id(target), key))
+
+        with self._lock:
+            brand_docs = None
+            if brand_category_id is not None:
+                brand_docs = self._brand_docs.get(brand_category_id)
+                if not brand_docs:
+                    return RankedMatches({})
+
+            for word in set(fuzzy_words(query)):
+                matches = sorted(self._similar_words(word, threshold).items(), key=lambda match: -match[1])
+
+                # Split the documents of this query word by the similarity of their best matching word
+                word_groups = []
+                word_docs = set()
+                for match, similarity in matches:
+                    # Copied, since the results are read after the lock is released
+                    docs = set(self._word_docs[match])
+                    if brand_docs is not None:
+                        docs = docs & brand_docs
+                    if word_docs:
+                        docs = docs - word_docs
+                    if docs:
+                        word_groups.append((similarity, docs))
+                        if not word_docs:
+                            word_docs = docs
+                        elif len(word_groups) == 2:
+                            word_docs = word_docs | docs
+                        else:
+                            word_docs |= docs
+
+                if not word_groups:
+                    continue
+
+                if not groups:
+                    for similarity, word_group in word_groups:
+                        add_group(groups, similarity, word_group)
+                    continue
+
+                # Add this word's similarity to the score of every group it overlaps
+                merged = {}
+                owned.clear()
+                covered = set()
+                for score, docs in groups.items():
+                    covered |= docs
+                    rest = docs - word_docs
+                    if rest:
+                        add_group(merged, score, rest)
+                    for similarity, word_group in word_groups:
+                        both = docs & word_group
+                        if both:
+                            add_group(merged, score + similarity, both)
+
+                for similarity, word_group in word_groups:
+                    new = word_group - covered
+                    if new:
+                        add_group(merged, similarity, new)
+
+                groups = merged
+
+        return RankedMatches(groups)
+
+
+class RankedMatches:
+    """
+    Search results grouped by score, best group first.
+
+    Supports len() and slicing like the list of (product id, score) pairs it stands
+    for, without materializing it. Products sharing a score come in the iteration order
+    of their group, which is stable as long as the index does not change.
+    """
+
+    def __init__(self, groups: dict):
+        self._groups = sorted(groups.items(), key=lambda group: -group[0])
+        self._total = sum(len(docs) for _, docs in self._groups)
+
+    def __len__(self):
+        return self._total
+
+    def __getitem__(self, window: slice):
+        start = window.start or 0
+        stop = self._total if window.stop is None else min(window.stop, self._total)
+
+        result = []
+        position = 0
+        for score, docs in self._groups:
+            if position >= stop:
+                break
+            if position + len(docs) > start:
+                ids = itertools.islice(docs, max(0, start - position), stop - position)
+                result.extend((doc_id, score) for doc_id in ids)
+            position += len(docs)
+
+        return result
+
+
+search_index = SearchIndex()
+
+# Ranked results of recent queries, so paging through them does not rank them again.
+# Keys carry the index version, so any write makes older entries unreachable.
+ranking_cache = TTLCache(maxsize=256, ttl=60.0, name="search_ranking")
+
+def _load_documents(db: Session):
+    return [make_document(row._mapping) for row in get_search_documents(db)]
+
+def ensure_search_index(db: Session):
+    """
+    Make sure the product search index is loaded and fresh.
+
+    Parameters:
+        db (Session): The database session used for the first load.
+
+    Returns:
+        SearchIndex: The ready index.
+    """
+    return ensure_index(search_index, _load_documents, db)
+
+def index_product(product):
+    """
+    Add or refresh a product in the search index after it was written.
+
+    Parameters:
+        product: The Product row, or a dict with the same keys.
+    """
+    search_index.add(make_document(product))
+
+def unindex_product(product_id: int):
+    """
+    Remove a deleted product from the search index.
+
+    Parameters:
+        product_id (int): The ID of the deleted product.
+    """
+    search_index.remove(product_id)
+
+def _page(db: Session, ranked: list, cursor: str | None, limit: int, kind: str):
+    offset = 0
+    if cursor:
+        values = decode_cursor(cursor, kind)
+        # The position of the next page in the ranking
+        if len(values) != 1 or type(values[0]) is not int or values[0] < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        offset = values[0]
+    page_ids = [doc_id for doc_id, _ in ranked[offset:offset + limit]]
+
+    products = get_products_by_ids(db, page_ids)
+    items = [products[doc_id] for doc_id in page_ids if doc_id in products]
+
+    next_cursor = None
+    if offset + limit < len(ranked):
+        next_cursor = encode_cursor(kind, [offset + limit])
+
+    return {"items": items, "total": len(ranked), "next_cursor": next_cursor}
+
+def search_products(db: Session, query: str, brand_category_id: int | None = None,
+                    cursor: str | None = None, limit: int = 20, mode: str = "text",
+                    threshold: float | None = None):
+    """
+    Search products, either full-text over name, description and tags or fuzzily over
+    the words of the name and tags.
+
+    Parameters:
+        db (Session): The database session.
+        query (str): The search text.
+        brand_category_id (int | None): Restrict the results to one brand.
+        cursor (str | None): The `next_cursor` returned with the previous page.
+        limit (int): The page size.
+        mode (str): "text" for BM25 ranked full-text search, "fuzzy" for typo tolerant
+            trigram matching.
+        threshold (float | None): Minimum word similarity in fuzzy mode. Defaults to
+            SEARCH_FUZZY_THRESHOLD.
+
+    Returns:
+        dict: The page of matching products under "items", best match first, the number
+        of matches under "total" and the cursor of the following page under "next_cursor".
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    index = ensure_search_index(db)
+    if mode == "fuzzy" and threshold is None:
+        threshold = settings.SEARCH_FUZZY_THRESHOLD
+
+    key = (index.version, mode, query.lower().strip(), threshold, brand_category_id)
+    ranked = ranking_cache.get(key)
+    if ranked is None:
+        if mode == "fuzzy":
+            ranked = index.fuzzy_search(query, threshold=threshold, brand_category_id=brand_category_id)
+        else:
+            ranked = index.search(query, brand_category_id=brand_category_id)
+        ranking_cache.set(key, ranked)
+
+    return _page(db, ranked, cursor, limit, kind=f"search:{mode}")
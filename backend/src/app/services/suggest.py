@@ -0,0 +1,259 @@
+import bisect
+import heapq
+
+from sqlalchemy.orm import Session
+
+from app.crud import (
+    get_all_brand_categories,
+    get_all_model_categories,
+    get_all_part_categories,
+    get_product_order_counts,
+    get_suggestion_products
+)
+from app.services.search import RebuildableIndex, ensure_index
+
+# Entries kept per memoized prefix, i.e. the largest `limit` a suggest request can ask for
+MAX_SUGGESTIONS = 20
+
+# Prefixes matching more keys than this get their top entries memoized
+SCAN_LIMIT = 2000
+
+# Sorts after any character of a key, so (prefix + LAST_CHARACTER,) bounds a prefix range
+LAST_CHARACTER = chr(0x10FFFF)
+
+# Order between suggestions of equal popularity
+KIND_RANK = {
+    "brand": 0,
+    "model": 1,
+    "part": 2,
+    "product": 3,
+}
+
+
+def normalize(text: str | None):
+    return " ".join((text or "").lower().split())
+
+
+class SuggestIndex(RebuildableIndex):
+    """
+    Search-as-you-type index over product, brand, model and part category names.
+
+    Every word start of a name is stored as a key in one sorted array, so "oil" finds
+    "Bosch Oil Filter", and a prefix lookup is a binary search followed by a scan of the
+    matching range. Best suggestions are the most popular ones. Short prefixes match a
+    large share of the catalog, so the best entries of any prefix whose range is large
+    are memoized when the index is built and kept up to date by every write.
+    """
+
+    _STATE = ("_keys", "_entries", "_top", "_sorted")
+
+    def _reset(self):
+        self._keys = []
+        self._entries = {}
+        self._top = {}
+        # While an index is loading, keys are appended and sorted once at the end
+        self._sorted = False
+
+    @staticmethod
+    def _rank(entry: dict):
+        return (-entry["weight"], KIND_RANK[entry["kind"]], entry["text"].lower(), entry["id"])
+
+    @staticmethod
+    def _suffixes(text: str):
+        words = normalize(text).split(" ")
+        return {" ".join(words[i:]) for i in range(len(words)) if words[i]}
+
+    def _add(self, document: dict):
+        key = (document["kind"], document["id"])
+        previous = self._entries.get(key)
+        if previous is not None:
+            self._remove(key)
+
+        weight = document.get("weight")
+        if weight is None:
+            weight = previous["weight"] if previous else 0
+
+        entry = {"text": document["text"], "kind": document["kind"], "id": document["id"], "weight": weight}
+        suffixes = self._suffixes(entry["text"])
+        entry["suffixes"] = suffixes
+        self._entries[key] = entry
+
+        for suffix in suffixes:
+            if not self._sorted:
+                self._keys.append((suffix, key))
+                continue
+            bisect.insort(self._keys, (suffix, key))
+
+            for length in range(1, len(suffix) + 1):
+                top = self._top.get(suffix[:length])
+                if top is None or any(item is entry for item in top):
+                    continue
+                # A memo shortened by removals only knows its own entries, so it can
+                # only take an entry that ranks before its last one
+                if self._rank(entry) < self._rank(top[-1]):
+                    top.append(entry)
+                    top.sort(key=self._rank)
+                    del top[MAX_SUGGESTIONS:]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        self._sort()
+        for suffix in entry["suffixes"]:
+            position = bisect.bisect_left(self._keys, (suffix, key))
+            if position < len(self._keys) and self._keys[position] == (suffix, key):
+                del self._keys[position]
+
+            for length in range(1, len(suffix) + 1):
+                top = self._top.get(suffix[:length])
+                if top is None or not any(item is entry for item in top):
+                    continue
+                top[:] = [item for item in top if item is not entry]
+                if not top:
+                    del self._top[suffix[:length]]
+
+    def _best(self, start: int, stop: int, rank=None):
+        keys = {key for _, key in self._keys[start:stop]}
+        if rank is None:
+            return heapq.nsmallest(MAX_SUGGESTIONS, (self._entries[key] for key in keys), key=self._rank)
+        return [self._entries[key] for key in heapq.nsmallest(MAX_SUGGESTIONS, keys, key=rank.__getitem__)]
+
+    def _scan(self, prefix: str):
+        start = bisect.bisect_left(self._keys, (prefix,))
+        stop = bisect.bisect_left(self._keys, (prefix + LAST_CHARACTER,), start)
+        top = self._best(start, stop)
+        if stop - start > SCAN_LIMIT:
+            self._top[prefix] = top
+        return top
+
+    def _sort(self):
+        if not self._sorted:
+            self._keys.sort()
+            self._sorted = True
+
+    def _prepare(self):
+        self._sort()
+
+        # Memoize every prefix matching more than SCAN_LIMIT keys, walking down from the
+        # single characters and only splitting the ranges that are still too large, so a
+        # keystroke never scans more than SCAN_LIMIT keys
+        rank = {key: position for position, key in enumerate(sorted(self._entries, key=lambda key: self._rank(self._entries[key])))}
+        ranges = [(0, len(self._keys), "")]
+        while ranges:
+            start, stop, parent = ranges.pop()
+            position = start
+            while position < stop:
+                suffix = self._keys[position][0]
+                if len(suffix) <= len(parent):
+                    position += 1
+                    continue
+
+                prefix = suffix[:len(parent) + 1]
+                end = bisect.bisect_left(self._keys, (prefix + LAST_CHARACTER,), position, stop)
+                if end - position > SCAN_LIMIT:
+                    if (position, end) == (start, stop) and parent:
+                        self._top[prefix] = list(self._top[parent])
+                    else:
+                        self._top[prefix] = self._best(position, end, rank)
+                    ranges.append((position, end, prefix))
+                position = end
+
+    def suggest(self, prefix: str, limit: int = 10):
+        """
+        Return the most popular entries having a word starting with `prefix`.
+
+        Parameters:
+            prefix (str): What the user has typed so far.
+            limit (int): The maximum number of suggestions, at most MAX_SUGGESTIONS.
+
+        Returns:
+            list[dict]: The suggestions, best first, each with its text, kind and id.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None or len(top) < min(limit, MAX_SUGGESTIONS):
+                top = self._scan(prefix)
+
+            return [
+                {"text": entry["text"], "kind": entry["kind"], "id": entry["id"]}
+                for entry in top[:limit]
+            ]
+
+
+suggest_index = SuggestIndex()
+
+def _load_documents(db: Session):
+    """
+    Load every suggestion with its popularity.
+
+    A product's popularity is the number of units ordered; a category's is the number
+    of units ordered of its products plus the number of its products, so categories
+    with a large range rank first on a new store.
+    """
+    ordered = get_product_order_counts(db)
+    category_weights = {}
+    documents = []
+
+    for row in get_suggestion_products(db):
+        weight = ordered.get(row.id, 0)
+        documents.append({"kind": "product", "id": row.id, "text": row.name, "weight": weight})
+        for kind, category_id in (("part", row.part_category_id), ("brand", row.brand_category_id), ("model", row.model_category_id)):
+            category_weights[(kind, category_id)] = category_weights.get((kind, category_id), 0) + weight + 1
+
+    categories = [
+        ("part", get_all_part_categories(db), "part_type_name"),
+        ("brand", get_all_brand_categories(db), "brand_type_name"),
+        ("model", get_all_model_categories(db), "model_name"),
+    ]
+    for kind, rows, name in categories:
+        for row in rows:
+            documents.append({
+                "kind": kind,
+                "id": row.id,
+                "text": getattr(row, name),
+                "weight": category_weights.get((kind, row.id), 0),
+            })
+
+    return documents
+
+def suggest(db: Session, prefix: str, limit: int = 10):
+    """
+    Autocomplete what the user is typing in the search box.
+
+    Parameters:
+        db (Session): The database session used if the index has to be loaded.
+        prefix (str): What the user has typed so far.
+        limit (int): The maximum number of suggestions.
+
+    Returns:
+        list[dict]: The suggestions, most popular first.
+    """
+    return ensure_index(suggest_index, _load_documents, db).suggest(prefix, limit=limit)
+
+def index_suggestion(kind: str, item_id: int, text: str):
+    """
+    Add or rename an entry of the suggest index after a catalog write. The entry keeps
+    its popularity until the next rebuild.
+
+    Parameters:
+        kind (str): "product", "brand", "model" or "part".
+        item_id (int): The ID of the product or category.
+        text (str): Its name.
+    """
+    suggest_index.add({"kind": kind, "id": item_id, "text": text})
+
+def unindex_suggestion(kind: str, item_id: int):
+    """
+    Remove a deleted product or category from the suggest index.
+
+    Parameters:
+        kind (str): "product", "brand", "model" or "part".
+        item_id (int): The ID of the product or category.
+    """
+    suggest_index.remove((kind, item_id))
@@ -1,11 +1,12 @@
 import secrets
 
 from fastapi import HTTPException
-from passlib.hash import bcrypt
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.auth import invalidate_user
 from app.core.config import get_settings, send_verification_email
-from app.core.security import verify_password
+from app.core.security import get_password_hash, verify_password, verify_password_async
 from app.models.user import User
 from app.schemas.user import UserCreate
 
@@ -14,7 +15,7 @@ from app.crud import (
     get_user,
     get_user_by_username,
     get_user_by_email,
-    set_admin
+    set_admin as set_admin_in_db
 )
 
 settings = get_settings()
@@ -33,6 +34,7 @@ def verify_user_email(db: Session, verification_code: str):
     user.is_verified = True
     user.verification_code = None  # Clear the code after successful verification
     db.commit()
+    invalidate_user(user.username)
     return {"message": "Email verified successfully."}
 
 def create_user(db: Session, user: UserCreate):
@@ -52,7 +54,7 @@ def create_user(db: Session, user: UserCreate):
     if get_user_by_username(db, user.username) or get_user_by_email(db, user.email):
         raise HTTPException(status_code=400, detail="Username or Email is already registered")
 
-    password_hash = bcrypt.hash(user.password)
+    password_hash = get_password_hash(user.password)
     verification_code = secrets.token_urlsafe(32)
 
     db_user = User(
@@ -88,3 +90,39 @@ def authenticate_user(db: Session, username:str, password:str):
         return None
 
     return user
+
+async def authenticate_user_async(db: AsyncSession, username: str, password: str):
+    """
+    Authenticates a user like `authenticate_user`, for async routes.
+
+    Parameters:
+        db (AsyncSession): The async database session.
+        username (str): The user's username.
+        password (str): The plain text password provided by the user.
+
+    Returns:
+        User: The authenticated user if credentials are correct, otherwise None.
+    """
+    user = await db.run_sync(get_user_by_username, username)
+
+    if not user:
+        return None
+    if not await verify_password_async(password, user.password_hash):
+        return None
+
+    return user
+
+def set_admin(db: Session, user_id: int):
+    """
+    Grants a user admin rights.
+
+    Parameters:
+        db (Session): The database session.
+        user_id (int): The ID of the user.
+
+    Returns:
+        User: The updated user.
+    """
+    user = set_admin_in_db(db=db, user_id=user_id)
+    invalidate_user(user.username)
+    return user
@@ -0,0 +1,73 @@
+"""
+Pytest fixtures for testing the app. Load them from a conftest.py with:
+
+    pytest_plugins = ["app.testing"]
+"""
+import contextlib
+
+import pytest
+
+from app.core import query_stats
+from app.core.config import get_settings
+
+
+class QueryBudget:
+    """
+    The queries of the requests made while the `query_budget` fixture is in use, and a
+    context manager to hold a block of requests to a budget.
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    def record(self, method: str, route: str, stats: query_stats.QueryStats):
+        self.requests.append((method, route, stats))
+
+    @contextlib.contextmanager
+    def __call__(self, max_queries: int, max_repeats: int | None = None):
+        """
+        Fail the test if a request made in the block runs more than `max_queries` queries,
+        or, with `max_repeats`, runs one statement more than `max_repeats` times.
+        """
+        start = len(self.requests)
+        yield self
+        for method, route, stats in self.requests[start:]:
+            if stats.count > max_queries:
+                pytest.fail(
+                    f"{method} {route} ran {stats.count} queries, over its budget of {max_queries}:\n"
+                    + _describe(stats.repeated(threshold=1))
+                )
+            if max_repeats is not None and stats.repeated(threshold=max_repeats + 1):
+                pytest.fail(
+                    f"{method} {route} repeated a statement more than {max_repeats} times, a likely N+1:\n"
+                    + _describe(stats.repeated(threshold=max_repeats + 1))
+                )
+
+
+def _describe(statements: list) -> str:
+    lines = []
+    for entry in statements:
+        lines.append(f"  {entry['count']}x {' '.join(entry['statement'].split())}")
+        lines.extend(f"      from {call_site}" for call_site in entry["call_sites"])
+    return "\n".join(lines)
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Hold requests to a query budget, recording where each query comes from:
+
+        def test_cart_is_one_query(client, query_budget):
+            with query_budget(max_queries=2, max_repeats=1):
+                client.get("/cart/", headers=headers)
+    """
+    settings = get_settings()
+    budget = QueryBudget()
+    query_debug = settings.QUERY_DEBUG
+    settings.QUERY_DEBUG = True
+    query_stats.observers.append(budget.record)
+    try:
+        yield budget
+    finally:
+        query_stats.observers.remove(budget.record)
+        settings.QUERY_DEBUG = query_debug
@@ -0,0 +1,88 @@
+# SPDX-FileCopyrightText: 2024-present U.N. Owen <void@some.where>
+#
+# SPDX-License-Identifier: MIT
+import os
+import tempfile
+import uuid
+
+import pytest
+
+# The app reads its settings and creates its tables on import, so every test process
+# points it at a throwaway SQLite database before anything imports it
+_directory = tempfile.mkdtemp(prefix="app-tests-")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'app.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["LOG_FILE"] = os.path.join(_directory, "app.log")
+os.environ["PROFILE_DIR"] = os.path.join(_directory, "profiles")
+os.environ.pop("METRICS_DIR", None)
+
+pytest_plugins = ["app.testing"]
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def user_headers(client):
+    """
+    The authorization header of a new user, so tests never share a cart.
+    """
+    username = f"user-{uuid.uuid4().hex[:12]}"
+    response = client.post("/users/register", json={"username": username, "email": f"{username}@example.com", "password": "password"})
+    assert response.status_code == 200, response.text
+    response = client.post("/users/token", data={"username": username, "password": "password"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def categories(client):
+    """
+    The IDs of a new part category, brand and model, to create products in.
+    """
+    suffix = uuid.uuid4().hex[:12]
+    part = client.post("/admin/add-part-category", json={"part_type_name": f"Filters {suffix}", "part_type_description": "Filters"})
+    brand = client.post("/admin/add-brand-category", json={"brand_type_name": f"Bosch {suffix}", "brand_type_description": "Bosch"})
+    model = client.post("/admin/add-model-category", json={"brand_id": brand.json()["id"], "model_name": f"Civic {suffix}"})
+    return {
+        "part_category_id": part.json()["id"],
+        "brand_category_id": brand.json()["id"],
+        "model_category_id": model.json()["id"],
+    }
+
+
+@pytest.fixture(scope="session")
+def make_product(client, categories):
+    """
+    Create a product through the admin API and return its fields with its ID.
+    """
+    def make(price: float = 10, **fields):
+        product = {
+            "name": f"Oil Filter {uuid.uuid4().hex[:12]}",
+            "description": "Spin-on oil filter",
+            "price": price,
+            "tags": ["oil", "filter"],
+            "images": [],
+            "thumbnail": "",
+            **categories,
+            **fields,
+        }
+        response = client.post("/admin/products", json=product)
+        assert response.status_code == 200, response.text
+        return {**product, "id": response.json()["id"]}
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def products(make_product):
+    """
+    The IDs of 30 products priced 10 to 39, which no test changes.
+    """
+    return [make_product(price=10 + i)["id"] for i in range(30)]
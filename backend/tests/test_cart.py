@@ -0,0 +1,74 @@
+# SPDX-FileCopyrightText: 2024-present U.N. Owen <void@some.where>
+#
+# SPDX-License-Identifier: MIT
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from app.core.database import SessionLocal
+from app.crud import get_cart_by_user_id, upsert_cart_item_in_db
+from app.models.cart import Cart, CartItem
+
+
+def test_cart_is_read_in_two_queries_whatever_its_size(client, query_budget, user_headers, products):
+    client.post("/cart/add", json={"product_id": products[0], "quantity": 1}, headers=user_headers)
+    with query_budget(max_queries=2, max_repeats=1):
+        response = client.get("/cart/", headers=user_headers)
+    assert len(response.json()["items"]) == 1
+
+    batch = {"add": [{"product_id": product_id, "quantity": 2} for product_id in products[1:]]}
+    client.post("/cart/batch", json=batch, headers=user_headers)
+    with query_budget(max_queries=2, max_repeats=1):
+        response = client.get("/cart/", headers=user_headers)
+    assert len(response.json()["items"]) == len(products)
+
+
+def test_cart_summary_is_one_query(client, query_budget, user_headers, products):
+    client.post("/cart/add", json={"product_id": products[0], "quantity": 3}, headers=user_headers)
+    with query_budget(max_queries=1):
+        response = client.get("/cart/getTotalItems", headers=user_headers)
+    assert response.json() == {"total_items": 3, "subtotal": 30.0}
+
+
+def test_concurrent_adds_of_a_product_keep_one_row_and_every_unit(client, user_headers, products):
+    threads, adds = 8, 25
+    user_id = client.get("/users/me", headers=user_headers).json()["id"]
+    with SessionLocal() as db:
+        cart_id = get_cart_by_user_id(user_id=user_id, db=db).id
+
+    # Each thread has its own session, like concurrent requests do
+    def add(thread: int):
+        with SessionLocal() as db:
+            return [
+                upsert_cart_item_in_db(cart_id=cart_id, product_id=products[0], quantity=1, price=10, db=db).item_count
+                for _ in range(adds)
+            ]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        counts = [count for thread in pool.map(add, range(threads)) for count in thread]
+
+    with SessionLocal() as db:
+        rows, quantity = db.query(func.count(), func.sum(CartItem.quantity)).filter(CartItem.cart_id == cart_id).one()
+        cart = db.get(Cart, cart_id)
+    assert rows == 1
+    assert quantity == threads * adds
+    assert cart.item_count == threads * adds
+    assert cart.subtotal == threads * adds * 10
+    # Every add saw its own increment of the counter
+    assert sorted(counts) == list(range(1, threads * adds + 1))
+
+
+def test_cart_summary_follows_price_changes_and_deletes(client, user_headers, products, make_product):
+    product = make_product(price=40)
+    client.post("/cart/add", json={"product_id": products[0], "quantity": 1}, headers=user_headers)
+    client.post("/cart/add", json={"product_id": product["id"], "quantity": 2}, headers=user_headers)
+    assert client.get("/cart/getTotalItems", headers=user_headers).json() == {"total_items": 3, "subtotal": 90.0}
+
+    response = client.put(f"/admin/products/{product['id']}", json={**product, "price": 100})
+    assert response.status_code == 200, response.text
+    assert client.get("/cart/getTotalItems", headers=user_headers).json() == {"total_items": 3, "subtotal": 210.0}
+
+    response = client.delete(f"/admin/products/{product['id']}")
+    assert response.status_code == 200, response.text
+    assert client.get("/cart/getTotalItems", headers=user_headers).json() == {"total_items": 1, "subtotal": 10.0}
+    assert client.get("/cart/", headers=user_headers).json()["total_price"] == 10.0
@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: 2024-present U.N. Owen <void@some.where>
+#
+# SPDX-License-Identifier: MIT
+import hashlib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.core.database import SessionLocal
+from app.models.idempotency import IdempotencyKey
+from app.models.order import Order
+from app.services import idempotency as idempotency_service
+
+
+def user_id_of(client, headers) -> int:
+    return client.get("/users/me", headers=headers).json()["id"]
+
+
+def count_orders(user_id: int) -> int:
+    with SessionLocal() as db:
+        return db.query(Order).filter(Order.user_id == user_id).count()
+
+
+def test_retried_checkout_is_replayed_without_a_second_order(client, user_headers, products):
+    client.post("/cart/add", json={"product_id": products[0], "quantity": 2}, headers=user_headers)
+    headers = {**user_headers, "Idempotency-Key": uuid.uuid4().hex}
+
+    first = client.post("/checkout/", headers=headers)
+    retry = client.post("/checkout/", headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert count_orders(user_id_of(client, user_headers)) == 1
+
+
+def test_errors_are_replayed_too(client, user_headers, products):
+    client.post("/cart/add", json={"product_id": products[0], "quantity": 1}, headers=user_headers)
+    client.post("/checkout/", headers=user_headers)
+    headers = {**user_headers, "Idempotency-Key": uuid.uuid4().hex}
+
+    # The order has no addresses yet
+    first = client.post("/checkout/complete", headers=headers)
+    assert first.status_code == 400
+    retry = client.post("/checkout/complete", headers=headers)
+    assert (retry.status_code, retry.json()) == (400, first.json())
+    assert retry.headers["idempotent-replayed"] == "true"
+
+
+def test_key_reused_on_another_route_is_rejected(client, user_headers, products):
+    client.post("/cart/add", json={"product_id": products[0], "quantity": 1}, headers=user_headers)
+    headers = {**user_headers, "Idempotency-Key": uuid.uuid4().hex}
+    assert client.post("/checkout/", headers=headers).status_code == 200
+
+    response = client.post("/checkout/complete", headers=headers)
+    assert response.status_code == 422
+
+
+def test_key_of_a_request_still_running_is_a_conflict(client, user_headers, products):
+    key = uuid.uuid4().hex
+    user_id = user_id_of(client, user_headers)
+    now = idempotency_service._now()
+    # Claimed by a request that has not stored its response yet
+    with SessionLocal() as db:
+        db.add(IdempotencyKey(user_id=user_id, key_hash=hashlib.sha256(key.encode()).hexdigest(), path="/checkout/",
+                              created_at=now, expires_at=now + idempotency_service.ABANDONED_AFTER * 2))
+        db.commit()
+
+    client.post("/cart/add", json={"product_id": products[0], "quantity": 1}, headers=user_headers)
+    response = client.post("/checkout/", headers={**user_headers, "Idempotency-Key": key})
+    assert response.status_code == 409
+    assert count_orders(user_id) == 0
+
+
+def test_concurrent_duplicates_run_the_handler_once(client, user_headers):
+    threads = 8
+    user_id = user_id_of(client, user_headers)
+    key = uuid.uuid4().hex
+    calls = []
+    start = threading.Barrier(threads)
+
+    def handler(db):
+        calls.append(1)
+        return {"order": 1}
+
+    # Each thread has its own session, like concurrent requests do
+    def submit(thread: int):
+        start.wait()
+        with SessionLocal() as db:
+            try:
+                return idempotency_service.run_idempotent(db, user_id=user_id, key=key, path="/checkout/", handler=handler)
+            except HTTPException as error:
+                return error.status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(submit, range(threads)))
+
+    assert len(calls) == 1
+    assert results.count({"order": 1}) == 1
+    # The others either found the key in progress or got the stored response back
+    assert all(result == 409 or isinstance(result, JSONResponse) for result in results if result != {"order": 1})
@@ -0,0 +1,31 @@
+# SPDX-FileCopyrightText: 2024-present U.N. Owen <void@some.where>
+#
+# SPDX-License-Identifier: MIT
+import os
+
+from sqlalchemy import create_engine
+
+from app.core import metrics
+from app.core.database import PoolMetrics
+
+
+def test_pool_stats_of_a_pool_that_is_not_a_queue_pool():
+    metrics = PoolMetrics()
+    metrics.engine = create_engine("sqlite://")
+    stats = metrics.stats()
+    assert stats["timeouts"] == 0
+    assert "size" not in stats
+
+
+def test_pool_stats_and_metrics_are_served(client):
+    stats = client.get("/admin/db-pool-stats").json()
+    assert stats["sync"]["size"] == 5
+    assert client.get("/metrics").status_code == 200
+
+
+def test_boot_id_of_a_process_without_a_parent_is_its_own(monkeypatch):
+    monkeypatch.setattr(os, "getppid", lambda: 0)
+    pid, started = metrics._boot_id().split(".")
+    assert int(pid) == os.getpid()
+    if os.path.exists("/proc/self/stat"):
+        assert int(started) > 0
@@ -0,0 +1,113 @@
+# SPDX-FileCopyrightText: 2024-present U.N. Owen <void@some.where>
+#
+# SPDX-License-Identifier: MIT
+import json
+import smtplib
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from app.core.database import SessionLocal
+from app.crud import claim_outbox_events
+from app.models.order import Order
+from app.models.outbox import OutboxEvent
+from app.services import outbox as outbox_service
+
+ADDRESS = {"street_address": "1 Main St", "city": "Reno", "state": "NV", "postal_code": "89501",
+           "country": "US", "is_billing": True, "is_shipping": True}
+
+
+class SMTPStub:
+    """
+    Stands in for send_email, rejecting the first `failures` messages as a busy server does.
+    """
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.messages = []
+
+    def __call__(self, to_email: str, subject: str, body: str):
+        if self.failures > 0:
+            self.failures -= 1
+            raise smtplib.SMTPDataError(451, b"Try again later")
+        self.messages.append((to_email, subject))
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    stub = SMTPStub()
+    monkeypatch.setattr(outbox_service, "send_email", stub)
+    return stub
+
+
+def complete_order(client, headers, product_id: int) -> int:
+    client.post("/cart/add", json={"product_id": product_id, "quantity": 2}, headers=headers)
+    assert client.post("/checkout/", headers=headers).status_code == 200
+    address_id = client.post("/checkout/address", json=ADDRESS, headers=headers).json()["order"]["id"]
+    client.post("/checkout/address/setshipping", params={"address_id": address_id}, headers=headers)
+    client.post("/checkout/address/setbilling", params={"address_id": address_id}, headers=headers)
+    response = client.post("/checkout/complete", headers=headers)
+    assert response.json()["message"] == "Checkout Complete", response.text
+    return response.json()["order"]["id"]
+
+
+def order_events(db, order_id: int) -> dict:
+    events = db.query(OutboxEvent).filter(OutboxEvent.topic.in_(outbox_service.ORDER_COMPLETED_TOPICS)).all()
+    return {event.topic: event for event in events if json.loads(event.payload) == {"order_id": order_id}}
+
+
+def test_completing_checkout_enqueues_the_order_events(client, user_headers, products, smtp):
+    order_id = complete_order(client, user_headers, products[0])
+
+    with SessionLocal() as db:
+        events = order_events(db, order_id)
+        assert set(events) == set(outbox_service.ORDER_COMPLETED_TOPICS)
+        assert all(event.status == "Pending" and event.attempts == 0 for event in events.values())
+    # Nothing is sent until the worker runs
+    assert smtp.messages == []
+
+
+def test_smtp_failure_is_retried_with_backoff(client, user_headers, products, smtp):
+    order_id = complete_order(client, user_headers, products[0])
+    smtp.failures = 1
+    with SessionLocal() as db:
+        # Accounts at example.com get no mail, so give this one a real address
+        user = db.get(Order, order_id).user
+        user.email = user.email.replace("@example.com", "@pitstop.test")
+        email = user.email
+        db.commit()
+
+        before = outbox_service._now()
+        outbox_service.process_batch(db)
+        after = outbox_service._now()
+
+        confirmation = order_events(db, order_id)["order_confirmation_email"]
+        assert (confirmation.status, confirmation.attempts) == ("Pending", 1)
+        assert confirmation.last_error.startswith("SMTPDataError")
+        delay = outbox_service.retry_delay(1)
+        assert before + delay <= confirmation.available_at <= after + delay
+        assert order_events(db, order_id)["order_analytics"].status == "Done"
+
+        # Not due yet, so the next batch leaves it alone
+        outbox_service.process_batch(db)
+        db.refresh(confirmation)
+        assert confirmation.attempts == 1
+
+        confirmation.available_at = before
+        db.commit()
+        outbox_service.process_batch(db)
+        db.refresh(confirmation)
+        assert (confirmation.status, confirmation.attempts) == ("Done", 2)
+    assert [to for to, _ in smtp.messages] == [email]
+
+
+def test_claim_skips_rows_locked_by_another_worker():
+    with SessionLocal() as db:
+        statements = []
+        event.listen(db, "do_orm_execute", lambda state: statements.append(state.statement))
+        claim_outbox_events(db, now=outbox_service._now(), batch_size=5)
+        db.rollback()
+
+    # SQLite has no row locks, so check the SQL the claim sends to PostgreSQL
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert sql.endswith("FOR UPDATE SKIP LOCKED")
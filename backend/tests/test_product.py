@@ -0,0 +1,59 @@
+# SPDX-FileCopyrightText: 2024-present U.N. Owen <void@some.where>
+#
+# SPDX-License-Identifier: MIT
+import uuid
+
+import pytest
+
+from app.core.pagination import encode_cursor
+
+
+def test_catalog_pages_follow_the_cursor(client, products):
+    response = client.get("/product/?sort=price&limit=5")
+    assert response.status_code == 200
+    next_cursor = response.json()["next_cursor"]
+    response = client.get(f"/product/?sort=price&limit=5&cursor={next_cursor}")
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(("sort", "values"), [
+    ("price", [5]),
+    ("price", []),
+    ("price", [{"a": 1}, 1]),
+    ("price", [True, 1]),
+    ("price", [5, "x"]),
+    ("name", [5, 1]),
+    ("id", []),
+    ("id", ["x"]),
+    ("id", [1.5]),
+    ("id", [1, 2]),
+])
+def test_catalog_rejects_malformed_cursors(client, sort, values):
+    response = client.get(f"/product/?sort={sort}&cursor={encode_cursor(f'products:{sort}', values)}")
+    assert response.status_code == 400
+
+
+def test_facet_counts_follow_product_writes(client, categories, make_product):
+    # A brand of its own, so the counts under it are this test's products only
+    suffix = uuid.uuid4().hex[:12]
+    brand = client.post("/admin/add-brand-category", json={"brand_type_name": f"Brembo {suffix}", "brand_type_description": "Brembo"}).json()["id"]
+    part = client.post("/admin/add-part-category", json={"part_type_name": f"Brakes {suffix}", "part_type_description": "Brakes"}).json()["id"]
+    filters = categories["part_category_id"]
+
+    def facets():
+        response = client.get(f"/product/?brand_category_id={brand}&facets=true")
+        assert response.status_code == 200, response.text
+        page = response.json()
+        return page["total"], page["facets"]["part_category_id"], page["facets"]["brand_category_id"].get(str(brand))
+
+    first = make_product(brand_category_id=brand)
+    make_product(brand_category_id=brand)
+    assert facets() == (2, {str(filters): 2}, 2)
+
+    response = client.put(f"/admin/products/{first['id']}", json={**first, "part_category_id": part})
+    assert response.status_code == 200, response.text
+    assert facets() == (2, {str(filters): 1, str(part): 1}, 2)
+
+    response = client.delete(f"/admin/products/{first['id']}")
+    assert response.status_code == 200, response.text
+    assert facets() == (1, {str(filters): 1}, 1)
@@ -0,0 +1,50 @@
+# SPDX-FileCopyrightText: 2024-present U.N. Owen <void@some.where>
+#
+# SPDX-License-Identifier: MIT
+import uuid
+
+import pytest
+
+from app.core.pagination import encode_cursor
+
+
+def test_search_pages_follow_the_cursor(client, products):
+    response = client.get("/search/?q=oil filter&limit=5")
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["items"]) == 5
+    response = client.get("/search/", params={"q": "oil filter", "limit": 5, "cursor": page["next_cursor"]})
+    assert response.status_code == 200
+    assert {item["id"] for item in response.json()["items"]}.isdisjoint(item["id"] for item in page["items"])
+
+
+@pytest.mark.parametrize("values", [[], ["x"], [1.5], [-2], [True], [1, 2]])
+def test_search_rejects_malformed_cursors(client, products, values):
+    response = client.get("/search/", params={"q": "oil filter", "cursor": encode_cursor("search:text", values)})
+    assert response.status_code == 400
+
+
+def test_suggestions_follow_product_writes(client, products, make_product):
+    # Load the index first, so the product reaches it through the write, not the load
+    assert client.get("/search/suggest", params={"q": "oil"}).status_code == 200
+    word = f"zx{uuid.uuid4().hex[:10]}"
+
+    def suggested(prefix: str):
+        response = client.get("/search/suggest", params={"q": prefix})
+        assert response.status_code == 200
+        return [(item["kind"], item["id"]) for item in response.json()]
+
+    product = make_product(name=f"Brake Rotor {word}")
+    assert ("product", product["id"]) in suggested(word[:6])
+
+    response = client.put(f"/admin/products/{product['id']}", json={**product, "name": "Brake Rotor"})
+    assert response.status_code == 200, response.text
+    assert ("product", product["id"]) not in suggested(word[:6])
+
+    response = client.put(f"/admin/products/{product['id']}", json={**product, "name": f"Brake Rotor {word}"})
+    assert response.status_code == 200, response.text
+    assert ("product", product["id"]) in suggested(word)
+
+    response = client.delete(f"/admin/products/{product['id']}")
+    assert response.status_code == 200, response.text
+    assert ("product", product["id"]) not in suggested(word[:6])
@@ -62,7 +62,7 @@ export default function Results() {
                 },
             });
             const data = await response.json();
-            setProductList(data);
+            setProductList(data.items ?? []);
             console.log("DATA: ", data);
         } catch (error) {
             console.error("Error fetching products by query:", error);
@@ -117,12 +117,21 @@ export default function AdminButtons() {
     const apiGetAllProducts = async () => {
         setLoading(true);
         try {
-            const response = await fetch("http://localhost:8000/product/");
-            if (!response.ok) {
-            throw new Error("Failed to fetch products");
-            }
-            const data: Product[] = await response.json();
-            setProductList(data);
+            const products: Product[] = [];
+            let cursor: string | null = null;
+            do {
+                const url: string = cursor
+                    ? `http://localhost:8000/product/?limit=200&cursor=${encodeURIComponent(cursor)}`
+                    : "http://localhost:8000/product/?limit=200";
+                const response = await fetch(url);
+                if (!response.ok) {
+                throw new Error("Failed to fetch products");
+                }
+                const data: { items: Product[]; next_cursor: string | null } = await response.json();
+                products.push(...data.items);
+                cursor = data.next_cursor;
+            } while (cursor);
+            setProductList(products);
         } catch (error) {
             console.error(error);
         } finally {
@@ -21,41 +21,55 @@ export function ListOrders() {
     const [error, setError] = useState("");
     const [selectedOrder, setSelectedOrder] = useState<Order | null>(null);
 
-    useEffect(() => {
-        const fetchOrders = async () => {
-            const token = sessionStorage.getItem("access_token");
-            if (!token) {
-                setError("User not authenticated.");
-                setLoading(false);
-                return;
-            }
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
-            try {
-                const response = await fetch("http://localhost:8000/orders/", {
-                    method: "GET",
-                    headers: {
-                        "Content-Type": "application/json",
-                        "Authorization": `Bearer ${token}`,
-                    },
-                });
+    // Orders come newest first, a page at a time; each page names the cursor of the next
+    const fetchOrders = async (cursor: string | null = null) => {
+        const token = sessionStorage.getItem("access_token");
+        if (!token) {
+            setError("User not authenticated.");
+            setLoading(false);
+            return;
+        }
 
-                if (response.ok) {
-                    const data = await response.json();
-                    setOrders(data.order_content);
-                } else {
-                    const errorData = await response.json();
-                    setError(errorData.message || "Failed to fetch orders.");
-                }
-            } catch (err) {
-                setError("Error fetching orders.");
-            } finally {
-                setLoading(false);
+        try {
+            const url = cursor
+                ? `http://localhost:8000/orders/?cursor=${encodeURIComponent(cursor)}`
+                : "http://localhost:8000/orders/";
+            const response = await fetch(url, {
+                method: "GET",
+                headers: {
+                    "Content-Type": "application/json",
+                    "Authorization": `Bearer ${token}`,
+                },
+            });
+
+            if (response.ok) {
+                const data: { order_content: Order[]; next_cursor: string | null } = await response.json();
+                setOrders((previous) => (cursor ? [...previous, ...data.order_content] : data.order_content));
+                setNextCursor(data.next_cursor);
+            } else {
+                const errorData = await response.json();
+                setError(errorData.message || "Failed to fetch orders.");
             }
-        };
+        } catch (err) {
+            setError("Error fetching orders.");
+        } finally {
+            setLoading(false);
+        }
+    };
 
+    useEffect(() => {
         fetchOrders();
     }, []);
 
+    const loadMoreOrders = async () => {
+        setLoadingMore(true);
+        await fetchOrders(nextCursor);
+        setLoadingMore(false);
+    };
+
     const handleOrderClick = (order: Order) => {
         setSelectedOrder(order);
     };
@@ -87,6 +101,15 @@ export function ListOrders() {
                     ))}
                 </ul>
             )}
+            {nextCursor && (
+                <button
+                    onClick={loadMoreOrders}
+                    disabled={loadingMore}
+                    className="bg-blue-500 text-white px-4 py-2 rounded hover:bg-blue-600 disabled:opacity-50"
+                >
+                    {loadingMore ? "Loading..." : "Load more orders"}
+                </button>
+            )}
 
             {selectedOrder && (
                 <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center">